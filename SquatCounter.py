@@ -1,41 +1,52 @@
+import argparse
 import cv2
+import json
 import mediapipe as mp
+import multiprocessing
 import numpy as np
+import os
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared pose helpers live in the backend app (they don't need Django)
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "backend"))
+from squatTracker.kinematics import landmark_angle  # noqa: E402
+from squatTracker.landmark_recording import LandmarkRecorder  # noqa: E402
+from squatTracker.live_pipeline import LivePipeline  # noqa: E402
+from squatTracker.pose_estimation import (  # noqa: E402
+    PoseFrameProcessor, landmarks_to_array, pose_pool,
+)
+from squatTracker.rep_engine import IN_REP, READY, RepEngine  # noqa: E402
+from squatTracker.timing import StageTimer  # noqa: E402
 
 # Initialize MediaPipe Pose and Drawing utilities
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
+# Frames are downscaled to this longer side before pose inference
+# (None = full resolution); PERSON_ROI crops them to the person first
+MAX_INFERENCE_DIM = None
+PERSON_ROI = False
 
-def calculate_angle(a, b, c):
-    """
-    Calculates the angle between three points.
-    Parameters:
-    a, b, c: Each a list of two elements representing x and y coordinates.
-
-    Returns:
-    angle: The angle in degrees.
-    """
-    a = np.array(a)  # First point
-    b = np.array(b)  # Mid point
-    c = np.array(c)  # End point
+# Run capture and pose inference on their own threads, always showing the
+# newest frame (False = read, infer and draw one frame at a time)
+PIPELINED = True
 
-    # Calculate the angle in radians
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(
-        a[1] - b[1], a[0] - b[0]
-    )
-    angle = np.abs(radians * 180.0 / np.pi)
+# Show per-stage timings (ms per frame) on screen; toggle with "t"
+SHOW_TIMINGS = False
 
-    # Ensure the angle is within [0, 180]
-    if angle > 180.0:
-        angle = 360 - angle
+# Precision of --record landmark recordings (float16 halves their size)
+RECORD_DTYPE = "float16"
 
-    return angle
+# Files picked up when --headless is given a directory
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
 
 
 class Exercise:
-    def __init__(self, name, landmarks, angle_points, up_threshold, down_threshold):
+    def __init__(self, name, landmarks, angle_points, up_threshold, down_threshold,
+                 stages=("down", "up"), verbose=True):
         """
         Initializes an Exercise instance.
 
@@ -45,14 +56,35 @@ class Exercise:
         angle_points: Tuple indicating which landmarks to use for angle calculation.
         up_threshold: Angle threshold to detect the "up" position.
         down_threshold: Angle threshold to detect the "down" position.
+        stages: Stage labels shown above up_threshold and after dropping
+            below down_threshold.
+        verbose: Print the rep count after each rep.
         """
+        self.verbose = verbose
         self.name = name
         self.landmarks = landmarks
         self.angle_points = angle_points
         self.up_threshold = up_threshold
         self.down_threshold = down_threshold
-        self.counter = 0
-        self.stage = None
+        self.stages = stages
+        # A rep is counted when the angle drops below down_threshold after
+        # having been above up_threshold
+        self.engine = RepEngine(
+            "up_down", enter_threshold=down_threshold,
+            exit_threshold=up_threshold, require_arming=True,
+            count_on="enter")
+
+    @property
+    def counter(self):
+        return self.engine.count
+
+    @property
+    def stage(self):
+        if self.engine.state == READY:
+            return self.stages[0]
+        if self.engine.state == IN_REP:
+            return self.stages[1]
+        return None
 
     def update(self, landmarks):
         """
@@ -64,41 +96,12 @@ class Exercise:
         Returns:
         angle: The calculated angle for the exercise.
         """
-        # Extract the required landmarks
-        a = [landmarks[self.angle_points[0]].x,
-             landmarks[self.angle_points[0]].y]
-        b = [landmarks[self.angle_points[1]].x,
-             landmarks[self.angle_points[1]].y]
-        c = [landmarks[self.angle_points[2]].x,
-             landmarks[self.angle_points[2]].y]
-
         # Calculate angle
-        angle = calculate_angle(a, b, c)
-
-        # Update stage and counter based on exercise type
-        if self.name == "Bicep Curl":
-            if angle > self.up_threshold:
-                self.stage = "down"
-            if angle < self.down_threshold and self.stage == "down":
-                self.stage = "up"
-                self.counter += 1
-                print(f"{self.name} Reps: {self.counter}")
-
-        elif self.name == "Squat":
-            if angle > self.up_threshold:
-                self.stage = "up"
-            if angle < self.down_threshold and self.stage == "up":
-                self.stage = "down"
-                self.counter += 1
-                print(f"{self.name} Reps: {self.counter}")
-
-        elif self.name == "Push-Up":
-            if angle > self.up_threshold:
-                self.stage = "down"
-            if angle < self.down_threshold and self.stage == "down":
-                self.stage = "up"
-                self.counter += 1
-                print(f"{self.name} Reps: {self.counter}")
+        angle = landmark_angle(landmarks, self.angle_points)
+
+        # Update stage and counter
+        if self.engine.update(None, angle) and self.verbose:
+            print(f"{self.name} Reps: {self.counter}")
 
         return angle
 
@@ -149,7 +152,104 @@ def detect_exercise(angles, prev_exercise, angle_changes):
     return detected_exercise
 
 
-def main():
+def create_exercises(verbose=True):
+    """
+    Creates the exercises the trainer can detect, keyed by name.
+    """
+    return {
+        "Bicep Curl": Exercise(
+            name="Bicep Curl",
+            landmarks=("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
+            angle_points=(
+                mp_pose.PoseLandmark.LEFT_SHOULDER.value,
+                mp_pose.PoseLandmark.LEFT_ELBOW.value,
+                mp_pose.PoseLandmark.LEFT_WRIST.value,
+            ),
+            up_threshold=160,
+            down_threshold=30,
+            verbose=verbose,
+        ),
+        "Squat": Exercise(
+            name="Squat",
+            landmarks=("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+            angle_points=(
+                mp_pose.PoseLandmark.LEFT_HIP.value,
+                mp_pose.PoseLandmark.LEFT_KNEE.value,
+                mp_pose.PoseLandmark.LEFT_ANKLE.value,
+            ),
+            up_threshold=160,
+            down_threshold=70,
+            stages=("up", "down"),
+            verbose=verbose,
+        ),
+        "Push-Up": Exercise(
+            name="Push-Up",
+            landmarks=("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
+            angle_points=(
+                mp_pose.PoseLandmark.LEFT_SHOULDER.value,
+                mp_pose.PoseLandmark.LEFT_ELBOW.value,
+                mp_pose.PoseLandmark.LEFT_WRIST.value,
+            ),
+            up_threshold=160,
+            down_threshold=90,
+            verbose=verbose,
+        ),
+    }
+
+
+class ExerciseSession:
+    """
+    Per-frame exercise detection and rep counting, shared by the live
+    loop and headless mode. update() picks the current exercise from
+    frame-to-frame angle changes and updates its rep counter.
+    """
+
+    def __init__(self, verbose=True):
+        self.exercises = create_exercises(verbose)
+        self.prev_angles = {"bicep_curl": 0, "squat_knee": 0, "pushup_elbow": 0}
+        self.current_exercise = None
+        # Whether the last update() completed a rep of current_exercise
+        self.rep_completed = False
+
+    def update(self, landmarks):
+        """
+        Returns the current exercise's angle, or None if no exercise has
+        been detected yet.
+        """
+        exercises = self.exercises
+        angles = {
+            "bicep_curl": landmark_angle(
+                landmarks, exercises["Bicep Curl"].angle_points),
+            "squat_knee": landmark_angle(
+                landmarks, exercises["Squat"].angle_points),
+            "pushup_elbow": landmark_angle(
+                landmarks, exercises["Push-Up"].angle_points),
+        }
+
+        angle_changes = {
+            "bicep_curl": angles["bicep_curl"] - self.prev_angles["bicep_curl"],
+            "squat_knee": angles["squat_knee"] - self.prev_angles["squat_knee"],
+            "pushup_elbow": angles["pushup_elbow"] - self.prev_angles["pushup_elbow"],
+        }
+
+        self.prev_angles = angles.copy()
+
+        detected_exercise = detect_exercise(
+            angles, self.current_exercise, angle_changes)
+        if detected_exercise:
+            self.current_exercise = detected_exercise
+
+        self.rep_completed = False
+        if not self.current_exercise:
+            return None
+        exercise = exercises[self.current_exercise]
+        reps = exercise.counter
+        angle = exercise.update(landmarks)
+        self.rep_completed = exercise.counter > reps
+        return angle
+
+
+def main(record_path=None):
     cap = cv2.VideoCapture(0)
 
     # Track start time
@@ -158,223 +258,162 @@ def main():
     with mp_pose.Pose(
         min_detection_confidence=0.5, min_tracking_confidence=0.5
     ) as pose:
-        # Initialize exercises
-        exercises = {
-            "Bicep Curl": Exercise(
-                name="Bicep Curl",
-                landmarks=("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
-                angle_points=(
-                    mp_pose.PoseLandmark.LEFT_SHOULDER.value,
-                    mp_pose.PoseLandmark.LEFT_ELBOW.value,
-                    mp_pose.PoseLandmark.LEFT_WRIST.value,
-                ),
-                up_threshold=160,
-                down_threshold=30,
-            ),
-            "Squat": Exercise(
-                name="Squat",
-                landmarks=("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
-                angle_points=(
-                    mp_pose.PoseLandmark.LEFT_HIP.value,
-                    mp_pose.PoseLandmark.LEFT_KNEE.value,
-                    mp_pose.PoseLandmark.LEFT_ANKLE.value,
-                ),
-                up_threshold=160,
-                down_threshold=70,
-            ),
-            "Push-Up": Exercise(
-                name="Push-Up",
-                landmarks=("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
-                angle_points=(
-                    mp_pose.PoseLandmark.LEFT_SHOULDER.value,
-                    mp_pose.PoseLandmark.LEFT_ELBOW.value,
-                    mp_pose.PoseLandmark.LEFT_WRIST.value,
-                ),
-                up_threshold=160,
-                down_threshold=90,
-            ),
-        }
-
-        prev_angles = {"bicep_curl": 0, "squat_knee": 0, "pushup_elbow": 0}
-        current_exercise = None
+        timer = StageTimer()
+        show_timings = SHOW_TIMINGS
+        timings_text, timings_at = "", time.perf_counter()
+        processor = PoseFrameProcessor(
+            pose, max_dim=MAX_INFERENCE_DIM, roi=PERSON_ROI, timer=timer)
+
+        session = ExerciseSession()
+        exercises = session.exercises
         SQUAT_IDEAL_RANGE = (80, 140)
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                print("Ignoring empty camera frame.")
-                continue
-
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            results = pose.process(image)
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-            try:
-                landmarks = results.pose_landmarks.landmark
-
-                angles = {
-                    "bicep_curl": calculate_angle(
-                        [
-                            landmarks[exercises["Bicep Curl"].angle_points[0]].x,
-                            landmarks[exercises["Bicep Curl"].angle_points[0]].y,
-                        ],
-                        [
-                            landmarks[exercises["Bicep Curl"].angle_points[1]].x,
-                            landmarks[exercises["Bicep Curl"].angle_points[1]].y,
-                        ],
-                        [
-                            landmarks[exercises["Bicep Curl"].angle_points[2]].x,
-                            landmarks[exercises["Bicep Curl"].angle_points[2]].y,
-                        ],
-                    ),
-                    "squat_knee": calculate_angle(
-                        [
-                            landmarks[exercises["Squat"].angle_points[0]].x,
-                            landmarks[exercises["Squat"].angle_points[0]].y,
-                        ],
-                        [
-                            landmarks[exercises["Squat"].angle_points[1]].x,
-                            landmarks[exercises["Squat"].angle_points[1]].y,
-                        ],
-                        [
-                            landmarks[exercises["Squat"].angle_points[2]].x,
-                            landmarks[exercises["Squat"].angle_points[2]].y,
-                        ],
-                    ),
-                    "pushup_elbow": calculate_angle(
-                        [
-                            landmarks[exercises["Push-Up"].angle_points[0]].x,
-                            landmarks[exercises["Push-Up"].angle_points[0]].y,
-                        ],
-                        [
-                            landmarks[exercises["Push-Up"].angle_points[1]].x,
-                            landmarks[exercises["Push-Up"].angle_points[1]].y,
-                        ],
-                        [
-                            landmarks[exercises["Push-Up"].angle_points[2]].x,
-                            landmarks[exercises["Push-Up"].angle_points[2]].y,
-                        ],
-                    ),
-                }
-
-                angle_changes = {
-                    "bicep_curl": angles["bicep_curl"] - prev_angles["bicep_curl"],
-                    "squat_knee": angles["squat_knee"] - prev_angles["squat_knee"],
-                    "pushup_elbow": angles["pushup_elbow"] - prev_angles["pushup_elbow"],
-                }
-
-                prev_angles = angles.copy()
-
-                detected_exercise = detect_exercise(
-                    angles, current_exercise, angle_changes)
-                if detected_exercise:
-                    current_exercise = detected_exercise
-
-                if current_exercise:
-                    angle = exercises[current_exercise].update(landmarks)
-
-                    image_height, image_width, _ = image.shape
-                    ex = exercises[current_exercise]
-                    a = [landmarks[ex.angle_points[0]].x,
-                         landmarks[ex.angle_points[0]].y]
-                    b = [landmarks[ex.angle_points[1]].x,
-                         landmarks[ex.angle_points[1]].y]
-                    c = [landmarks[ex.angle_points[2]].x,
-                         landmarks[ex.angle_points[2]].y]
-
-                    a_pixel = tuple(np.multiply(
-                        a, [image_width, image_height]).astype(int))
-                    b_pixel = tuple(np.multiply(
-                        b, [image_width, image_height]).astype(int))
-                    c_pixel = tuple(np.multiply(
-                        c, [image_width, image_height]).astype(int))
-
-                    cv2.putText(
-                        image,
-                        str(int(angle)),
-                        b_pixel,
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (255, 255, 255),
-                        2,
-                        cv2.LINE_AA,
-                    )
-
-                    cv2.rectangle(image, (0, 0), (300, 100),
-                                  (245, 117, 16), -1)
-                    cv2.putText(image, "REPS", (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
-                    cv2.putText(image, str(ex.counter), (10, 70),
-                                cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 2)
-
-                    cv2.putText(image, "STAGE", (150, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
-                    cv2.putText(
-                        image,
-                        exercises[current_exercise].stage if exercises[current_exercise].stage else "",
-                        (150, 70),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        2,
-                        (255, 255, 255),
-                        2,
-                    )
-
-                    cv2.putText(
-                        image,
-                        f"Exercise: {current_exercise}",
-                        (10, 120),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7,
-                        (0, 255, 0),
-                        2,
-                    )
-
-                    if current_exercise == "Squat":
-                        min_angle, max_angle = SQUAT_IDEAL_RANGE
-                        if angle < min_angle:
-                            cv2.putText(
-                                image,
-                                "Going too deep or leaning forward!",
-                                (50, image_height - 50),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.9,
-                                (0, 0, 255),
-                                2,
-                            )
-                        elif angle > max_angle:
-                            cv2.putText(
-                                image,
-                                "Not squatting low enough!",
-                                (50, image_height - 50),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.9,
-                                (0, 0, 255),
-                                2,
-                            )
-
-            except AttributeError:
-                pass
-
-            mp_drawing.draw_landmarks(
-                image,
-                results.pose_landmarks,
-                mp_pose.POSE_CONNECTIONS,
-                mp_drawing.DrawingSpec(
-                    color=(245, 117, 66), thickness=2, circle_radius=2),
-                mp_drawing.DrawingSpec(
-                    color=(245, 66, 230), thickness=2, circle_radius=2),
-            )
-
-            cv2.imshow("Personal Trainer", image)
-
-            key = cv2.waitKey(10) & 0xFF
-            if key == ord("q"):
-                break
+        recorder = None
+        if record_path:
+            recorder = LandmarkRecorder(
+                record_path, dtype=RECORD_DTYPE,
+                metadata={"source": "SquatCounter", "started_at": start_time})
+
+            def record(captured_at, pose_landmarks):
+                recorder.append(landmarks_to_array(pose_landmarks),
+                                timestamp=captured_at - recorder.clock_origin)
+
+        # Landmarks come back normalized to the full frame, so we can draw
+        # straight onto the frames
+        pipeline = LivePipeline(cap, processor.process, threaded=PIPELINED,
+                                on_result=record if recorder else None,
+                                timer=timer)
+        with pipeline:
+            for image, pose_landmarks in pipeline.frames():
+                try:
+                    landmarks = pose_landmarks.landmark
+
+                    with timer.stage("reps"):
+                        angle = session.update(landmarks)
+                    current_exercise = session.current_exercise
+
+                    if current_exercise:
+
+                        image_height, image_width, _ = image.shape
+                        ex = exercises[current_exercise]
+                        a = [landmarks[ex.angle_points[0]].x,
+                             landmarks[ex.angle_points[0]].y]
+                        b = [landmarks[ex.angle_points[1]].x,
+                             landmarks[ex.angle_points[1]].y]
+                        c = [landmarks[ex.angle_points[2]].x,
+                             landmarks[ex.angle_points[2]].y]
+
+                        a_pixel = tuple(np.multiply(
+                            a, [image_width, image_height]).astype(int))
+                        b_pixel = tuple(np.multiply(
+                            b, [image_width, image_height]).astype(int))
+                        c_pixel = tuple(np.multiply(
+                            c, [image_width, image_height]).astype(int))
+
+                        cv2.putText(
+                            image,
+                            str(int(angle)),
+                            b_pixel,
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            0.5,
+                            (255, 255, 255),
+                            2,
+                            cv2.LINE_AA,
+                        )
+
+                        cv2.rectangle(image, (0, 0), (300, 100),
+                                      (245, 117, 16), -1)
+                        cv2.putText(image, "REPS", (10, 30),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+                        cv2.putText(image, str(ex.counter), (10, 70),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 2)
+
+                        cv2.putText(image, "STAGE", (150, 30),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+                        cv2.putText(
+                            image,
+                            exercises[current_exercise].stage if exercises[current_exercise].stage else "",
+                            (150, 70),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            2,
+                            (255, 255, 255),
+                            2,
+                        )
+
+                        cv2.putText(
+                            image,
+                            f"Exercise: {current_exercise}",
+                            (10, 120),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            0.7,
+                            (0, 255, 0),
+                            2,
+                        )
+
+                        if current_exercise == "Squat":
+                            min_angle, max_angle = SQUAT_IDEAL_RANGE
+                            if angle < min_angle:
+                                cv2.putText(
+                                    image,
+                                    "Going too deep or leaning forward!",
+                                    (50, image_height - 50),
+                                    cv2.FONT_HERSHEY_SIMPLEX,
+                                    0.9,
+                                    (0, 0, 255),
+                                    2,
+                                )
+                            elif angle > max_angle:
+                                cv2.putText(
+                                    image,
+                                    "Not squatting low enough!",
+                                    (50, image_height - 50),
+                                    cv2.FONT_HERSHEY_SIMPLEX,
+                                    0.9,
+                                    (0, 0, 255),
+                                    2,
+                                )
+
+                except AttributeError:
+                    pass
+
+                mp_drawing.draw_landmarks(
+                    image,
+                    pose_landmarks,
+                    mp_pose.POSE_CONNECTIONS,
+                    mp_drawing.DrawingSpec(
+                        color=(245, 117, 66), thickness=2, circle_radius=2),
+                    mp_drawing.DrawingSpec(
+                        color=(245, 66, 230), thickness=2, circle_radius=2),
+                )
+
+                cv2.putText(image, pipeline.stats_text(),
+                            (10, image.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+                if show_timings:
+                    # Averages over the last second
+                    now = time.perf_counter()
+                    if now - timings_at >= 1.0:
+                        timings_text, timings_at = timer.text(), now
+                        timer.reset()
+                    cv2.putText(image, timings_text,
+                                (10, image.shape[0] - 35), cv2.FONT_HERSHEY_SIMPLEX,
+                                0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+                with timer.stage("display"):
+                    cv2.imshow("Personal Trainer", image)
+
+                    # The pipeline paces the loop; don't add latency waiting here
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord("q"):
+                    break
+                if key == ord("t"):
+                    show_timings = not show_timings
 
         cap.release()
         cv2.destroyAllWindows()
+        if recorder:
+            recorder.close()
 
         # Print session summary
         end_time = time.time()
@@ -386,8 +425,143 @@ def main():
         for name, ex in exercises.items():
             print(f"🏋️ {name} Reps: {ex.counter}")
         print(f"✅ Total Reps: {total_reps}")
+        stats = pipeline.stats()
+        print(f"📷 Frames shown: {stats['frames_shown']} "
+              f"(dropped {stats['frames_dropped']}), latency "
+              f"{stats['latency_ms']:.0f} ms (p95 {stats['latency_p95_ms']:.0f} ms)")
+        if recorder:
+            print(f"📼 Recorded {len(recorder)} frames to {record_path}")
         print("=====================================\n")
 
 
+def find_videos(paths):
+    """
+    Expands files and directories (searched recursively for
+    VIDEO_EXTENSIONS) into a sorted list of video paths.
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in files
+                              if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return sorted(videos)
+
+
+def analyze_recording(video_path):
+    """
+    Runs the exercise counters over a recorded video without drawing
+    anything, as fast as decoding and inference allow. Returns a list of
+    JSON-serializable events: one "rep" event per completed rep and a
+    final "summary" (or "error") event.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return [{"event": "error", "video": video_path,
+                 "error": "Could not open video"}]
+    frame_rate = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    events = []
+    session = ExerciseSession(verbose=False)
+    start_time = time.perf_counter()
+    frame_index = 0
+    try:
+        # Pooled estimators are reset between videos, so each recording
+        # starts with fresh tracking state
+        with pose_pool.pose(min_detection_confidence=0.5,
+                            min_tracking_confidence=0.5) as pose:
+            processor = PoseFrameProcessor(
+                pose, max_dim=MAX_INFERENCE_DIM, roi=PERSON_ROI)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                pose_landmarks = processor.process(frame)
+                if pose_landmarks:
+                    angle = session.update(pose_landmarks.landmark)
+                    if session.rep_completed:
+                        name = session.current_exercise
+                        events.append({
+                            "event": "rep",
+                            "video": video_path,
+                            "exercise": name,
+                            "rep": session.exercises[name].counter,
+                            "frame": frame_index,
+                            "time_sec": round(frame_index / frame_rate, 3),
+                            "angle": round(angle, 1),
+                        })
+                frame_index += 1
+    except Exception as e:
+        events.append({"event": "error", "video": video_path, "error": str(e)})
+        return events
+    finally:
+        cap.release()
+
+    reps = {name: ex.counter for name, ex in session.exercises.items()}
+    events.append({
+        "event": "summary",
+        "video": video_path,
+        "frames": frame_index,
+        "duration_sec": round(frame_index / frame_rate, 2),
+        "reps": reps,
+        "total_reps": sum(reps.values()),
+        "processing_sec": round(time.perf_counter() - start_time, 2),
+    })
+    return events
+
+
+def run_headless(paths, output, jobs=1):
+    """
+    Analyzes every video under paths and writes the events as JSON Lines
+    to output (a file object), one video at a time and in path order.
+    With jobs > 1, videos are analyzed in that many processes.
+    """
+    videos = find_videos(paths)
+    if jobs <= 1:
+        results = map(analyze_recording, videos)
+        pool = None
+    else:
+        # MediaPipe isn't fork-safe
+        pool = ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context("spawn"))
+        results = pool.map(analyze_recording, videos)
+    try:
+        for events in results:
+            for event in events:
+                output.write(json.dumps(event) + "\n")
+            output.flush()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Live exercise trainer. With --headless, counts reps in "
+                    "recorded videos instead and writes JSON Lines.")
+    parser.add_argument("--headless", nargs="+", metavar="PATH",
+                        help="Video files or directories to analyze "
+                             "without a camera or window.")
+    parser.add_argument("-o", "--output",
+                        help="JSON Lines output file (default: stdout).")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Videos to analyze in parallel (headless).")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Save the live session's landmarks to FILE "
+                             "(a .lmk landmark recording).")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.headless:
+        if args.output:
+            with open(args.output, "w") as output:
+                run_headless(args.headless, output, args.jobs)
+        else:
+            run_headless(args.headless, sys.stdout, args.jobs)
+    else:
+        main(args.record)
@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections go to the live analysis
+endpoint (squatTracker/live_analysis.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since they use the ORM and settings
+from squatTracker.jobs import prewarm_in_process_workers  # noqa: E402
+from squatTracker.live_analysis import live_analysis  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await live_analysis(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
+
+# Load pose models for the in-process analysis workers before the first
+# upload arrives
+prewarm_in_process_workers()
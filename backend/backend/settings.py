@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'squatTracker.metrics.MetricsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,3 +131,68 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Allow all for dev (use CORS_ALLOWED_ORIGINS in prod)
 CORS_ALLOW_ALL_ORIGINS = True
+# Let browser clients read the per-stage timings of API responses
+CORS_EXPOSE_HEADERS = ['Server-Timing']
+
+# Background squat analysis (squatTracker/jobs.py)
+# Max videos analyzed at once by the web process's worker threads
+ANALYSIS_WORKERS = 2
+# Set to False when jobs are run by `manage.py analysis_worker` instead
+ANALYSIS_RUN_IN_PROCESS = True
+# Build and warm up pose estimators when a worker starts
+ANALYSIS_PREWARM = True
+# Processes used to analyze a single video (1 = sequential, tracking mode)
+ANALYSIS_CHUNK_WORKERS = 1
+# Analyze frames at about this rate instead of every frame (None = all)
+ANALYSIS_TARGET_FPS = None
+# Sample densely only near the rep thresholds (needs ANALYSIS_TARGET_FPS)
+ANALYSIS_ADAPTIVE_SAMPLING = False
+# Downscale frames to this longer side before pose inference (None = off)
+ANALYSIS_MAX_INFERENCE_DIM = None
+# Crop frames to the person found in the previous frame
+ANALYSIS_PERSON_ROI = False
+# Skip the still lead-in and lead-out of each video, found by a cheap
+# motion pre-pass (squatTracker/motion.py)
+ANALYSIS_AUTO_TRIM = False
+
+# Analyze a low-resolution, constant frame rate proxy of each video, made
+# once under MEDIA_ROOT/proxies (squatTracker/proxy.py)
+ANALYSIS_PROXY = True
+# Longer side of the proxy, in pixels
+ANALYSIS_PROXY_MAX_DIM = 640
+# Proxy frame rate; sources with a lower rate keep theirs
+ANALYSIS_PROXY_FPS = 30
+
+# Directory to keep each job's landmarks in, as job-<id>.lmk landmark
+# recordings (squatTracker/landmark_recording.py); None disables it
+ANALYSIS_RECORDINGS_DIR = None
+
+# Per-frame landmark cache (squatTracker/landmark_cache.py); None disables it
+LANDMARK_CACHE_DIR = BASE_DIR / "landmark_cache"
+# Least recently used entries are evicted above this size
+LANDMARK_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Largest binary body accepted by /api/analyze/landmarks/
+LANDMARK_UPLOAD_MAX_BYTES = 64 * 1024 ** 2
+
+# Live analysis WebSocket (squatTracker/live_analysis.py, ASGI only)
+# Threads running pose inference for all live connections together
+LIVE_INFERENCE_WORKERS = 4
+
+# How /api/videos/<id>/stream/ and rep clips hand files to the front
+# server (squatTracker/media_streaming.py): None streams them from Django,
+# "x-accel-redirect" for nginx (with an internal location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or "x-sendfile" for
+# Apache mod_xsendfile / lighttpd
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
+# Service metrics at /api/metrics/ (squatTracker/metrics.py), shared by all
+# processes through this SQLite file; None disables them
+METRICS_DB = BASE_DIR / "metrics.sqlite3"
+# Seconds each process buffers metric updates before writing them out
+METRICS_FLUSH_INTERVAL = 5
+
+# Seconds between database polls of a job's Server-Sent Events stream
+# (/api/analyze/<id>/events/, squatTracker/job_events.py)
+ANALYSIS_EVENTS_POLL_INTERVAL = 0.5
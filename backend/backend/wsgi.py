@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_wsgi_application()
+
+# Load pose models for the in-process analysis workers before the first
+# upload arrives
+from squatTracker.jobs import prewarm_in_process_workers  # noqa: E402
+
+prewarm_in_process_workers()
@@ -1,31 +1,63 @@
 from django.contrib import admin
-from .models import SquatAnalysis, WorkoutVideo
+from .models import SquatAnalysis, WorkoutVideo, AnalysisJob
+from django.urls import reverse
 from django.utils.html import format_html
 
 
 @admin.register(SquatAnalysis)
 class SquatAnalysisAdmin(admin.ModelAdmin):
-    list_display = ('rep', 'duration_sec', 'min_depth',
+    list_display = ('rep', 'job', 'duration_sec', 'min_depth',
                     'valid_depth', 'knees_over_toes', 'back_straight')
     list_filter = ('valid_depth', 'back_straight', 'knees_over_toes')
+    raw_id_fields = ('job',)
     search_fields = ('rep',)
 
 
 @admin.register(WorkoutVideo)
 class WorkoutVideoAdmin(admin.ModelAdmin):
-    list_display = ('title', 'uploaded_at', 'video_preview')
+    list_display = ('title', 'uploaded_at', 'thumbnail')
     search_fields = ('title',)
-    readonly_fields = ('video_preview',)
+    readonly_fields = ('video_preview', 'poster', 'preview')
+
+    def thumbnail(self, obj):
+        # List pages only get the poster and the small preview loop
+        # (fetched when played), never the original
+        if obj.preview:
+            return format_html(
+                '<video width="160" controls muted loop preload="none" '
+                'poster="{}" src="{}"></video>',
+                obj.poster.url if obj.poster else '', obj.preview.url,
+            )
+        if obj.poster:
+            return format_html('<img src="{}" width="160" loading="lazy" alt="">',
+                               obj.poster.url)
+        return "No preview yet" if obj.video else "No video"
+    thumbnail.short_description = "Preview"
 
     def video_preview(self, obj):
         if obj.video:
+            # The range-capable stream URL, fetched only once played when
+            # there's a poster to show meanwhile
+            if obj.poster:
+                attrs = format_html('preload="none" poster="{}"', obj.poster.url)
+            else:
+                attrs = 'preload="metadata"'
             return format_html(
-                f'<video width="250" controls>'
-                f'<source src="{obj.video.url}" type="video/mp4">'
-                f'Your browser does not support the video tag.'
-                f'</video>'
+                '<video width="250" controls {}>'
+                '<source src="{}" type="video/mp4">'
+                'Your browser does not support the video tag.'
+                '</video>',
+                attrs, reverse('video-stream', args=[obj.pk]),
             )
         return "No video"
-    video_preview.short_description = "Preview"
+    video_preview.short_description = "Video"
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'frames_done', 'total_frames',
+                    'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('started_at', 'finished_at')
 
 # Register your models here.
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SquattrackerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "squatTracker"
+
+    def ready(self):
+        from . import metrics
+        metrics.install()
@@ -0,0 +1,165 @@
+"""
+Offline (re)analysis of the WorkoutVideo archive, used by
+`manage.py analyze_archive`.
+
+Videos are matched with their analyses by content hash, like re-uploads
+through /api/analyze/. Each video that needs work gets an ordinary
+queued AnalysisJob before anything is analyzed, so the jobs table is the
+batch's checkpoint: a finished video has a done job, and rerunning the
+command after it was killed picks up the queued jobs it left instead of
+starting over. The jobs run through the normal run_job(), each in one
+of a pool of processes.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.db import close_old_connections, connections
+
+from .jobs import claim_job, requeue_running_jobs, run_job
+from .landmark_cache import file_sha256
+from .models import AnalysisJob, WorkoutVideo
+
+# Why a video is (re)analyzed
+NEW = "new"
+FAILED = "failed"
+STALE = "stale"
+QUEUED = "queued"
+
+
+def hash_videos(videos, rehash=False, log=None):
+    """
+    Fills in video_hash for the videos that don't have one yet (all of
+    them with rehash=True), saved in one bulk update. Videos whose file
+    is missing are skipped. Returns the videos whose file exists.
+    """
+    found, changed = [], []
+    for video in videos:
+        path = video.video.path
+        if not os.path.exists(path):
+            if log:
+                log(f"Missing file for video {video.pk}: {path}")
+            continue
+        found.append(video)
+        if rehash or not video.video_hash:
+            video_hash = file_sha256(path)
+            if video_hash != video.video_hash:
+                video.video_hash = video_hash
+                changed.append(video)
+    WorkoutVideo.objects.bulk_update(changed, ["video_hash"], batch_size=500)
+    return found
+
+
+def plan(videos, stale_before=None, retry_failed=True):
+    """
+    Decides what to do with each video, from the newest whole-video job
+    for its content. Returns (work, running): work lists (video, reason, job)
+    for the videos to analyze, where job is a queued job to reuse or
+    None; running lists the videos whose job is still marked running.
+
+    A video needs analysis when it has no job (NEW), its last job failed
+    (FAILED, unless retry_failed is False), or its last result is older
+    than stale_before (STALE). A queued job (QUEUED), e.g. left by a
+    killed run, is reused.
+    """
+    latest = {}
+    jobs = (AnalysisJob.objects
+            .filter(video_hash__in={video.video_hash for video in videos},
+                    start_time=None, end_time=None)
+            .order_by("created_at", "pk"))
+    for job in jobs:
+        latest[job.video_hash] = job
+
+    work, running = [], []
+    seen = set()
+    for video in videos:
+        if video.video_hash in seen:
+            continue  # Same content as an earlier video
+        seen.add(video.video_hash)
+        job = latest.get(video.video_hash)
+        if job is None:
+            work.append((video, NEW, None))
+        elif job.status == AnalysisJob.QUEUED:
+            work.append((video, QUEUED, job))
+        elif job.status == AnalysisJob.RUNNING:
+            running.append(video)
+        elif job.status == AnalysisJob.FAILED:
+            if retry_failed:
+                work.append((video, FAILED, None))
+        elif stale_before and job.finished_at and job.finished_at < stale_before:
+            work.append((video, STALE, None))
+    return work, running
+
+
+def enqueue(work):
+    """
+    Creates the missing jobs for planned work in one bulk insert and
+    returns the ids of all the work's jobs, in order.
+    """
+    new_jobs = [AnalysisJob(video_path=video.video.path,
+                            video_hash=video.video_hash)
+                for video, _, job in work if job is None]
+    AnalysisJob.objects.bulk_create(new_jobs)
+    created = iter(new_jobs)
+    return [(job or next(created)).pk for _, _, job in work]
+
+
+def _analyze(job_id):
+    """
+    Runs one queued job in a pool process. Returns (job_id, status,
+    frames, seconds); status is None if the job was no longer queued.
+    """
+    try:
+        job = claim_job(job_id)
+        if job is None:
+            return job_id, None, 0, 0.0
+        start = time.perf_counter()
+        # Reps are saved in bulk: there is nobody to stream them to
+        run_job(job, incremental=False)
+        job.refresh_from_db()
+        return (job_id, job.status, job.total_frames,
+                time.perf_counter() - start)
+    finally:
+        close_old_connections()
+
+
+def run(job_ids, processes, log=None):
+    """
+    Analyzes the given queued jobs in a pool of `processes` processes
+    and returns {"done": n, "failed": n, "skipped": n, "frames": n,
+    "seconds": wall time}. If interrupted, jobs this run had started are
+    put back on the queue, so the next run redoes them.
+    """
+    totals = {"done": 0, "failed": 0, "skipped": 0, "frames": 0}
+    start = time.perf_counter()
+    # Children must not inherit the parent's database connections
+    connections.close_all()
+    # spawn: MediaPipe isn't fork-safe (see _iter_chunked_landmarks)
+    context = multiprocessing.get_context("spawn")
+    # The children import this module only once django.setup() has run
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                               initializer=django.setup)
+    pending = {pool.submit(_analyze, job_id): job_id for job_id in job_ids}
+    try:
+        for future in as_completed(pending):
+            job_id, status, frames, seconds = future.result()
+            del pending[future]
+            if status is None:
+                totals["skipped"] += 1
+                continue
+            totals[status] += 1
+            totals["frames"] += frames
+            if log:
+                finished = totals["done"] + totals["failed"] + totals["skipped"]
+                log(f"[{finished}/{len(job_ids)}] job {job_id} {status}: "
+                    f"{frames} frames in {seconds:.1f}s")
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        requeue_running_jobs(
+            AnalysisJob.objects.filter(pk__in=list(pending.values())))
+        raise
+    pool.shutdown()
+    totals["seconds"] = time.perf_counter() - start
+    return totals
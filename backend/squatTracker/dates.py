@@ -0,0 +1,25 @@
+"""
+Parsing of the date arguments shared by the API's query parameters and
+the management commands.
+"""
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse_datetime_param(value):
+    """
+    Parses an ISO 8601 date or datetime into an aware datetime (dates
+    mean midnight in the current time zone). Raises ValueError if value
+    is neither.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value!r}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
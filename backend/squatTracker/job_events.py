@@ -0,0 +1,200 @@
+"""
+Server-Sent Events for analysis jobs, so clients see reps while a long
+video is still being analyzed instead of only when the job is done.
+
+The stream follows the job through the database, so it works wherever
+the job runs (a web worker thread or `manage.py analysis_worker`),
+polling it every settings.ANALYSIS_EVENTS_POLL_INTERVAL seconds. The
+analysis reports progress every PROGRESS_INTERVAL_FRAMES frames. It
+writes reps in bulk, except while a stream keeps the job's
+watched_until in the future: then it saves each rep as soon as it is
+detected (and those found before the stream opened within a second or
+so, see jobs.run_job).
+Events:
+
+    event: job        {"job_id": 7, "status_url": "..."}   (first)
+    event: progress   {"status": "running", "frames_done": 300,
+                       "total_frames": 900, "progress": 0.333}
+    id: 3
+    event: rep        {"id": 412, "rep": 3, "min_depth": 78.2,
+                       "duration_sec": 2.1, "start_sec": 9.4, ...}
+    event: done       {"result": [...]}  or  event: failed  {"error": "..."}
+
+The stream ends after done/failed. Rep events carry the rep number as
+their event id, so a reconnecting EventSource (which sends
+Last-Event-ID) picks up after the last rep it got; the "id" in their
+data is the SquatAnalysis row, for /api/squats/<id>/clip/ and /still/.
+Quiet periods are filled with a comment line every KEEPALIVE_SECONDS,
+which keeps proxies from closing the connection.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .models import AnalysisJob, SquatAnalysis
+from .serializers import AnalysisJobSerializer
+
+KEEPALIVE_SECONDS = 15
+# How far ahead a stream pushes its job's watched_until; renewed when
+# half of it is left
+WATCH_SECONDS = 10
+# EventSource reconnect delay (milliseconds)
+RETRY_MILLISECONDS = 2000
+
+REP_FIELDS = ("id", "rep", "min_depth", "duration_sec", "valid_depth",
+              "knees_over_toes", "back_straight", "start_sec", "end_sec",
+              "bottom_sec")
+
+
+def format_event(event, data, event_id=None):
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets text/event-stream through DRF's content negotiation (an
+    EventSource asks for nothing else). Views stream the events
+    themselves; Response data sent this way (e.g. a 404) becomes a
+    single "error" event.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event("error", data).encode()
+
+
+class JobEvents:
+    """
+    Event state of one stream: what the client has been sent so far.
+    """
+
+    def __init__(self, job, last_rep=0):
+        self.job_id = job.pk
+        self.last_rep = last_rep
+        self.progress = None
+        self.finished = False
+
+    def poll(self):
+        """
+        Returns the events since the last call, as text. Sets finished
+        once the job is done or failed.
+        """
+        job = AnalysisJob.objects.get(pk=self.job_id)
+        events = []
+
+        if job.status in (AnalysisJob.QUEUED, AnalysisJob.RUNNING):
+            now = timezone.now()
+            if (job.watched_until is None or
+                    job.watched_until - now < timedelta(seconds=WATCH_SECONDS / 2)):
+                AnalysisJob.objects.filter(pk=self.job_id).update(
+                    watched_until=now + timedelta(seconds=WATCH_SECONDS))
+
+        progress = (job.frames_done, job.total_frames)
+        if progress != self.progress and job.status != AnalysisJob.DONE:
+            self.progress = progress
+            data = AnalysisJobSerializer(job).data
+            events.append(format_event("progress", {
+                key: data[key] for key in
+                ("status", "frames_done", "total_frames", "progress")}))
+
+        # Reps are saved before the job is marked done, so this sees all
+        # of them once it is
+        reps = (SquatAnalysis.objects
+                .filter(job_id=self.job_id, rep__gt=self.last_rep)
+                .order_by("rep")
+                .values(*REP_FIELDS))
+        for rep in reps:
+            events.append(format_event("rep", rep, event_id=rep["rep"]))
+            self.last_rep = rep["rep"]
+
+        if job.status == AnalysisJob.DONE:
+            events.append(format_event("done", {"result": job.result}))
+            self.finished = True
+        elif job.status == AnalysisJob.FAILED:
+            events.append(format_event("failed", {"error": job.error}))
+            self.finished = True
+        return "".join(events)
+
+
+def _poll_interval():
+    return getattr(settings, "ANALYSIS_EVENTS_POLL_INTERVAL", 0.5)
+
+
+def _opening(job):
+    return (f"retry: {RETRY_MILLISECONDS}\n\n" +
+            format_event("job", {
+                "job_id": job.pk,
+                "status_url": reverse("analysis-job", args=[job.pk]),
+            }))
+
+
+def _stream(job, state):
+    yield _opening(job)
+    quiet_since = time.monotonic()
+    while True:
+        events = state.poll()
+        if events:
+            yield events
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            quiet_since = time.monotonic()
+        if state.finished:
+            return
+        time.sleep(_poll_interval())
+
+
+async def _astream(job, state):
+    # Same as _stream(), without holding a thread between polls
+    poll = sync_to_async(state.poll)
+    yield _opening(job)
+    quiet_since = time.monotonic()
+    while True:
+        events = await poll()
+        if events:
+            yield events
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            quiet_since = time.monotonic()
+        if state.finished:
+            return
+        await asyncio.sleep(_poll_interval())
+
+
+def job_event_response(request, job):
+    """
+    A streaming text/event-stream response following job until it
+    finishes. Resumes after the Last-Event-ID rep if the client sent
+    one. Under ASGI the events come from an async generator, so an idle
+    stream doesn't tie up a thread; under WSGI it needs one per stream.
+    """
+    try:
+        last_rep = int(request.META.get("HTTP_LAST_EVENT_ID") or 0)
+    except ValueError:
+        last_rep = 0
+    state = JobEvents(job, last_rep)
+    django_request = getattr(request, "_request", request)
+    if isinstance(django_request, ASGIRequest):
+        content = _astream(job, state)
+    else:
+        content = _stream(job, state)
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,305 @@
+"""
+Background execution of squat analysis jobs.
+
+SquatAnalysisView stores each upload as an AnalysisJob row and returns
+immediately. The jobs table is the queue: a worker claims the oldest queued
+row with a conditional UPDATE, so the web process's own worker threads and
+any `manage.py analysis_worker` processes can share it without a broker.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .models import AnalysisJob, WorkoutVideo
+from .pose_estimation import pose_pool
+from .previews import make_previews
+from .proxy import ensure_proxy
+from .squat_analysis import analyze_squat_video
+
+logger = logging.getLogger(__name__)
+
+# How often a running analysis checks whether anyone is watching it
+WATCH_CHECK_SECONDS = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Returns the process-wide worker pool, creating it on first use.
+    Its size (settings.ANALYSIS_WORKERS) bounds how many videos this
+    process analyzes at once.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ANALYSIS_WORKERS", 2),
+                thread_name_prefix="analysis",
+            )
+    return _executor
+
+
+def prewarm_pose_estimators(count):
+    """
+    Builds and warms up `count` pooled pose estimators with the options
+    analyses will use, so the first job after a worker starts doesn't pay
+    for model loading. Does nothing if settings.ANALYSIS_PREWARM is False.
+    """
+    if not getattr(settings, "ANALYSIS_PREWARM", True):
+        return
+    pose_pool.max_idle = max(pose_pool.max_idle, count)
+    # Chunked analysis always runs MediaPipe in static mode
+    pose_pool.prewarm(
+        count, static_image_mode=getattr(settings, "ANALYSIS_CHUNK_WORKERS", 1) > 1)
+
+
+def prewarm_in_process_workers():
+    """
+    Prewarms one estimator per in-process worker thread, in the
+    background. Called when the web application is loaded.
+    """
+    if getattr(settings, "ANALYSIS_RUN_IN_PROCESS", True):
+        _get_executor().submit(
+            prewarm_pose_estimators, getattr(settings, "ANALYSIS_WORKERS", 2))
+
+
+def find_reusable_job(video_hash, start_time=None, end_time=None):
+    """
+    Returns the most recent job for the same video content and time range
+    that is done, queued or running, so an identical upload can share its
+    result instead of being analyzed again. Failed jobs are not reused.
+    """
+    return (AnalysisJob.objects
+            .filter(video_hash=video_hash, start_time=start_time,
+                    end_time=end_time)
+            .exclude(status=AnalysisJob.FAILED)
+            .order_by("-created_at", "-pk")
+            .first())
+
+
+def enqueue_analysis(video_path, video_hash="", start_time=None, end_time=None):
+    """
+    Creates a queued AnalysisJob for video_path (or the part of it between
+    start_time and end_time) and, unless settings.ANALYSIS_RUN_IN_PROCESS
+    is False, wakes a worker thread once the row is committed.
+    """
+    job = AnalysisJob.objects.create(
+        video_path=video_path, video_hash=video_hash,
+        start_time=start_time, end_time=end_time)
+    if getattr(settings, "ANALYSIS_RUN_IN_PROCESS", True):
+        transaction.on_commit(lambda: _get_executor().submit(drain_queue))
+    return job
+
+
+def claim_job(job_id):
+    """
+    Atomically moves a queued job to "running" and returns it, or
+    returns None if it isn't queued (e.g. another worker claimed it).
+    """
+    claimed = AnalysisJob.objects.filter(
+        pk=job_id, status=AnalysisJob.QUEUED
+    ).update(status=AnalysisJob.RUNNING, started_at=timezone.now())
+    return AnalysisJob.objects.get(pk=job_id) if claimed else None
+
+
+def claim_next_job():
+    """
+    Atomically moves the oldest queued job to "running" and returns it,
+    or returns None if the queue is empty.
+    """
+    while True:
+        job = (AnalysisJob.objects
+               .filter(status=AnalysisJob.QUEUED)
+               .order_by("created_at", "pk")
+               .first())
+        if job is None:
+            return None
+        claimed = claim_job(job.pk)
+        if claimed:
+            return claimed
+        # Another worker got there first; try the next one
+
+
+def _recording_path(job):
+    """
+    Where to keep the job's landmark recording, or None unless
+    settings.ANALYSIS_RECORDINGS_DIR is set.
+    """
+    recordings_dir = getattr(settings, "ANALYSIS_RECORDINGS_DIR", None)
+    if not recordings_dir:
+        return None
+    os.makedirs(recordings_dir, exist_ok=True)
+    return os.path.join(recordings_dir, f"job-{job.pk}.lmk")
+
+
+def _watched(job):
+    """
+    Returns a callable telling whether an event stream is following job
+    (see AnalysisJob.watched_until), querying the database at most every
+    WATCH_CHECK_SECONDS.
+    """
+    checked_at = None
+    watched = False
+
+    def check():
+        nonlocal checked_at, watched
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= WATCH_CHECK_SECONDS:
+            checked_at = now
+            watched = AnalysisJob.objects.filter(
+                pk=job.pk, watched_until__gt=timezone.now()).exists()
+        return watched
+
+    return check
+
+
+def run_job(job, incremental=None):
+    """
+    Runs the analysis for a claimed job, recording progress as it goes
+    and the result (or error) and per-stage timings when it finishes.
+    Reps are saved as they are found while an event stream follows the
+    job (incremental=None), always (True) or never (False; bulk writes
+    only, see analyze_squat_video).
+    """
+    timer = metrics.stage_timer("analysis")
+    frames = 0
+
+    def report_progress(frames_done, total_frames):
+        nonlocal frames
+        frames = frames_done
+        with timer.stage("db"):
+            AnalysisJob.objects.filter(pk=job.pk).update(
+                frames_done=frames_done, total_frames=total_frames)
+
+    start = time.perf_counter()
+    try:
+        with timer.stage("proxy"):
+            video_path, video_hash = ensure_proxy(
+                job.video_path, job.video_hash or None)
+        result = analyze_squat_video(
+            video_path,
+            progress_callback=report_progress,
+            workers=getattr(settings, "ANALYSIS_CHUNK_WORKERS", 1),
+            target_fps=getattr(settings, "ANALYSIS_TARGET_FPS", None),
+            adaptive=getattr(settings, "ANALYSIS_ADAPTIVE_SAMPLING", False),
+            max_dim=getattr(settings, "ANALYSIS_MAX_INFERENCE_DIM", None),
+            roi=getattr(settings, "ANALYSIS_PERSON_ROI", False),
+            video_hash=video_hash,
+            job=job,
+            record_path=_recording_path(job),
+            timer=timer,
+            incremental=_watched(job) if incremental is None else incremental,
+            start_time=job.start_time,
+            end_time=job.end_time,
+            auto_trim=getattr(settings, "ANALYSIS_AUTO_TRIM", False),
+        )
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            status=AnalysisJob.FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+            timings=timer.as_dict(total=elapsed),
+        )
+        metrics.record_job(AnalysisJob.FAILED, elapsed, frames)
+    else:
+        elapsed = time.perf_counter() - start
+        timings = timer.as_dict(total=elapsed)
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            status=AnalysisJob.DONE,
+            result=result,
+            finished_at=timezone.now(),
+            timings=timings,
+        )
+        # Without decoding, the landmarks came from the cache
+        metrics.record_job(
+            AnalysisJob.DONE, elapsed, frames,
+            cached=not {"decode", "parallel_inference"} & timings.keys())
+        # After the result is in: nobody waits on these
+        _make_missing_previews(job)
+
+
+def _make_missing_previews(job):
+    """
+    Fills in the poster and preview of the WorkoutVideos of a finished
+    job's video that still lack them. prepare_video only runs in the web
+    process, so this is where videos analyzed by `manage.py
+    analysis_worker` or `analyze_archive` get theirs, cut from the proxy
+    the analysis just made. Errors are logged; the job stays done.
+    """
+    match = Q()
+    if job.video_hash:
+        match |= Q(video_hash=job.video_hash)
+    name = os.path.relpath(job.video_path, settings.MEDIA_ROOT)
+    if not name.startswith(os.pardir):
+        match |= Q(video=name)
+    if not match:
+        return
+    videos = WorkoutVideo.objects.filter(match).filter(Q(poster="") | Q(preview=""))
+    for video in videos:
+        try:
+            make_previews(video)
+        except Exception:
+            logger.exception("Could not make previews of video %s", video.pk)
+
+
+def _prepare_video(video_id):
+    close_old_connections()
+    try:
+        video = WorkoutVideo.objects.filter(pk=video_id).first()
+        if video is None:
+            return
+        # Makes the proxy first; the previews are cut from it
+        ensure_proxy(video.video.path, video.video_hash or None)
+        make_previews(video)
+    finally:
+        close_old_connections()
+
+
+def prepare_video(video):
+    """
+    Makes an uploaded video's analysis proxy, poster and preview ahead
+    of its first analysis and listing, on an in-process worker thread
+    (whatever exists already is kept).
+    """
+    if getattr(settings, "ANALYSIS_RUN_IN_PROCESS", True):
+        transaction.on_commit(
+            lambda: _get_executor().submit(_prepare_video, video.pk))
+
+
+def drain_queue():
+    """
+    Runs queued jobs until none are left. Used as the body of a worker
+    thread; closes this thread's DB connection when done.
+    """
+    close_old_connections()
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return
+            run_job(job)
+    finally:
+        close_old_connections()
+
+
+def requeue_running_jobs(jobs=None):
+    """
+    Puts jobs left in "running" by a worker that died back on the queue
+    (all of them, or those of the `jobs` queryset). Returns the number of
+    jobs requeued.
+    """
+    jobs = AnalysisJob.objects.all() if jobs is None else jobs
+    return jobs.filter(status=AnalysisJob.RUNNING).update(
+        status=AnalysisJob.QUEUED, started_at=None,
+        frames_done=0, total_frames=0)
@@ -0,0 +1,92 @@
+"""
+Joint-angle math shared by the live trainer scripts and the backend.
+
+A joint is an (a, b, c) triple of MediaPipe Pose landmark indices; its
+angle is the unsigned angle at b between b->a and b->c, in degrees in
+[0, 180], from x/y only. Degenerate joints (a or c on top of b) are 0.
+
+- joint_angles() computes any number of joints for a whole
+  (frames, 33, k) landmark array in one vectorized pass.
+- landmark_angle() / array_angle() are single-frame fast paths for
+  MediaPipe landmark lists and (33, k) arrays; they read the six
+  coordinates directly and allocate no lists or arrays.
+
+Everything uses atan2(|cross|, dot), which is the same angle as the
+acos-of-dot-product and arctan2-difference forms used before, but stays
+accurate near 0 and 180 degrees.
+"""
+import math
+
+import numpy as np
+
+# MediaPipe Pose landmark indices
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX = 31, 32
+
+# Joints used by the analyses, measured at the middle landmark
+JOINTS = {
+    "left_elbow": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    "right_elbow": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    "left_knee": (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    "right_knee": (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    # Shoulder-hip-knee: ~180 when the torso is in line with the thigh
+    "left_hip": (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    "right_hip": (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+}
+
+
+def point_angle(ax, ay, bx, by, cx, cy):
+    """
+    Angle at b formed by a->b->c, in degrees.
+    """
+    bax, bay = ax - bx, ay - by
+    bcx, bcy = cx - bx, cy - by
+    return math.degrees(math.atan2(abs(bax * bcy - bay * bcx),
+                                   bax * bcx + bay * bcy))
+
+
+def calculate_angle(a, b, c):
+    """
+    Angle at b formed by a->b->c, for three [x, y] points.
+    """
+    return point_angle(a[0], a[1], b[0], b[1], c[0], c[1])
+
+
+def landmark_angle(landmarks, joint):
+    """
+    Angle of `joint` for one frame of MediaPipe landmarks
+    (results.pose_landmarks.landmark).
+    """
+    a, b, c = landmarks[joint[0]], landmarks[joint[1]], landmarks[joint[2]]
+    return point_angle(a.x, a.y, b.x, b.y, c.x, c.y)
+
+
+def array_angle(lm, joint):
+    """
+    Angle of `joint` for one frame as a (33, k) landmark array.
+    NaN if the frame has no pose (NaN landmarks).
+    """
+    a, b, c = joint
+    return point_angle(lm.item(a, 0), lm.item(a, 1), lm.item(b, 0),
+                       lm.item(b, 1), lm.item(c, 0), lm.item(c, 1))
+
+
+def joint_angles(landmarks, joints):
+    """
+    Angles of every joint in `joints` (a sequence of (a, b, c) triples)
+    for a (frames, 33, k) landmark array, as a (frames, len(joints))
+    float64 array. Frames without a pose (NaN landmarks) give NaN.
+    """
+    index = np.asarray(joints, dtype=np.intp)
+    # One gather for all joints: (frames, joints, 3 points, x/y)
+    points = np.asarray(landmarks)[:, index, :2].astype(np.float64)
+    ba = points[:, :, 0] - points[:, :, 1]
+    bc = points[:, :, 2] - points[:, :, 1]
+    cross = ba[..., 0] * bc[..., 1] - ba[..., 1] * bc[..., 0]
+    dot = ba[..., 0] * bc[..., 0] + ba[..., 1] * bc[..., 1]
+    return np.degrees(np.arctan2(np.abs(cross), dot))
@@ -0,0 +1,136 @@
+"""
+On-disk cache of per-frame pose landmarks, so re-analyzing a video (for
+example with different rep thresholds) can skip decoding and inference.
+
+Each entry is a directory named by the cache key, holding:
+  landmarks.npy  (frames, 33, 4) float32, NaN rows for missed frames
+  frames.npy     (frames,) int64 source frame indices
+Both are opened memory-mapped. Landmarks are kept at full float32
+precision so a replay gives exactly the same reps as the original run.
+An entry's mtime is bumped on every read, and the least recently used
+entries are evicted once the cache grows past
+settings.LANDMARK_CACHE_MAX_BYTES.
+"""
+import hashlib
+import os
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_sha256(path):
+    """
+    Returns the hex SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir():
+    """
+    Returns the cache directory, or None if the cache is disabled.
+    """
+    path = getattr(settings, "LANDMARK_CACHE_DIR", None)
+    return str(path) if path else None
+
+
+def cache_key(video_hash, **estimator_options):
+    """
+    Builds a cache key from the video's content hash and the pose
+    estimator options that affect the landmarks (static_image_mode,
+    stride, max_dim, roi, ...).
+    """
+    options = ",".join(f"{k}={estimator_options[k]}"
+                       for k in sorted(estimator_options))
+    suffix = hashlib.sha256(options.encode()).hexdigest()[:12]
+    return f"{video_hash}-{suffix}"
+
+
+def load(key):
+    """
+    Returns (frame_indices, landmarks) for a cached entry, both
+    memory-mapped read-only, or None on a miss.
+    """
+    root = cache_dir()
+    if not root:
+        return None
+    entry = os.path.join(root, key)
+    try:
+        frame_indices = np.load(os.path.join(entry, "frames.npy"), mmap_mode="r")
+        landmarks = np.load(os.path.join(entry, "landmarks.npy"), mmap_mode="r")
+        os.utime(entry)  # Mark as recently used
+    except (OSError, ValueError):
+        return None
+    return frame_indices, landmarks
+
+
+def store(key, frame_indices, landmarks):
+    """
+    Writes an entry, then evicts old entries if the cache is over its size
+    cap. The entry is built in a temporary directory and renamed into
+    place, so readers never see a partial entry.
+    """
+    root = cache_dir()
+    if not root:
+        return
+    os.makedirs(root, exist_ok=True)
+    entry = os.path.join(root, key)
+    tmp = f"{entry}.tmp-{os.getpid()}-{time.monotonic_ns()}"
+    os.makedirs(tmp)
+    try:
+        np.save(os.path.join(tmp, "frames.npy"),
+                np.asarray(frame_indices, dtype=np.int64))
+        np.save(os.path.join(tmp, "landmarks.npy"),
+                np.asarray(landmarks, dtype=np.float32))
+        os.rename(tmp, entry)
+    except OSError:
+        # Most likely another worker stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    prune(getattr(settings, "LANDMARK_CACHE_MAX_BYTES", None))
+
+
+def _entries(root):
+    """
+    Lists (mtime, size_bytes, path) for every complete entry.
+    """
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if ".tmp-" in name or not os.path.isdir(path):
+            continue
+        try:
+            size = sum(e.stat().st_size for e in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+        except OSError:
+            continue  # Evicted by someone else meanwhile
+    return entries
+
+
+def prune(max_bytes):
+    """
+    Deletes least recently used entries until the cache is at most
+    max_bytes (max_bytes=0 clears it; None does nothing). Returns
+    (entries_removed, bytes_freed).
+    """
+    root = cache_dir()
+    if max_bytes is None or not root or not os.path.isdir(root):
+        return 0, 0
+    entries = sorted(_entries(root))
+    total = sum(size for _, size, _ in entries)
+    removed = freed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
@@ -0,0 +1,280 @@
+"""
+Compact on-disk format for pose landmark streams (".lmk" files): written
+frame by frame by LandmarkRecorder, opened memory-mapped by
+LandmarkRecording. Django-free, so the live scripts can record too.
+
+Layout, little-endian, version 1:
+
+  0             header (HEADER_SIZE bytes, see _HEADER)
+  HEADER_SIZE   landmarks: (frames, 33, 4) float16 or float32, NaN rows
+                for frames without a pose
+  index_offset  timestamps: (frames,) float64 seconds since the start
+                frame_indices: (frames,) int64 source frame numbers
+  meta_offset   metadata: a UTF-8 JSON object
+
+Landmark rows are appended as frames arrive, and the index, metadata and
+final header are written when the recorder is closed, so a recording
+never has to fit in memory. A file whose recorder was never closed (the
+process died) still opens: its complete landmark rows are recovered,
+numbered from 0 and timed from fps if it was known.
+
+float16 halves the size (264 bytes per frame, about 29 MB per hour at
+30 fps) and keeps coordinates to about 1e-3 relative precision; use
+float32 where results must match a live analysis bit for bit.
+"""
+import json
+import os
+import struct
+import time
+from array import array
+
+import numpy as np
+
+MAGIC = b"LMKS"
+VERSION = 1
+HEADER_SIZE = 64
+NUM_LANDMARKS = 33
+NUM_VALUES = 4  # x, y, z, visibility
+
+# magic, version, header size, bytes per value, values per landmark,
+# landmarks per frame, fps (0 = unknown), frame count, index offset
+# (0 = recorder not closed), metadata offset, metadata length
+_HEADER = struct.Struct("<4sHHBBHdQQQQ")
+
+_DTYPES = {2: np.dtype("<f2"), 4: np.dtype("<f4")}
+_TIMESTAMP_DTYPE = np.dtype("<f8")
+_INDEX_DTYPE = np.dtype("<i8")
+
+
+def _align(offset, alignment=8):
+    return -(-offset // alignment) * alignment
+
+
+class LandmarkRecorder:
+    """
+    Writes a landmark recording. Frames are added one at a time with
+    append() (live capture) or in blocks with extend() (analysis); frame
+    indices must increase. Use as a context manager, or call close().
+    """
+
+    def __init__(self, path, fps=None, dtype="float32", metadata=None):
+        self.path = path
+        self.fps = fps
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        if self.dtype not in _DTYPES.values():
+            raise ValueError(f"Unsupported dtype: {dtype!r}")
+        self.metadata = dict(metadata or {})
+        # Default timestamps are measured from here, in perf_counter time
+        self.clock_origin = time.perf_counter()
+
+        self._timestamps = array("d")
+        self._frame_indices = array("q")
+        self._missing = np.full((NUM_LANDMARKS, NUM_VALUES), np.nan,
+                                dtype=self.dtype).tobytes()
+        self._file = open(path, "wb")
+        self._write_header(0, 0, 0, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._frame_indices)
+
+    def _write_header(self, frame_count, index_offset, meta_offset, meta_length):
+        header = _HEADER.pack(
+            MAGIC, VERSION, HEADER_SIZE, self.dtype.itemsize, NUM_VALUES,
+            NUM_LANDMARKS, self.fps or 0.0, frame_count, index_offset,
+            meta_offset, meta_length)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def _next_frame_index(self, frame_index):
+        if frame_index is None:
+            return self._frame_indices[-1] + 1 if self._frame_indices else 0
+        if self._frame_indices and frame_index <= self._frame_indices[-1]:
+            raise ValueError(
+                f"Frame {frame_index} is not after frame {self._frame_indices[-1]}")
+        return frame_index
+
+    def append(self, landmarks, timestamp=None, frame_index=None):
+        """
+        Adds one frame. landmarks: (33, 4) array, or None if no pose was
+        found. frame_index defaults to the previous one plus one;
+        timestamp (seconds) defaults to frame_index / fps, or to the time
+        since the recorder was created if fps is unknown.
+        """
+        frame_index = self._next_frame_index(frame_index)
+        if timestamp is None:
+            timestamp = (frame_index / self.fps if self.fps
+                         else time.perf_counter() - self.clock_origin)
+        if landmarks is None:
+            data = self._missing
+        else:
+            landmarks = np.asarray(landmarks, dtype=self.dtype)
+            if landmarks.shape != (NUM_LANDMARKS, NUM_VALUES):
+                raise ValueError(f"Expected ({NUM_LANDMARKS}, {NUM_VALUES}) "
+                                 f"landmarks, got {landmarks.shape}")
+            data = landmarks.tobytes()
+        self._file.write(data)
+        self._frame_indices.append(frame_index)
+        self._timestamps.append(timestamp)
+
+    def extend(self, frame_indices, landmarks, timestamps=None):
+        """
+        Adds a block of frames: (frames,) indices and a matching
+        (frames, 33, 4) array. timestamps default to index / fps, which
+        needs fps.
+        """
+        landmarks = np.asarray(landmarks, dtype=self.dtype)
+        if landmarks.shape[1:] != (NUM_LANDMARKS, NUM_VALUES):
+            raise ValueError(f"Expected (frames, {NUM_LANDMARKS}, {NUM_VALUES}) "
+                             f"landmarks, got {landmarks.shape}")
+        frame_indices = np.asarray(frame_indices, dtype=np.int64)
+        if len(frame_indices) != len(landmarks):
+            raise ValueError("Need one frame index per landmarks row")
+        if not len(frame_indices):
+            return
+        self._next_frame_index(int(frame_indices[0]))
+        if np.any(np.diff(frame_indices) <= 0):
+            raise ValueError("Frame indices must increase")
+        if timestamps is None:
+            if not self.fps:
+                raise ValueError("timestamps are required when fps is unknown")
+            timestamps = frame_indices / self.fps
+
+        self._file.write(np.ascontiguousarray(landmarks).tobytes())
+        self._frame_indices.extend(frame_indices.tolist())
+        self._timestamps.extend(np.asarray(timestamps, dtype=np.float64).tolist())
+
+    def close(self):
+        """
+        Writes the index, metadata and final header.
+        """
+        if self._file.closed:
+            return
+        frame_count = len(self._frame_indices)
+        index_offset = _align(
+            HEADER_SIZE + frame_count * NUM_LANDMARKS * NUM_VALUES *
+            self.dtype.itemsize)
+        meta = json.dumps(self.metadata).encode()
+        meta_offset = index_offset + frame_count * 16
+
+        f = self._file
+        f.write(b"\0" * (index_offset - f.tell()))
+        f.write(np.asarray(self._timestamps, dtype=_TIMESTAMP_DTYPE).tobytes())
+        f.write(np.asarray(self._frame_indices, dtype=_INDEX_DTYPE).tobytes())
+        f.write(meta)
+        f.seek(0)
+        self._write_header(frame_count, index_offset, meta_offset, len(meta))
+        f.close()
+
+
+def _memmap(path, dtype, offset, shape):
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+class LandmarkRecording:
+    """
+    A landmark recording opened for reading. landmarks, timestamps and
+    frame_indices are read-only arrays memory-mapped from the file, so
+    opening is instant whatever the length and only the frames actually
+    touched are read from disk.
+
+    Indexing (recording[i], recording[a:b]) returns landmark rows by
+    position. frame() and at_time() look frames up by source frame index
+    and by time; between() returns a time range as a (frame_indices,
+    landmarks) block, the shape analyze_squat_landmarks() takes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < _HEADER.size or header[:4] != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        (_, version, header_size, itemsize, values, landmarks_per_frame, fps,
+         frame_count, index_offset, meta_offset,
+         meta_length) = _HEADER.unpack_from(header)
+        if version > VERSION:
+            raise ValueError(f"Unsupported recording version {version}")
+        if itemsize not in _DTYPES:
+            raise ValueError(f"Unsupported landmark size {itemsize}")
+
+        self.version = version
+        self.fps = fps or None
+        self.dtype = _DTYPES[itemsize]
+        frame_shape = (landmarks_per_frame, values)
+        frame_bytes = landmarks_per_frame * values * itemsize
+        # Still being written, or the recorder was never closed
+        self.complete = index_offset != 0
+
+        if not self.complete:
+            frame_count = (os.path.getsize(path) - header_size) // frame_bytes
+        self.landmarks = _memmap(path, self.dtype, header_size,
+                                 (frame_count,) + frame_shape)
+        if self.complete:
+            self.timestamps = _memmap(path, _TIMESTAMP_DTYPE, index_offset,
+                                      (frame_count,))
+            self.frame_indices = _memmap(
+                path, _INDEX_DTYPE, index_offset + frame_count * 8,
+                (frame_count,))
+            with open(path, "rb") as f:
+                f.seek(meta_offset)
+                self.metadata = json.loads(f.read(meta_length) or b"{}")
+        else:
+            self.frame_indices = np.arange(frame_count, dtype=np.int64)
+            self.timestamps = (self.frame_indices / self.fps if self.fps else
+                               np.full(frame_count, np.nan))
+            self.metadata = {}
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    def __getitem__(self, key):
+        return self.landmarks[key]
+
+    @property
+    def duration(self):
+        """
+        Seconds from the first to the last frame.
+        """
+        if not len(self):
+            return 0.0
+        return float(self.timestamps[-1] - self.timestamps[0])
+
+    def frame(self, frame_index):
+        """
+        Landmarks of the given source frame. Raises KeyError if that
+        frame wasn't recorded (e.g. it was skipped by sampling).
+        """
+        position = int(np.searchsorted(self.frame_indices, frame_index))
+        if (position == len(self) or
+                self.frame_indices[position] != frame_index):
+            raise KeyError(frame_index)
+        return self.landmarks[position]
+
+    def index_at(self, seconds):
+        """
+        Position of the frame shown at `seconds`: the last one whose
+        timestamp is at or before it (the first frame for earlier times).
+        """
+        position = int(np.searchsorted(self.timestamps, seconds, side="right"))
+        return min(max(position - 1, 0), len(self) - 1)
+
+    def at_time(self, seconds):
+        return self.landmarks[self.index_at(seconds)]
+
+    def between(self, start=None, end=None):
+        """
+        Returns (frame_indices, landmarks) views for the frames with
+        start <= timestamp < end (either bound may be None).
+        """
+        lo = 0 if start is None else int(
+            np.searchsorted(self.timestamps, start, side="left"))
+        hi = len(self) if end is None else int(
+            np.searchsorted(self.timestamps, end, side="left"))
+        return self.frame_indices[lo:hi], self.landmarks[lo:hi]
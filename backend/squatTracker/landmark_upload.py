@@ -0,0 +1,128 @@
+"""
+Request formats for /api/analyze/landmarks/, used by clients that run
+pose estimation on the device and only upload the landmark time series.
+
+JSON (Content-Type: application/json):
+
+    {"fps": 30,
+     "landmarks": [[[x, y, z, visibility], ...33 rows], ...one per frame],
+     "frames": [0, 2, 4, ...]}
+
+  A frame without a pose is null. Rows need at least x and y. "frames"
+  (optional) gives each entry's source frame index, for sampled series;
+  by default the entries are consecutive frames.
+
+Binary (Content-Type: application/octet-stream, ?fps=30[&values=4]):
+
+  The raw little-endian float32 array of shape (frames, 33, values),
+  NaN for frames without a pose. values is the number of floats per
+  landmark (2 to 4, default 4). Frames are consecutive. This is the
+  compact format: about 530 bytes per frame, and no parsing beyond a
+  memory copy.
+
+Both map coordinates the way MediaPipe does: x and y normalized to the
+frame, y pointing down.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .pose_estimation import NUM_LANDMARKS
+
+LANDMARK_DTYPE = np.dtype("<f4")
+
+
+class LandmarkArrayParser(BaseParser):
+    """
+    Reads an application/octet-stream body as bytes, refusing bodies over
+    settings.LANDMARK_UPLOAD_MAX_BYTES.
+    """
+    media_type = "application/octet-stream"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        limit = getattr(settings, "LANDMARK_UPLOAD_MAX_BYTES", 64 * 1024 ** 2)
+        body = stream.read(limit + 1) if stream is not None else b""
+        if len(body) > limit:
+            raise ParseError(f"Landmark uploads are limited to {limit} bytes.")
+        return body
+
+
+def _parse_frame_rate(value):
+    try:
+        frame_rate = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid fps: {value!r}")
+    if not math.isfinite(frame_rate) or frame_rate <= 0:
+        raise ValueError(f"Invalid fps: {value!r}")
+    return frame_rate
+
+
+def _parse_frame_indices(value, count):
+    if value is None:
+        return None
+    if not isinstance(value, list) or len(value) != count:
+        raise ValueError("frames must list one index per landmarks entry")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in value):
+        raise ValueError("frames must be integers")
+    if value and (value[0] < 0 or any(b <= a for a, b in zip(value, value[1:]))):
+        raise ValueError("frames must be increasing and non-negative")
+    return value
+
+
+def parse_landmark_json(data):
+    """
+    Returns (frame_rate, frame_indices or None, landmarks) from a JSON
+    request body. Raises ValueError if it is malformed.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    frame_rate = _parse_frame_rate(data.get("fps"))
+    frames = data.get("landmarks")
+    if not isinstance(frames, list) or not frames:
+        raise ValueError("landmarks must be a non-empty list of frames")
+
+    present = [i for i, frame in enumerate(frames) if frame is not None]
+    try:
+        values = np.asarray([frames[i] for i in present], dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("landmarks must contain numeric [x, y, ...] rows")
+    if not present:
+        values = values.reshape(0, NUM_LANDMARKS, 4)
+    if (values.ndim != 3 or values.shape[1] != NUM_LANDMARKS or
+            not 2 <= values.shape[2] <= 4):
+        raise ValueError(
+            f"Each frame must have {NUM_LANDMARKS} rows of [x, y, ...]")
+
+    if len(present) == len(frames):
+        landmarks = values
+    else:
+        landmarks = np.full((len(frames),) + values.shape[1:], np.nan,
+                            dtype=np.float32)
+        landmarks[present] = values
+    frame_indices = _parse_frame_indices(data.get("frames"), len(frames))
+    return frame_rate, frame_indices, landmarks
+
+
+def parse_landmark_array(body, params):
+    """
+    Returns (frame_rate, None, landmarks) from a binary request body and
+    its query parameters. Raises ValueError if they are malformed.
+    """
+    frame_rate = _parse_frame_rate(params.get("fps"))
+    try:
+        values = int(params.get("values", 4))
+    except ValueError:
+        raise ValueError(f"Invalid values: {params['values']!r}")
+    if not 2 <= values <= 4:
+        raise ValueError("values must be between 2 and 4")
+
+    frame_bytes = NUM_LANDMARKS * values * LANDMARK_DTYPE.itemsize
+    if not body or len(body) % frame_bytes:
+        raise ValueError(
+            f"Body must hold whole frames of {frame_bytes} bytes")
+    landmarks = np.frombuffer(body, dtype=LANDMARK_DTYPE).reshape(
+        -1, NUM_LANDMARKS, values)
+    return frame_rate, None, landmarks
@@ -0,0 +1,318 @@
+"""
+Live squat coaching over a WebSocket, served by the ASGI application
+(backend/asgi.py hands "websocket" connections to live_analysis(); HTTP
+still goes to Django).
+
+Clients connect to /ws/live/ (optionally ?fps=<camera frame rate>, used
+for rep durations) and stream one frame per message, either
+
+- binary: a JPEG (or PNG) encoded camera frame. The server runs it
+  through a pooled MediaPipe estimator in tracking mode, or
+- text: {"landmarks": [[x, y, z, visibility], ...33 rows], "frame": n}
+  for clients that run pose estimation themselves. "landmarks" may be
+  null when no pose was found; "frame" is optional.
+
+Frames are numbered by the order they arrived in unless the client sends
+"frame". The server answers each processed frame with
+
+    {"type": "frame", "frame": n, "pose": true, "angle": 97.3,
+     "in_rep": true, "form": {"back_straight": true, "knee_over_toe": false},
+     "dropped": 0}
+
+and each completed rep with {"type": "rep", "frame": n, ...} carrying
+the fields of a SquatAnalysis row. Malformed frames get
+{"type": "error", "frame": n, "detail": "..."} and the connection stays
+open.
+
+Each connection keeps its own SquatRepTracker and estimator. Frames are
+never queued: a connection holds at most one frame waiting to be
+processed, and a newer frame replaces it (latest wins, counted in
+"dropped"). A client sending faster than its frames can be analyzed
+therefore sees a lower event rate, not a growing delay. Image frames
+are analyzed on a thread pool shared by all connections
+(settings.LIVE_INFERENCE_WORKERS), so the event loop keeps serving other
+sockets meanwhile.
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from . import metrics
+from .kinematics import RIGHT_FOOT_INDEX, RIGHT_KNEE, array_angle
+from .pose_estimation import (
+    NUM_LANDMARKS, PoseFrameProcessor, landmarks_to_array, pose_pool,
+)
+from .squat_analysis import (
+    BACK_JOINT, BACK_STRAIGHT_ANGLE, KNEE_JOINT, SquatRepTracker,
+)
+
+logger = logging.getLogger(__name__)
+
+LIVE_PATH = "/ws/live/"
+DEFAULT_FRAME_RATE = 30
+
+# Application-defined WebSocket close codes (4000-4999)
+CLOSE_NOT_FOUND = 4404
+CLOSE_BAD_REQUEST = 4400
+CLOSE_INTERNAL_ERROR = 1011
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Returns the process-wide pool that runs pose inference for live
+    connections, creating it on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "LIVE_INFERENCE_WORKERS", 4),
+                thread_name_prefix="live-inference",
+            )
+    return _executor
+
+
+class FrameSlot:
+    """
+    asyncio counterpart of live_pipeline.LatestSlot: holds at most one
+    frame. put() replaces a frame the consumer hasn't taken yet and
+    counts it as dropped.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._event.set()
+
+    async def get(self):
+        """
+        Returns the latest item, waiting for one if needed, or None once
+        the slot is closed and empty.
+        """
+        await self._event.wait()
+        if not self._closed:
+            self._event.clear()
+        item, self._item = self._item, None
+        return item
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+
+def _parse_landmarks(value):
+    """
+    Converts the "landmarks" field of a text frame into a (33, k) float32
+    array (k >= 2), or None for null. Raises ValueError if malformed.
+    """
+    if value is None:
+        return None
+    try:
+        lm = np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("landmarks must be a list of numeric rows")
+    if lm.ndim != 2 or lm.shape[0] != NUM_LANDMARKS or lm.shape[1] < 2:
+        raise ValueError(
+            f"landmarks must have {NUM_LANDMARKS} rows of [x, y, ...]")
+    return lm
+
+
+class LiveSession:
+    """
+    State of one live connection: the rep tracker and, once the client
+    sends images, a pose estimator borrowed from pose_pool.
+    """
+
+    def __init__(self, frame_rate):
+        self.tracker = SquatRepTracker(frame_rate)
+        self.frames_received = 0
+        self._processor = None
+        self._pose_healthy = True
+        # Feeds the per-frame inference histogram
+        self._timer = metrics.stage_timer("live")
+
+    def estimate(self, data):
+        """
+        Decodes an image frame and returns its (33, 4) landmarks, or None
+        if no pose was found. Blocking; runs on the inference pool.
+        """
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode image")
+        if self._processor is None:
+            self._processor = PoseFrameProcessor(
+                pose_pool.acquire(),
+                max_dim=getattr(settings, "ANALYSIS_MAX_INFERENCE_DIM", None),
+                roi=getattr(settings, "ANALYSIS_PERSON_ROI", False),
+                timer=self._timer,
+            )
+        try:
+            return landmarks_to_array(self._processor.process(image))
+        except Exception:
+            self._pose_healthy = False
+            raise
+
+    def track(self, frame_index, lm):
+        """
+        Feeds one frame's landmarks (or None) to the rep tracker and
+        returns the events to send for it.
+        """
+        angle = math.nan if lm is None else array_angle(lm, KNEE_JOINT)
+        if math.isnan(angle):
+            return [{"type": "frame", "frame": frame_index, "pose": False}]
+
+        back_angle = array_angle(lm, BACK_JOINT)
+        knee_over_toe = lm.item(RIGHT_KNEE, 0) < lm.item(RIGHT_FOOT_INDEX, 0)
+        rep = self.tracker.update_angles(
+            frame_index, angle, back_angle, knee_over_toe)
+
+        events = [{
+            "type": "frame",
+            "frame": frame_index,
+            "pose": True,
+            "angle": round(angle, 1),
+            "in_rep": self.tracker.engine.in_rep,
+            "form": {
+                "back_straight": back_angle > BACK_STRAIGHT_ANGLE,
+                "knee_over_toe": knee_over_toe,
+            },
+        }]
+        if rep is not None:
+            events.append({"type": "rep", "frame": frame_index, **rep})
+        return events
+
+    def close(self):
+        """
+        Returns the estimator to the pool. Blocking (the pool resets it).
+        """
+        if self._processor is None:
+            return
+        pose, self._processor = self._processor.pose, None
+        if self._pose_healthy:
+            pose_pool.release(pose)
+        else:
+            pose.close()
+
+
+async def _process_frames(session, slot, send):
+    """
+    Takes the newest frame from slot, analyzes it and sends its events,
+    until the slot is closed.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await slot.get()
+        if item is None:
+            return
+        frame_index, message = item
+        try:
+            if message.get("bytes") is not None:
+                # Pose inference takes tens of milliseconds: keep it off
+                # the event loop
+                lm = await loop.run_in_executor(
+                    _get_executor(), session.estimate, message["bytes"])
+            else:
+                # Landmark frames take microseconds; handle them inline
+                data = json.loads(message.get("text") or "null")
+                if not isinstance(data, dict):
+                    raise ValueError("Text frames must be JSON objects")
+                if "frame" in data:
+                    if not isinstance(data["frame"], int) or isinstance(data["frame"], bool):
+                        raise ValueError("frame must be an integer")
+                    frame_index = data["frame"]
+                lm = _parse_landmarks(data.get("landmarks"))
+            events = session.track(frame_index, lm)
+        except ValueError as e:
+            events = [{"type": "error", "frame": frame_index, "detail": str(e)}]
+
+        events[0]["dropped"] = slot.dropped
+        for event in events:
+            await send({"type": "websocket.send", "text": json.dumps(event)})
+
+
+def _frame_rate(query_string):
+    """
+    Reads ?fps= from the connection's query string. Raises ValueError if
+    it is not a positive number.
+    """
+    params = parse_qs(query_string.decode("latin-1"))
+    if "fps" not in params:
+        return DEFAULT_FRAME_RATE
+    try:
+        fps = float(params["fps"][0])
+    except ValueError:
+        raise ValueError(f"Invalid fps: {params['fps'][0]!r}")
+    if not math.isfinite(fps) or fps <= 0:
+        raise ValueError(f"Invalid fps: {params['fps'][0]!r}")
+    return fps
+
+
+async def live_analysis(scope, receive, send):
+    """
+    ASGI application for WebSocket connections.
+    """
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    if scope["path"] != LIVE_PATH:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    try:
+        frame_rate = _frame_rate(scope.get("query_string", b""))
+    except ValueError:
+        await send({"type": "websocket.close", "code": CLOSE_BAD_REQUEST})
+        return
+
+    await send({"type": "websocket.accept"})
+    await send({"type": "websocket.send", "text": json.dumps(
+        {"type": "ready", "fps": frame_rate})})
+
+    session = LiveSession(frame_rate)
+    slot = FrameSlot()
+    worker = asyncio.create_task(_process_frames(session, slot, send))
+    # Keep reading while the worker is busy, so newer frames replace
+    # older ones instead of piling up in the server's receive buffer
+    receiving = asyncio.ensure_future(receive())
+    try:
+        while True:
+            await asyncio.wait(
+                {receiving, worker}, return_when=asyncio.FIRST_COMPLETED)
+            if worker.done():
+                # Only a bug gets here; ValueErrors become error events
+                logger.error("Live analysis failed", exc_info=worker.exception())
+                await send({"type": "websocket.close", "code": CLOSE_INTERNAL_ERROR})
+                break
+            message = receiving.result()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message["type"] == "websocket.receive":
+                slot.put((session.frames_received, message))
+                session.frames_received += 1
+            receiving = asyncio.ensure_future(receive())
+    finally:
+        receiving.cancel()
+        # Let the worker finish the frame it is analyzing (a cancelled
+        # await wouldn't stop the inference thread) before handing its
+        # estimator back. The slot is closed, so it stops after that one.
+        slot.close()
+        await asyncio.gather(worker, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), session.close)
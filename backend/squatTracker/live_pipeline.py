@@ -0,0 +1,259 @@
+"""
+Pipelined camera loop for the live trainer scripts (SquatCounter.py,
+exercide_pose_check.py). Django-free.
+
+Capture and pose inference run on their own threads; rendering stays on
+the caller's thread, since cv2.imshow/waitKey must run there. The stages
+are connected by single-slot queues with a latest-frame-wins policy: a
+stage that falls behind drops the frames it didn't get to rather than
+queueing them, so a slow inference step lowers the displayed rate but
+never adds backlog latency.
+
+    pipeline = LivePipeline(cap, processor.process)
+    with pipeline:
+        for frame, pose_landmarks in pipeline.frames():
+            ...draw, cv2.imshow(), cv2.waitKey()...
+
+Latency is measured from the moment a frame's cap.read() returns to the
+moment the caller asks for the next frame (i.e. after it was shown), so
+it covers everything but the camera's own exposure/transfer time.
+"""
+import threading
+import time
+from collections import deque
+
+from .timing import NULL_TIMER
+
+# Consecutive failed cap.read() calls after which the source is
+# considered finished (about a second with the retry delay below)
+MAX_READ_FAILURES = 100
+READ_RETRY_DELAY = 0.01
+
+
+class LatestSlot:
+    """
+    Bounded (size 1) queue between two stages. put() replaces any item the
+    consumer hasn't taken yet and counts it as dropped.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._full = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._full:
+                self.dropped += 1
+            self._item = item
+            self._full = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Returns the latest item, waiting for one if needed. Returns None
+        on timeout or once the slot is closed and empty.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._full or self._closed, timeout)
+            if not self._full:
+                return None
+            item, self._item, self._full = self._item, None, False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class RateMeter:
+    """
+    Events per second over a sliding window.
+    """
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._times.append(now)
+            while self._times[0] < now - self.window:
+                self._times.popleft()
+
+    def rate(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            return (len(self._times) - 1) / (self._times[-1] - self._times[0])
+
+
+class LivePipeline:
+    """
+    Runs capture -> infer -> (caller) render. infer(frame) is called on
+    the inference thread and its result is handed to the caller with the
+    frame it came from. With threaded=False the same stages run one after
+    another on the caller's thread, as the scripts originally did.
+
+    on_result, if given, is called as on_result(captured_at, result) for
+    every inferred frame, including ones later dropped before display
+    (e.g. to record landmarks). captured_at is a time.perf_counter()
+    reading. It runs on the inference thread, so it should be quick.
+
+    timer (a timing.StageTimer) receives the "decode" stage (cap.read()).
+    """
+
+    def __init__(self, capture, infer, threaded=True, latency_samples=120,
+                 on_result=None, timer=None):
+        self.capture = capture
+        self.infer = infer
+        self.threaded = threaded
+        self.on_result = on_result
+        self.timer = timer or NULL_TIMER
+
+        self.capture_fps = RateMeter()
+        self.inference_fps = RateMeter()
+        self.render_fps = RateMeter()
+        self._latencies = deque(maxlen=latency_samples)
+        self.frames_shown = 0
+
+        self._to_infer = LatestSlot()
+        self._to_render = LatestSlot()
+        self._stop = threading.Event()
+        self._threads = []
+        self._error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if not self.threaded or self._threads:
+            return
+        self._threads = [
+            threading.Thread(target=self._capture_loop,
+                             name="live-capture", daemon=True),
+            threading.Thread(target=self._inference_loop,
+                             name="live-inference", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._to_infer.close()
+        self._to_render.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _read(self):
+        """
+        Returns (capture_time, frame), or None when the source has ended.
+        """
+        failures = 0
+        while not self._stop.is_set() and self.capture.isOpened():
+            with self.timer.stage("decode"):
+                ret, frame = self.capture.read()
+            if ret:
+                now = time.perf_counter()
+                self.capture_fps.tick(now)
+                return now, frame
+            failures += 1
+            if failures >= MAX_READ_FAILURES:
+                break
+            time.sleep(READ_RETRY_DELAY)
+        return None
+
+    def _infer(self, packet):
+        captured_at, frame = packet
+        result = self.infer(frame)
+        self.inference_fps.tick()
+        if self.on_result is not None:
+            self.on_result(captured_at, result)
+        return captured_at, frame, result
+
+    def _capture_loop(self):
+        try:
+            while True:
+                packet = self._read()
+                if packet is None:
+                    return
+                self._to_infer.put(packet)
+        finally:
+            self._to_infer.close()
+
+    def _inference_loop(self):
+        try:
+            while True:
+                packet = self._to_infer.get()
+                if packet is None:
+                    return
+                self._to_render.put(self._infer(packet))
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            self._to_render.close()
+
+    def frames(self):
+        """
+        Yields (frame, infer_result) for the newest processed frame, until
+        the source ends or stop() is called. Asking for the next item marks
+        the previous one as displayed.
+        """
+        while not self._stop.is_set():
+            if self.threaded:
+                packet = self._to_render.get()
+            else:
+                packet = self._read()
+                if packet is not None:
+                    packet = self._infer(packet)
+            if packet is None:
+                break
+
+            captured_at, frame, result = packet
+            yield frame, result
+
+            now = time.perf_counter()
+            self.render_fps.tick(now)
+            self._latencies.append(now - captured_at)
+            self.frames_shown += 1
+
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def frames_dropped(self):
+        return self._to_infer.dropped + self._to_render.dropped
+
+    def stats(self):
+        """
+        Current stage rates (fps) and display latency (ms, over the last
+        latency_samples frames).
+        """
+        latencies = sorted(self._latencies)
+        return {
+            "capture_fps": self.capture_fps.rate(),
+            "inference_fps": self.inference_fps.rate(),
+            "render_fps": self.render_fps.rate(),
+            "latency_ms": (1000 * sum(latencies) / len(latencies)
+                           if latencies else 0.0),
+            "latency_p95_ms": (1000 * latencies[int(0.95 * (len(latencies) - 1))]
+                               if latencies else 0.0),
+            "frames_shown": self.frames_shown,
+            "frames_dropped": self.frames_dropped,
+        }
+
+    def stats_text(self):
+        s = self.stats()
+        return (f"cam {s['capture_fps']:.0f} fps | pose {s['inference_fps']:.0f} fps"
+                f" | view {s['render_fps']:.0f} fps | latency {s['latency_ms']:.0f} ms")
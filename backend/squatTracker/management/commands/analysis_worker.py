@@ -0,0 +1,64 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from squatTracker.jobs import (
+    claim_next_job,
+    prewarm_pose_estimators,
+    requeue_running_jobs,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = "Runs queued squat analysis jobs outside the web process."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2,
+                            help="Number of jobs to analyze concurrently.")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty.")
+        parser.add_argument("--requeue-running", action="store_true",
+                            help="Requeue jobs left running by a crashed worker "
+                                 "before starting. Only use when no other "
+                                 "worker is active.")
+
+    def handle(self, *args, **options):
+        if options["requeue_running"]:
+            count = requeue_running_jobs()
+            self.stdout.write(f"Requeued {count} job(s).")
+
+        workers = max(options["workers"], 1)
+        prewarm_pose_estimators(workers)
+
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(options["poll_interval"], options["once"]),
+                name=f"analysis-{i}",
+            )
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _work(self, poll_interval, once):
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if once:
+                        return
+                    close_old_connections()
+                    time.sleep(poll_interval)
+                    continue
+                self.stdout.write(f"Analyzing job {job.pk}: {job.video_path}")
+                run_job(job)
+        finally:
+            close_old_connections()
@@ -0,0 +1,91 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from squatTracker import archive
+from squatTracker.jobs import requeue_running_jobs
+from squatTracker.models import AnalysisJob, WorkoutVideo
+from squatTracker.dates import parse_datetime_param
+
+
+class Command(BaseCommand):
+    help = ("Analyzes WorkoutVideo files that have no analysis yet, or a "
+            "failed or stale one, in a pool of processes. Rerun it after "
+            "an interruption to resume.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                            help="Videos analyzed at once (default: CPU count).")
+        parser.add_argument("--stale-before", metavar="DATE",
+                            help="Also reanalyze videos whose last analysis "
+                                 "finished before this ISO 8601 date/datetime.")
+        parser.add_argument("--skip-failed", action="store_true",
+                            help="Don't retry videos whose last analysis failed.")
+        parser.add_argument("--limit", type=int, default=None,
+                            help="Analyze at most this many videos.")
+        parser.add_argument("--rehash", action="store_true",
+                            help="Recompute every video's content hash, e.g. "
+                                 "after files were replaced in place.")
+        parser.add_argument("--requeue-running", action="store_true",
+                            help="Requeue the archive's jobs left running by a "
+                                 "run that was killed. Only use when no other "
+                                 "worker is active.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only list what would be analyzed.")
+
+    def handle(self, *args, **options):
+        stale_before = None
+        if options["stale_before"]:
+            try:
+                stale_before = parse_datetime_param(options["stale_before"])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        videos = archive.hash_videos(
+            WorkoutVideo.objects.order_by("pk"), rehash=options["rehash"],
+            log=self.stderr.write)
+        if options["requeue_running"]:
+            count = requeue_running_jobs(AnalysisJob.objects.filter(
+                video_hash__in={video.video_hash for video in videos}))
+            self.stdout.write(f"Requeued {count} job(s).")
+
+        work, running = archive.plan(
+            videos, stale_before=stale_before,
+            retry_failed=not options["skip_failed"])
+        if options["limit"] is not None:
+            work = work[:options["limit"]]
+        reasons = {}
+        for _, reason, _ in work:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        summary = ", ".join(f"{count} {reason}" for reason, count in reasons.items())
+        self.stdout.write(f"{len(videos)} video(s) in the archive, "
+                          f"{len(work)} to analyze" +
+                          (f" ({summary})" if summary else "") + ".")
+        if running:
+            self.stdout.write(
+                f"{len(running)} video(s) have a job still marked running; "
+                f"if an earlier run was killed, rerun with --requeue-running.")
+        if options["dry_run"]:
+            for video, reason, _ in work:
+                self.stdout.write(f"  {reason:7} {video.pk}: {video.video.name}")
+            return
+        if not work:
+            return
+
+        job_ids = archive.enqueue(work)
+        processes = max(min(options["processes"], len(job_ids)), 1)
+        self.stdout.write(f"Analyzing with {processes} process(es)...")
+        try:
+            totals = archive.run(job_ids, processes, log=self.stdout.write)
+        except KeyboardInterrupt:
+            raise CommandError("Interrupted; rerun the command to resume.")
+
+        hours = totals["seconds"] / 3600
+        self.stdout.write(
+            f"Done: {totals['done']} analyzed, {totals['failed']} failed, "
+            f"{totals['skipped']} skipped in {totals['seconds']:.1f}s.")
+        if totals["seconds"]:
+            self.stdout.write(
+                f"Throughput: {totals['done'] / hours:.1f} videos/hour, "
+                f"{totals['frames'] / totals['seconds']:.1f} frames/sec.")
+
@@ -0,0 +1,90 @@
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from squatTracker.kinematics import JOINTS, joint_angles, landmark_angle
+
+
+def _legacy_numpy_angle(a, b, c):
+    # Per-call implementation previously used by the live scripts
+    a, b, c = np.array(a), np.array(b), np.array(c)
+    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - \
+        np.arctan2(a[1] - b[1], a[0] - b[0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    if angle > 180.0:
+        angle = 360 - angle
+    return angle
+
+
+def _legacy_acos_angle(a, b, c):
+    # Per-call implementation previously used by squat_analysis
+    ab = [a[0] - b[0], a[1] - b[1]]
+    cb = [c[0] - b[0], c[1] - b[1]]
+    dot = ab[0]*cb[0] + ab[1]*cb[1]
+    mag_ab = math.sqrt(ab[0]**2 + ab[1]**2)
+    mag_cb = math.sqrt(cb[0]**2 + cb[1]**2)
+    if mag_ab * mag_cb == 0:
+        return 0
+    return math.degrees(math.acos(dot / (mag_ab * mag_cb)))
+
+
+class Command(BaseCommand):
+    help = ("Times the joint-angle code: the old per-call implementations "
+            "against kinematics' vectorized and single-frame paths, on "
+            "random landmarks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--frames", type=int, default=20000,
+                            help="Frames of landmarks to process.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _time(self, label, func, frames, baseline=None):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        line = f"{label:<40} {elapsed * 1000:9.1f} ms " \
+               f"{elapsed / frames * 1e6:8.2f} us/frame"
+        if baseline:
+            line += f"  {baseline / elapsed:6.1f}x"
+        self.stdout.write(line)
+        return elapsed, result
+
+    def handle(self, *args, **options):
+        frames = options["frames"]
+        joints = list(JOINTS.values())
+        rng = np.random.default_rng(options["seed"])
+        landmarks = rng.random((frames, 33, 3), dtype=np.float32)
+        # What MediaPipe hands the live scripts: objects with .x / .y
+        proto_frames = [[SimpleNamespace(x=float(x), y=float(y))
+                         for x, y, _ in frame] for frame in landmarks]
+
+        self.stdout.write(f"{frames} frames x {len(joints)} joints; "
+                          "speedup is relative to legacy numpy")
+
+        def per_call(angle_func):
+            return [[angle_func([lm[a].x, lm[a].y], [lm[b].x, lm[b].y],
+                                [lm[c].x, lm[c].y])
+                     for a, b, c in joints] for lm in proto_frames]
+
+        numpy_time, legacy = self._time(
+            "legacy numpy calculate_angle",
+            lambda: per_call(_legacy_numpy_angle), frames)
+        self._time(
+            "legacy acos calculate_angle",
+            lambda: per_call(_legacy_acos_angle), frames, numpy_time)
+        _, single = self._time(
+            "kinematics.landmark_angle (per frame)",
+            lambda: [[landmark_angle(lm, joint) for joint in joints]
+                     for lm in proto_frames], frames, numpy_time)
+        _, batch = self._time(
+            "kinematics.joint_angles (whole array)",
+            lambda: joint_angles(landmarks, joints), frames, numpy_time)
+
+        legacy = np.asarray(legacy, dtype=np.float64)
+        self.stdout.write(
+            "max abs difference (deg): "
+            f"per-frame {np.abs(np.asarray(single) - legacy).max():.2e}, "
+            f"vectorized {np.abs(batch - legacy).max():.2e}")
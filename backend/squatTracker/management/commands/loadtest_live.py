@@ -0,0 +1,198 @@
+import asyncio
+import json
+import math
+import time
+
+import cv2
+import numpy as np
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand, CommandError
+
+from squatTracker.kinematics import (
+    RIGHT_ANKLE, RIGHT_FOOT_INDEX, RIGHT_HIP, RIGHT_KNEE, RIGHT_SHOULDER,
+)
+from squatTracker.live_analysis import LIVE_PATH, live_analysis
+from squatTracker.pose_estimation import NUM_LANDMARKS
+
+# Synthetic squats: the knee angle swings between these every period
+SQUAT_TOP_DEG = 175
+SQUAT_BOTTOM_DEG = 75
+SQUAT_PERIOD_SEC = 2.5
+
+
+def _squat_landmarks(knee_angle):
+    """
+    A (33, 4) pose, side on, whose right knee is bent to knee_angle
+    degrees with the back upright. Landmarks the analysis doesn't use sit
+    at the image center.
+    """
+    lm = np.full((NUM_LANDMARKS, 4), 0.5, dtype=np.float32)
+    lm[:, 3] = 1.0
+    knee = np.array([0.5, 0.7])
+    ankle = knee + [0.0, 0.2]
+    theta = math.radians(knee_angle)
+    hip = knee + 0.2 * np.array([math.sin(theta), math.cos(theta)])
+    lm[RIGHT_KNEE, :2] = knee
+    lm[RIGHT_ANKLE, :2] = ankle
+    lm[RIGHT_FOOT_INDEX, :2] = ankle + [0.05, 0.0]
+    lm[RIGHT_HIP, :2] = hip
+    lm[RIGHT_SHOULDER, :2] = hip + [0.0, -0.3]
+    return lm
+
+
+def _landmark_messages(fps):
+    """
+    One squat period of text frames at fps.
+    """
+    frames = max(int(SQUAT_PERIOD_SEC * fps), 1)
+    mid = (SQUAT_TOP_DEG + SQUAT_BOTTOM_DEG) / 2
+    amplitude = (SQUAT_TOP_DEG - SQUAT_BOTTOM_DEG) / 2
+    messages = []
+    for i in range(frames):
+        angle = mid + amplitude * math.cos(2 * math.pi * i / frames)
+        text = json.dumps({"landmarks": _squat_landmarks(angle).round(4).tolist()})
+        messages.append({"type": "websocket.receive", "text": text})
+    return messages
+
+
+def _video_messages(path, max_frames, max_dim):
+    """
+    Up to max_frames frames of a video as JPEG binary frames.
+    """
+    cap = cv2.VideoCapture(path)
+    messages = []
+    try:
+        while len(messages) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            height, width = frame.shape[:2]
+            if max_dim and max(height, width) > max_dim:
+                scale = max_dim / max(height, width)
+                frame = cv2.resize(frame, (round(width * scale), round(height * scale)))
+            ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            if ok:
+                messages.append({"type": "websocket.receive", "bytes": data.tobytes()})
+    finally:
+        cap.release()
+    return messages
+
+
+async def _run_client(index, messages, frames, fps, timeout):
+    """
+    Streams `frames` frames at fps over one connection and returns its
+    stats. Frame k is messages[(index + k) % len(messages)], so clients
+    are out of phase with each other.
+    """
+    communicator = ApplicationCommunicator(live_analysis, {
+        "type": "websocket",
+        "path": LIVE_PATH,
+        "query_string": f"fps={fps}".encode(),
+        "headers": [],
+        "subprotocols": [],
+    })
+    await communicator.send_input({"type": "websocket.connect"})
+    accept = await communicator.receive_output(timeout)
+    if accept["type"] != "websocket.accept":
+        raise CommandError(f"Connection {index} was refused: {accept}")
+    await communicator.receive_output(timeout)  # "ready"
+
+    sent_at = {}
+    stats = {"latencies": [], "answered": 0, "reps": 0, "errors": 0, "dropped": 0}
+    last_frame = frames - 1
+    finished = asyncio.Event()
+
+    async def read_events():
+        while not finished.is_set():
+            output = await communicator.receive_output(timeout)
+            event = json.loads(output["text"])
+            if event["type"] == "frame":
+                stats["answered"] += 1
+                stats["dropped"] = event["dropped"]
+                stats["latencies"].append(
+                    time.perf_counter() - sent_at[event["frame"]])
+                if event["frame"] == last_frame:
+                    finished.set()
+            elif event["type"] == "rep":
+                stats["reps"] += 1
+            elif event["type"] == "error":
+                stats["errors"] += 1
+
+    reader = asyncio.create_task(read_events())
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for k in range(frames):
+        delay = start + k / fps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent_at[k] = time.perf_counter()
+        await communicator.send_input(messages[(index + k) % len(messages)])
+
+    # The newest frame is never dropped, so its answer marks the end
+    await reader
+    await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+    await communicator.wait(timeout)
+    return stats
+
+
+class Command(BaseCommand):
+    help = ("Load-tests the live analysis WebSocket endpoint: opens many "
+            "concurrent connections to the ASGI app in this process and "
+            "streams squat frames at a fixed rate over each. Sends synthetic "
+            "landmark frames, or JPEG frames from --video.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=100)
+        parser.add_argument("--seconds", type=float, default=10.0,
+                            help="How long each connection streams.")
+        parser.add_argument("--fps", type=float, default=30.0,
+                            help="Frames per second sent on each connection.")
+        parser.add_argument("--video",
+                            help="Send JPEG frames from this video instead of "
+                                 "landmarks (runs pose inference).")
+        parser.add_argument("--max-dim", type=int, default=640,
+                            help="Longer side of the JPEG frames sent.")
+        parser.add_argument("--timeout", type=float, default=30.0,
+                            help="Seconds to wait for any single event.")
+
+    def handle(self, *args, **options):
+        fps = options["fps"]
+        frames = max(int(options["seconds"] * fps), 1)
+        if options["video"]:
+            messages = _video_messages(options["video"], frames, options["max_dim"])
+            if not messages:
+                raise CommandError(f"Could not read {options['video']}")
+        else:
+            messages = _landmark_messages(fps)
+
+        start = time.perf_counter()
+        results = asyncio.run(self._run(options["connections"], messages,
+                                        frames, fps, options["timeout"]))
+        elapsed = time.perf_counter() - start
+        self._report(results, frames, fps, elapsed)
+
+    async def _run(self, connections, messages, frames, fps, timeout):
+        return await asyncio.gather(*(
+            _run_client(i, messages, frames, fps, timeout)
+            for i in range(connections)))
+
+    def _report(self, results, frames, fps, elapsed):
+        latencies = np.sort(np.concatenate(
+            [r["latencies"] for r in results])) * 1000
+        sent = frames * len(results)
+        answered = sum(r["answered"] for r in results)
+        interval_ms = 1000 / fps
+
+        self.stdout.write(f"connections        {len(results)}")
+        self.stdout.write(f"frames sent        {sent} "
+                          f"({sent / elapsed:.0f}/s over {elapsed:.1f} s)")
+        self.stdout.write(f"frames answered    {answered} "
+                          f"({sum(r['dropped'] for r in results)} dropped, "
+                          f"{sum(r['errors'] for r in results)} errors)")
+        self.stdout.write(f"reps counted       {sum(r['reps'] for r in results)}")
+        for label, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100)):
+            self.stdout.write(f"latency {label:<10} "
+                              f"{np.percentile(latencies, q):8.2f} ms")
+        within = np.mean(latencies <= interval_ms) * 100
+        self.stdout.write(f"within one frame   {within:.1f}% "
+                          f"(<= {interval_ms:.1f} ms)")
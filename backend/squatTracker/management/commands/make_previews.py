@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from squatTracker.models import WorkoutVideo
+from squatTracker.previews import make_previews
+
+
+class Command(BaseCommand):
+    help = ("Makes the poster frame and preview loop of WorkoutVideos that "
+            "lack them, e.g. videos uploaded before previews existed, or "
+            "while analysis ran outside the web process and not analyzed "
+            "since.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true",
+                            help="Remake every video's poster and preview.")
+
+    def handle(self, *args, **options):
+        videos = WorkoutVideo.objects.order_by("pk")
+        if not options["force"]:
+            videos = videos.filter(Q(poster="") | Q(preview=""))
+        made = 0
+        for video in videos.iterator():
+            try:
+                saved = make_previews(video, force=options["force"])
+            except FileNotFoundError as e:
+                self.stderr.write(str(e))
+                continue
+            if saved:
+                made += 1
+                self.stdout.write(f"  {video.pk}: {', '.join(saved)}")
+        self.stdout.write(f"Made previews for {made} video(s).")
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from squatTracker import landmark_cache
+
+
+class Command(BaseCommand):
+    help = "Evicts least recently used entries from the landmark cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-bytes", type=int, default=None,
+                            help="Target cache size (default: "
+                                 "LANDMARK_CACHE_MAX_BYTES).")
+        parser.add_argument("--clear", action="store_true",
+                            help="Remove every entry.")
+
+    def handle(self, *args, **options):
+        if not landmark_cache.cache_dir():
+            self.stdout.write("Landmark cache is disabled.")
+            return
+
+        if options["clear"]:
+            max_bytes = 0
+        elif options["max_bytes"] is not None:
+            max_bytes = options["max_bytes"]
+        else:
+            max_bytes = getattr(settings, "LANDMARK_CACHE_MAX_BYTES", None)
+
+        removed, freed = landmark_cache.prune(max_bytes)
+        self.stdout.write(
+            f"Removed {removed} entr{'y' if removed == 1 else 'ies'}, "
+            f"freed {freed / 1024 / 1024:.1f} MB.")
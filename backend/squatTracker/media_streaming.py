@@ -0,0 +1,169 @@
+"""
+Serving media files (workout videos, rep clips) the way browsers play
+them: <video> asks for byte ranges as it seeks, and expects the server to
+answer with just those bytes.
+
+serve_media() answers Range requests with 206 Partial Content (one range
+per request; a multi-range request gets the whole file, which HTTP
+allows), 416 for ranges past the end, and honours If-Range so a client
+never stitches together bytes of two versions of a file. Every response
+carries an ETag and Last-Modified from the file's stat(), so
+If-None-Match / If-Modified-Since get a 304 without touching the file.
+
+Bytes are sent without copying them through Python where the server
+allows it:
+
+- settings.MEDIA_SENDFILE = "x-accel-redirect" (nginx) or "x-sendfile"
+  (Apache mod_xsendfile, lighttpd) hands the file to the front server,
+  which then does range handling and sendfile() itself. nginx needs an
+  internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT.
+- Otherwise the response is a FileResponse over the requested range.
+  WSGI servers with a wsgi.file_wrapper that uses sendfile() (gunicorn,
+  uWSGI) send it straight from the page cache; elsewhere it is streamed
+  in FileResponse.block_size chunks.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+_RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class _RangeFile:
+    """
+    Read-only view of bytes [start, start + length) of an open file.
+    The underlying descriptor is positioned at start, so a sendfile()
+    based wsgi.file_wrapper sends exactly the range (it starts at the
+    descriptor's offset and stops at Content-Length). Deliberately has no
+    tell(), seek() or name, so FileResponse leaves Content-Length to the
+    caller.
+    """
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self._file = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def parse_range(header, size):
+    """
+    Parses a Range header against a file of `size` bytes. Returns
+    (start, end) with end inclusive, None to send the whole file (no
+    header, a header this doesn't handle, or several ranges), or
+    "unsatisfiable".
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    specs = header[len("bytes="):].split(",")
+    if len(specs) != 1:
+        return None
+    match = _RANGE_RE.match(specs[0])
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None  # Syntactically invalid: ignore the header
+        if start >= size:
+            return "unsatisfiable"
+        return start, min(int(last), size - 1) if last else size - 1
+    suffix = int(last)
+    if suffix == 0 or size == 0:
+        return "unsatisfiable"
+    return max(size - suffix, 0), size - 1
+
+
+def _if_range_matches(request, etag, last_modified):
+    """
+    Whether a Range request may be served as a range: always without
+    If-Range, else only if it names the file's current version.
+    """
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/"')):
+        # If-Range needs a strong match
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _sendfile_response(path, content_type):
+    mode = getattr(settings, "MEDIA_SENDFILE", None)
+    if mode == "x-accel-redirect":
+        prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+        relative = os.path.relpath(path, settings.MEDIA_ROOT)
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(
+            relative.replace(os.sep, "/"))
+        return response
+    if mode == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return response
+    if mode:
+        raise ValueError(f"Unknown MEDIA_SENDFILE: {mode!r}")
+    return None
+
+
+def serve_media(request, path, content_type=None, max_age=3600):
+    """
+    Responds to a GET/HEAD for the file at path (a trusted path, e.g. a
+    FileField's), with range and conditional request support as
+    described in the module docstring. Clients may cache the file for
+    max_age seconds and revalidate it with its ETag after that. Raises
+    FileNotFoundError if the file doesn't exist.
+    """
+    content_type = (content_type or mimetypes.guess_type(path)[0] or
+                    "application/octet-stream")
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{size:x}")
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _sendfile_response(path, content_type)
+    if response is None:
+        byte_range = None
+        if _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        if byte_range == "unsatisfiable":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+        else:
+            start, end = byte_range or (0, size - 1)
+            f = open(path, "rb")
+            response = FileResponse(
+                _RangeFile(f, start, end - start + 1),
+                status=206 if byte_range else 200,
+                content_type=content_type)
+            response["Content-Length"] = end - start + 1
+            if byte_range:
+                response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, max_age=max_age)
+    return response
@@ -0,0 +1,467 @@
+"""
+Service metrics for capacity planning, scraped from /api/metrics/ in the
+Prometheus text format (or ?format=json, with percentiles worked out).
+
+Counters and histograms are aggregated across processes (web workers,
+`manage.py analysis_worker`s) without an external service: each process
+adds its updates up in memory and merges them into a shared SQLite file
+(settings.METRICS_DB) every METRICS_FLUSH_INTERVAL seconds, with one
+upsert per changed series. A scrape sees every process's updates up to
+that interval ago. Values persist across restarts; delete the file to
+start over. Gauges (the job queue) are read from the database at scrape
+time, so they are exact.
+
+    squat_http_request_duration_seconds  histogram  view, method, status
+    squat_upload_bytes_total             counter    view
+    squat_stage_seconds                  histogram  source, stage
+    squat_analysis_frames_total          counter
+    squat_analysis_fps                   histogram  cached (one sample per job)
+    squat_analysis_job_duration_seconds  histogram  status
+    squat_db_writes_total                counter    operation, table
+    squat_analysis_jobs                  gauge      status
+    squat_analysis_oldest_queued_seconds gauge
+
+squat_stage_seconds holds one sample per StageTimer stage call, e.g.
+stage="pose" is the pose inference time per frame. Its sources are
+"analysis" (queued video jobs), "landmarks" (/api/analyze/landmarks/),
+"upload" (/api/analyze/) and "live" (WebSocket sessions). Chunked
+analyses (ANALYSIS_CHUNK_WORKERS > 1) run inference in child processes
+and only report their waits, as "parallel_inference".
+"""
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import AnalysisJob
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,  -- JSON list of label values
+    suffix TEXT NOT NULL,  -- "", "_bucket", "_sum" or "_count"
+    le TEXT NOT NULL,      -- bucket bound, "" for other samples
+    value REAL NOT NULL,
+    PRIMARY KEY (metric, labels, suffix, le)
+)
+"""
+_UPSERT = """
+INSERT INTO samples VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (metric, labels, suffix, le) DO UPDATE SET value = value + excluded.value
+"""
+
+
+def _db_path():
+    path = getattr(settings, "METRICS_DB", None)
+    return str(path) if path else None
+
+
+def enabled():
+    return _db_path() is not None
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return (value.replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + "}"
+
+
+class _Store:
+    """
+    This process's pending updates, {(metric, label values, suffix, le):
+    amount}, and the shared file they are flushed to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Also run in a forked child: the parent flushes what it had pending
+        self._pid = os.getpid()
+        self._pending = {}
+        self._flush_scheduled = False
+        self._conn = None
+
+    def add(self, key, amount):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._pending[key] = self._pending.get(key, 0.0) + amount
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        timer = threading.Timer(
+            getattr(settings, "METRICS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+            self.flush)
+        timer.daemon = True
+        timer.start()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                _db_path(), timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def flush(self):
+        """
+        Merges the pending updates into the shared file.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        if not pending or not enabled():
+            return
+        rows = [(metric, json.dumps(labels), suffix, le, amount)
+                for (metric, labels, suffix, le), amount in pending.items()]
+        try:
+            with self._write_lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(_UPSERT, rows)
+        except sqlite3.Error:
+            logger.exception("Could not write metrics to %s", _db_path())
+            for (metric, labels, suffix, le, amount) in rows:
+                self.add((metric, tuple(json.loads(labels)), suffix, le), amount)
+
+    def read(self):
+        """
+        Flushes, then returns every stored sample as (metric, label
+        values, suffix, le, value) rows.
+        """
+        self.flush()
+        with self._write_lock:
+            rows = self._connect().execute(
+                "SELECT metric, labels, suffix, le, value FROM samples").fetchall()
+        return [(metric, tuple(json.loads(labels)), suffix, le, value)
+                for metric, labels, suffix, le, value in rows]
+
+
+_store = _Store()
+atexit.register(_store.flush)
+
+REGISTRY = {}
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def _label_values(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if enabled():
+            _store.add((self.name, self._label_values(labels), "", ""), amount)
+
+
+class Histogram(_Metric):
+    """
+    Stored per bucket (not cumulative), so an observation touches three
+    samples: its bucket, _sum and _count.
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+
+    def observe(self, value, **labels):
+        if not enabled():
+            return
+        label_values = self._label_values(labels)
+        le = self.bounds[bisect.bisect_left(self.buckets, value)]
+        _store.add((self.name, label_values, "_bucket", le), 1)
+        _store.add((self.name, label_values, "_sum", ""), value)
+        _store.add((self.name, label_values, "_count", ""), 1)
+
+
+class Gauge(_Metric):
+    """
+    Read at scrape time: collect() returns {label values: value}.
+    """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+
+def _collect_job_counts():
+    counts = dict.fromkeys(
+        ((status,) for status, _ in AnalysisJob.STATUS_CHOICES), 0)
+    for row in AnalysisJob.objects.values("status").annotate(n=Count("id")):
+        counts[(row["status"],)] = row["n"]
+    return counts
+
+
+def _collect_oldest_queued():
+    oldest = (AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+              .aggregate(created=Min("created_at"))["created"])
+    age = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    return {(): max(age, 0.0)}
+
+
+REQUEST_SECONDS = Histogram(
+    "squat_http_request_duration_seconds",
+    "Time to build the response, per squatTracker view.",
+    ("view", "method", "status"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+UPLOAD_BYTES = Counter(
+    "squat_upload_bytes_total",
+    "Request body bytes received, per squatTracker view.",
+    ("view",))
+STAGE_SECONDS = Histogram(
+    "squat_stage_seconds",
+    "Time per stage call (stage=\"pose\" is inference per frame).",
+    ("source", "stage"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+             0.5, 1, 2.5, 5, 10))
+ANALYSIS_FRAMES = Counter(
+    "squat_analysis_frames_total",
+    "Video frames covered by finished analysis jobs.")
+ANALYSIS_FPS = Histogram(
+    "squat_analysis_fps",
+    "Video frames per second of wall time, per finished analysis job "
+    "(cached=\"true\" when the landmarks came from the landmark cache).",
+    ("cached",),
+    buckets=(1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 240, 480, 1000))
+JOB_SECONDS = Histogram(
+    "squat_analysis_job_duration_seconds",
+    "Wall time of analysis jobs, from claim to result.",
+    ("status",),
+    buckets=(1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+DB_WRITES = Counter(
+    "squat_db_writes_total",
+    "INSERT/UPDATE/DELETE statements sent to the database.",
+    ("operation", "table"))
+Gauge("squat_analysis_jobs", "Analysis jobs by status.", ("status",),
+      collect=_collect_job_counts)
+Gauge("squat_analysis_oldest_queued_seconds",
+      "Age of the oldest queued analysis job (0 when the queue is empty).",
+      collect=_collect_oldest_queued)
+
+
+def stage_timer(source):
+    """
+    A StageTimer that also records each stage call in
+    squat_stage_seconds under the given source.
+    """
+    return StageTimer(observer=partial(_observe_stage, source))
+
+
+def _observe_stage(source, stage, seconds):
+    STAGE_SECONDS.observe(seconds, source=source, stage=stage)
+
+
+def record_job(status, seconds, frames, cached=False):
+    """
+    Records a finished analysis job, and flushes: analysis workers can
+    sit idle for a long time after one.
+    """
+    JOB_SECONDS.observe(seconds, status=status)
+    if status == AnalysisJob.DONE and frames:
+        ANALYSIS_FRAMES.inc(frames)
+        if seconds > 0:
+            ANALYSIS_FPS.observe(frames / seconds,
+                                 cached="true" if cached else "false")
+    _store.flush()
+
+
+_WRITE_SQL = re.compile(
+    r'\s*(INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+["`]?(\w+)',
+    re.IGNORECASE)
+
+
+def _count_writes(execute, sql, params, many, context):
+    match = _WRITE_SQL.match(sql)
+    if match:
+        DB_WRITES.inc(operation=match.group(1).split()[0].lower(),
+                      table=match.group(2))
+    return execute(sql, params, many, context)
+
+
+def _install_write_counter(sender, connection, **kwargs):
+    # Fires again whenever the same connection object reconnects
+    if _count_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_writes)
+
+
+def install():
+    """
+    Starts counting database writes. Called from the app's ready().
+    """
+    connection_created.connect(_install_write_counter)
+
+
+class MetricsMiddleware:
+    """
+    Records latency and request body size for every request routed to a
+    squatTracker view. Goes first in MIDDLEWARE, so the latency covers
+    the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        if match is not None and enabled():
+            view = getattr(match.func, "view_class", match.func)
+            if getattr(view, "__module__", "").startswith("squatTracker."):
+                name = match.url_name or view.__name__
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, view=name,
+                    method=request.method, status=response.status_code)
+                length = int(request.META.get("CONTENT_LENGTH") or 0)
+                if length:
+                    UPLOAD_BYTES.inc(length, view=name)
+        return response
+
+
+def _series():
+    """
+    {metric name: {label values: {(suffix, le): value}}} for the stored
+    counters and histograms, plus the gauges' current values.
+    """
+    series = {}
+    for metric, labels, suffix, le, value in _store.read():
+        series.setdefault(metric, {}).setdefault(labels, {})[suffix, le] = value
+    for metric in REGISTRY.values():
+        if metric.type == "gauge":
+            series[metric.name] = {labels: {("", ""): value}
+                                   for labels, value in metric.collect().items()}
+    return series
+
+
+def _cumulative(histogram, samples):
+    total = 0.0
+    counts = []
+    for bound in histogram.bounds:
+        total += samples.get(("_bucket", bound), 0.0)
+        counts.append(total)
+    return counts
+
+
+def render_text():
+    """
+    All metrics in the Prometheus text exposition format (0.0.4).
+    """
+    series = _series()
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for labels, samples in sorted(series.get(metric.name, {}).items()):
+            if metric.type != "histogram":
+                lines.append(f"{metric.name}"
+                             f"{_format_labels(metric.labelnames, labels)} "
+                             f"{_format_value(samples[('', '')])}")
+                continue
+            for bound, count in zip(metric.bounds, _cumulative(metric, samples)):
+                lines.append(
+                    f"{metric.name}_bucket"
+                    f"{_format_labels(metric.labelnames, labels, [('le', bound)])} "
+                    f"{_format_value(count)}")
+            for suffix in ("_sum", "_count"):
+                lines.append(f"{metric.name}{suffix}"
+                             f"{_format_labels(metric.labelnames, labels)} "
+                             f"{_format_value(samples.get((suffix, ''), 0.0))}")
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(q, histogram, counts):
+    """
+    Estimates the q-quantile from cumulative bucket counts by linear
+    interpolation within the bucket, as Prometheus' histogram_quantile()
+    does. Returns None without observations.
+    """
+    if not counts or not counts[-1]:
+        return None
+    rank = q * counts[-1]
+    i = bisect.bisect_left(counts, rank)
+    if i == len(histogram.buckets):
+        # In the +Inf bucket: the highest finite bound is all we know
+        return histogram.buckets[-1]
+    lower = histogram.buckets[i - 1] if i else 0.0
+    below = counts[i - 1] if i else 0.0
+    in_bucket = counts[i] - below
+    return lower + (histogram.buckets[i] - lower) * (
+        (rank - below) / in_bucket if in_bucket else 0.0)
+
+
+def snapshot():
+    """
+    All metrics as a JSON-friendly dict. Histograms are summarized as
+    count, sum, mean and estimated p50/p90/p99.
+    """
+    series = _series()
+    data = {}
+    for metric in REGISTRY.values():
+        values = []
+        for labels, samples in sorted(series.get(metric.name, {}).items()):
+            entry = {"labels": dict(zip(metric.labelnames, labels))}
+            if metric.type == "histogram":
+                counts = _cumulative(metric, samples)
+                count = samples.get(("_count", ""), 0.0)
+                total = samples.get(("_sum", ""), 0.0)
+                entry.update(count=int(count), sum=total,
+                             mean=total / count if count else None)
+                for q in (0.5, 0.9, 0.99):
+                    entry[f"p{round(q * 100)}"] = _quantile(q, metric, counts)
+            else:
+                entry["value"] = samples[("", "")]
+            values.append(entry)
+        data[metric.name] = {"type": metric.type,
+                             "help": metric.documentation, "values": values}
+    return data
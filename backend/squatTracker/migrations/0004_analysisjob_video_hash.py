@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0003_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='video_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
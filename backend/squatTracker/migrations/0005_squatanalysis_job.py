@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0004_analysisjob_video_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='squatanalysis',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reps', to='squatTracker.analysisjob'),
+        ),
+    ]
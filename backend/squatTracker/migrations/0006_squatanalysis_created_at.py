@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0005_squatanalysis_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='squatanalysis',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='squatanalysis',
+            name='valid_depth',
+            field=models.BooleanField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0007_analysisjob_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutvideo',
+            name='video_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0009_analysisjob_time_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='squatanalysis',
+            name='bottom_sec',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='squatanalysis',
+            name='end_sec',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='squatanalysis',
+            name='start_sec',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
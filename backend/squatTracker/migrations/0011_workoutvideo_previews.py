@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0010_squatanalysis_rep_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutvideo',
+            name='poster',
+            field=models.FileField(blank=True, upload_to='posters/'),
+        ),
+        migrations.AddField(
+            model_name='workoutvideo',
+            name='preview',
+            field=models.FileField(blank=True, upload_to='previews/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('squatTracker', '0011_workoutvideo_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='watched_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -12,7 +12,16 @@ class SquatAnalysis(models.Model):
     knees_over_toes = models.CharField(
         max_length=10, choices=[("Yes", "Yes"), ("No", "No")])
     min_depth = models.FloatField()
-    valid_depth = models.BooleanField()
+    valid_depth = models.BooleanField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # The analysis (and so the source video) this rep came from
+    job = models.ForeignKey("AnalysisJob", null=True, blank=True,
+                            on_delete=models.CASCADE, related_name="reps")
+    # Where in the job's video the rep starts, bottoms out and ends, in
+    # seconds (None for reps saved before they were recorded)
+    start_sec = models.FloatField(null=True, blank=True)
+    bottom_sec = models.FloatField(null=True, blank=True)
+    end_sec = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return f"Rep {self.rep} - Valid: {self.valid_depth}"
@@ -23,3 +32,52 @@ class WorkoutVideo(models.Model):
     title = models.CharField(max_length=100)
     video = models.FileField(upload_to='videos/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # SHA-256 of the file, filled in by `manage.py analyze_archive` to
+    # match the video with its AnalysisJobs
+    video_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # Small stand-ins for listings, made after upload (see previews.py):
+    # a JPEG poster frame and a few seconds' low-resolution WebM loop
+    poster = models.FileField(upload_to='posters/', blank=True)
+    preview = models.FileField(upload_to='previews/', blank=True)
+
+
+class AnalysisJob(models.Model):
+    """
+    A queued /api/analyze/ request. The table doubles as the work queue
+    for the background workers in jobs.py.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    video_path = models.CharField(max_length=500)
+    # SHA-256 of the uploaded file, used to reuse results for re-uploads
+    video_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # Part of the video to analyze, in seconds (None = from the start / to
+    # the end)
+    start_time = models.FloatField(null=True, blank=True)
+    end_time = models.FloatField(null=True, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    frames_done = models.PositiveIntegerField(default=0)
+    total_frames = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Milliseconds spent per analysis stage (see timing.StageTimer.as_dict)
+    timings = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Kept in the future by open event streams (see job_events), so the
+    # analysis saves each rep as it is found only while someone watches
+    watched_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.pk} - {self.status}"
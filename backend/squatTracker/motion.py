@@ -0,0 +1,95 @@
+"""
+Cheap motion pre-pass that finds the part of a video where something
+moves, so the idle lead-in and lead-out of a clip (walking away from the
+phone, standing still before the first rep) are never run through
+MediaPipe. Django-free.
+
+A few frames per second are decoded and shrunk to small blurred
+grayscale thumbnails; the segment is the span from the first to the last
+pair of consecutive thumbnails whose mean absolute difference exceeds a
+threshold, padded on both sides. Frames in between are only grabbed,
+never converted. This costs about a millisecond per frame on an analysis
+proxy, against tens of milliseconds for pose inference.
+"""
+import cv2
+import numpy as np
+
+from .pose_estimation import seek_frame
+from .timing import NULL_TIMER
+
+# Thumbnails compared per second of video
+MOTION_SAMPLE_FPS = 5
+# Thumbnail width in pixels
+MOTION_THUMBNAIL_WIDTH = 64
+# Mean absolute gray-level difference (0-255) between consecutive
+# thumbnails above which the video is considered moving. Sensor noise and
+# breathing stay well below it after the blur.
+MOTION_THRESHOLD = 2.0
+# Seconds kept before the first and after the last movement
+MOTION_PADDING_SECONDS = 1.0
+
+
+def _thumbnail(frame):
+    height, width = frame.shape[:2]
+    size = (MOTION_THUMBNAIL_WIDTH,
+            max(round(height * MOTION_THUMBNAIL_WIDTH / width), 1))
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(gray, (5, 5), 0).astype(np.int16)
+
+
+def find_active_segment(video_path, start_frame=0, end_frame=None,
+                        sample_fps=MOTION_SAMPLE_FPS,
+                        threshold=MOTION_THRESHOLD,
+                        padding=MOTION_PADDING_SECONDS, timer=None):
+    """
+    Returns the (start, end) frame range within [start_frame, end_frame)
+    where the video moves, padded by `padding` seconds on both sides.
+    end_frame=None means the end of the video. If nothing moves (or the
+    video can't be read) the whole range is returned unchanged, so a
+    misjudged threshold never hides a video's reps.
+
+    timer (a timing.StageTimer) receives the "decode" stage; the
+    thumbnail comparisons count as whatever stage the caller is in.
+    """
+    timer = timer or NULL_TIMER
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return start_frame, end_frame
+    frame_rate = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(round(frame_rate / sample_fps), 1)
+
+    first_active = last_active = None
+    previous = previous_index = None
+    frame_index = start_frame
+    try:
+        with timer.stage("decode"):
+            if not seek_frame(cap, start_frame):
+                return start_frame, end_frame
+        while end_frame is None or frame_index < end_frame:
+            sampled = (frame_index - start_frame) % step == 0
+            with timer.stage("decode"):
+                if sampled:
+                    ret, frame = cap.read()
+                else:
+                    ret = cap.grab()
+            if not ret:
+                break
+            if sampled:
+                thumbnail = _thumbnail(frame)
+                if (previous is not None and
+                        np.abs(thumbnail - previous).mean() > threshold):
+                    if first_active is None:
+                        first_active = previous_index
+                    last_active = frame_index
+                previous, previous_index = thumbnail, frame_index
+            frame_index += 1
+    finally:
+        cap.release()
+
+    if first_active is None:
+        return start_frame, end_frame
+    pad = round(padding * frame_rate)
+    # Movement may go on until just before the next sample
+    return (max(first_active - pad, start_frame),
+            min(last_active + step + pad, frame_index))
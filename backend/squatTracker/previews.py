@@ -0,0 +1,137 @@
+"""
+Poster frames and preview loops for uploaded videos, so listings (the
+admin changelist, WorkoutVideoSerializer output) can show a few kilobytes
+per video instead of pointing the browser at each original.
+
+Both are made once, in the background after upload (see
+jobs.prepare_video) or, for a video that still lacks them, when an
+analysis of it finishes (see jobs.run_job), and stored in
+WorkoutVideo.poster and WorkoutVideo.preview:
+
+- poster: one JPEG frame, scaled to POSTER_MAX_DIM, taken POSTER_SECONDS
+  in (or half way through a shorter video), past the fumbling with the
+  phone at the start.
+- preview: a silent PREVIEW_SECONDS WebM loop from the same point,
+  scaled to PREVIEW_MAX_DIM at about PREVIEW_FPS, cut with
+  rep_clips.extract_clip.
+
+Frames are read from the video's analysis proxy (see proxy.py), which
+the upload makes anyway and which seeks and decodes far faster than a 4K
+original.
+"""
+import logging
+import os
+import tempfile
+
+import cv2
+from django.core.files import File
+from django.core.files.base import ContentFile
+
+from .proxy import ensure_proxy, proxy_size
+from .rep_clips import CLIP_EXT, extract_clip, open_at
+from .timing import NULL_TIMER
+
+logger = logging.getLogger(__name__)
+
+POSTER_SECONDS = 1.0
+POSTER_MAX_DIM = 320
+POSTER_JPEG_QUALITY = 80
+
+PREVIEW_SECONDS = 3.0
+PREVIEW_MAX_DIM = 240
+PREVIEW_FPS = 10
+
+
+def _duration(source):
+    cap = cv2.VideoCapture(source)
+    try:
+        frame_rate = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return cap.get(cv2.CAP_PROP_FRAME_COUNT) / frame_rate
+    finally:
+        cap.release()
+
+
+def poster_time(duration):
+    """
+    Where in a video of `duration` seconds its poster and preview start.
+    """
+    return min(POSTER_SECONDS, duration / 2) if duration > 0 else 0.0
+
+
+def extract_poster(source, seconds, max_dim=POSTER_MAX_DIM, timer=None):
+    """
+    Returns the frame of source shown at `seconds`, scaled so its longer
+    side is at most max_dim, as JPEG bytes; None if the video ends
+    before it. timer receives "decode" and "encode".
+    """
+    timer = timer or NULL_TIMER
+    with timer.stage("decode"):
+        cap, _, _ = open_at(source, seconds)
+        try:
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+    if not ret:
+        return None
+    with timer.stage("encode"):
+        height, width = frame.shape[:2]
+        size = proxy_size(width, height, max_dim)
+        if size != (width, height):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(
+            ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, POSTER_JPEG_QUALITY])
+    return jpeg.tobytes() if ok else None
+
+
+def make_previews(video, force=False, timer=None):
+    """
+    Fills in a WorkoutVideo's poster and preview (only the missing ones
+    unless force) and saves just those fields. Returns the names of the
+    fields it saved. Raises FileNotFoundError if the video's file is
+    gone; a video OpenCV can't read is logged and left without previews.
+    """
+    path = video.video.path
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing file for video {video.pk}: {path}")
+    todo = [name for name in ("poster", "preview")
+            if force or not getattr(video, name)]
+    if not todo:
+        return []
+    timer = timer or NULL_TIMER
+    with timer.stage("source"):
+        source = ensure_proxy(path, video.video_hash or None)[0]
+        start_sec = poster_time(_duration(source))
+    stem = os.path.splitext(os.path.basename(path))[0]
+
+    saved = []
+    try:
+        if "poster" in todo:
+            jpeg = extract_poster(source, start_sec, timer=timer)
+            if jpeg:
+                video.poster.delete(save=False)
+                video.poster.save(f"{stem}.jpg", ContentFile(jpeg), save=False)
+                saved.append("poster")
+        if "preview" in todo:
+            # The container comes from the extension, so keep it on the
+            # temp file
+            fd, tmp_path = tempfile.mkstemp(suffix=CLIP_EXT)
+            os.close(fd)
+            try:
+                frames = extract_clip(
+                    source, start_sec, start_sec + PREVIEW_SECONDS, tmp_path,
+                    max_dim=PREVIEW_MAX_DIM, fps=PREVIEW_FPS, timer=timer)
+                if frames:
+                    video.preview.delete(save=False)
+                    with open(tmp_path, "rb") as f:
+                        video.preview.save(f"{stem}{CLIP_EXT}", File(f),
+                                           save=False)
+                    saved.append("preview")
+            finally:
+                os.remove(tmp_path)
+    except (FileNotFoundError, ValueError, cv2.error):
+        # The file exists (checked above), so OpenCV can't open it
+        logger.exception("Could not make previews of video %s", video.pk)
+    if saved:
+        # Only these fields: the video may have been edited meanwhile
+        video.save(update_fields=saved)
+    return saved
@@ -0,0 +1,219 @@
+"""
+Analysis proxies: a low-resolution, constant frame rate copy of each
+uploaded video, made once and read by every later analysis instead of
+the original.
+
+Uploads arrive as 4K phone footage, assorted codecs and variable frame
+rates. Decoding a 4K frame costs several times more than the pose
+inference MediaPipe then runs on a 256 px input, and CAP_PROP_FPS is an
+average that doesn't match the real frame times of a VFR video, which
+skews every duration derived from frame counts.
+
+A proxy is resampled by presentation timestamp to a constant rate: proxy
+frame k shows the source frame on screen at k / fps seconds, repeating
+or dropping frames as needed. Frame index / fps therefore is the true
+time, so rep durations measured on the proxy are exact (to one proxy
+frame) whatever the source's timing was. Frames are scaled so their
+longer side is at most ANALYSIS_PROXY_MAX_DIM and stored as MPEG-4 Part
+2, which decodes roughly ten times faster than H.264 4K.
+
+Proxies live in MEDIA_ROOT/proxies/<key>.mp4, keyed by the source's
+content hash and the proxy settings, with a <key>.json sidecar
+describing the source (reported and measured frame rate, duration,
+whether it was VFR).
+"""
+import json
+import logging
+import os
+import tempfile
+
+import cv2
+from django.conf import settings
+
+from .landmark_cache import file_sha256
+from .timing import NULL_TIMER
+
+logger = logging.getLogger(__name__)
+
+PROXY_DIR = "proxies"
+PROXY_EXT = ".mp4"
+PROXY_FOURCC = "mp4v"
+
+# Frame intervals deviating from the median by more than this fraction
+# mark a source as variable frame rate
+VFR_TOLERANCE = 0.1
+
+
+def enabled():
+    return getattr(settings, "ANALYSIS_PROXY", False)
+
+
+def proxy_key(video_hash):
+    """
+    Identifies the proxy of a video under the current proxy settings.
+    Also used as the proxy's landmark cache hash, so cached landmarks of
+    the original and of its proxies never mix.
+    """
+    max_dim = getattr(settings, "ANALYSIS_PROXY_MAX_DIM", 640)
+    fps = getattr(settings, "ANALYSIS_PROXY_FPS", 30)
+    return f"{video_hash}-proxy{max_dim}x{fps:g}"
+
+
+def proxy_size(width, height, max_dim):
+    """
+    Returns the (width, height) of a width x height frame scaled so its
+    longer side is at most max_dim (no limit if max_dim is falsy), never
+    scaled up.
+    """
+    scale = min(max_dim / max(width, height), 1.0) if max_dim else 1.0
+    # Even dimensions keep every encoder happy
+    return (max(2 * round(width * scale / 2), 2),
+            max(2 * round(height * scale / 2), 2))
+
+
+def _timed_frames(cap, frame_rate, timer):
+    """
+    Yields (seconds, frame) with each frame's presentation time, falling
+    back to the reported frame rate where the backend gives no
+    increasing timestamps.
+    """
+    last = None
+    while True:
+        with timer.stage("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            return
+        seconds = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        if last is not None and not seconds > last:
+            seconds = last + 1 / frame_rate
+        last = seconds
+        yield seconds, frame
+
+
+def make_proxy(video_path, proxy_path, fps=30, max_dim=640, timer=None):
+    """
+    Writes the proxy of video_path to proxy_path (see the module
+    docstring). Sources slower than fps keep their own rate. Returns the
+    sidecar info dict. Raises ValueError if the video can't be read or
+    the proxy can't be written.
+    """
+    timer = timer or NULL_TIMER
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open {video_path}")
+    reported_fps = cap.get(cv2.CAP_PROP_FPS)
+    if 0 < reported_fps < 1000:
+        fps = min(fps, reported_fps)
+    else:
+        reported_fps = None
+
+    writer = None
+    slot = 0  # Next proxy frame
+    first = previous = None
+    intervals = []
+    try:
+        for seconds, frame in _timed_frames(cap, reported_fps or fps, timer):
+            if first is None:
+                first = seconds
+                height, width = frame.shape[:2]
+                size = proxy_size(width, height, max_dim)
+                writer = cv2.VideoWriter(
+                    proxy_path, cv2.VideoWriter_fourcc(*PROXY_FOURCC), fps, size)
+                if not writer.isOpened():
+                    raise ValueError(f"Could not write {proxy_path}")
+            else:
+                intervals.append(seconds - previous_seconds)
+            # Proxy frames up to half a slot before this frame's time show
+            # the previous frame
+            while previous is not None and (slot + 0.5) / fps <= seconds - first:
+                with timer.stage("encode"):
+                    writer.write(previous)
+                slot += 1
+            with timer.stage("resize"):
+                previous = (frame if size == (width, height) else
+                            cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+            previous_seconds = seconds
+
+        if previous is None:
+            raise ValueError(f"No frames in {video_path}")
+        duration = previous_seconds - first
+        while (slot - 0.5) / fps <= duration:
+            with timer.stage("encode"):
+                writer.write(previous)
+            slot += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+    intervals.sort()
+    median = intervals[len(intervals) // 2] if intervals else 0.0
+    return {
+        "fps": fps,
+        "frames": slot,
+        "width": size[0],
+        "height": size[1],
+        "source_width": width,
+        "source_height": height,
+        "source_frames": len(intervals) + 1,
+        "source_reported_fps": reported_fps,
+        "source_measured_fps": (len(intervals) / duration if duration else None),
+        "source_vfr": bool(median) and any(
+            abs(interval - median) > VFR_TOLERANCE * median
+            for interval in (intervals[0], intervals[-1])),
+        "duration": duration,
+    }
+
+
+def find_proxy(video_hash):
+    """
+    Returns the path of the proxy of the video whose content hash is
+    video_hash if proxies are enabled and it has been made, else None.
+    Never makes one, so it is safe to call while serving a request.
+    """
+    if not enabled() or not video_hash:
+        return None
+    path = os.path.join(settings.MEDIA_ROOT, PROXY_DIR,
+                        proxy_key(video_hash) + PROXY_EXT)
+    return path if os.path.exists(path) else None
+
+
+def ensure_proxy(video_path, video_hash=None):
+    """
+    Returns (path, hash) of the video to analyze in place of video_path:
+    its proxy, made now if it doesn't exist yet, and the proxy's key
+    (see proxy_key) as its hash. Returns video_path and its hash as
+    they are if proxies are disabled (settings.ANALYSIS_PROXY) or the
+    proxy can't be made, e.g. for a format OpenCV can't read.
+    """
+    if not enabled():
+        return video_path, video_hash
+    video_hash = video_hash or file_sha256(video_path)
+    key = proxy_key(video_hash)
+    target_dir = os.path.join(settings.MEDIA_ROOT, PROXY_DIR)
+    path = os.path.join(target_dir, key + PROXY_EXT)
+    if os.path.exists(path):
+        return path, key
+
+    os.makedirs(target_dir, exist_ok=True)
+    # The container comes from the extension, so keep it on the temp file
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix=".part" + PROXY_EXT)
+    os.close(fd)
+    try:
+        info = make_proxy(
+            video_path, tmp_path,
+            fps=getattr(settings, "ANALYSIS_PROXY_FPS", 30),
+            max_dim=getattr(settings, "ANALYSIS_PROXY_MAX_DIM", 640))
+        info["source"] = os.path.basename(video_path)
+        with open(os.path.join(target_dir, key + ".json"), "w") as f:
+            json.dump(info, f, indent=2)
+        # Publish the proxy last: whoever sees it also finds its sidecar
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, cv2.error):
+        logger.exception("Could not make a proxy of %s; analyzing the original",
+                         video_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return video_path, video_hash
+    return path, key
+
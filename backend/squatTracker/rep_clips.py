@@ -0,0 +1,173 @@
+"""
+Single-rep clips and stills, cut from a rep's video by seeking straight
+to the rep's recorded timestamps (SquatAnalysis.start_sec, bottom_sec,
+end_sec), so a client can show one rep without downloading and scrubbing
+the whole video.
+
+Frames are read from the video's analysis proxy (see proxy.py) if it
+has already been made, else from the video itself; a request never waits
+for a proxy to be transcoded. Seeking grabs forward frame by frame (see
+pose_estimation.seek_frame), which is exact on variable frame rate video
+and costs about 1-2 ms per frame skipped on a proxy, several times more
+on a full-resolution original. Stills are JPEGs encoded per request, in
+about 15 ms. Clips are WebM (VP8, the browser-playable codec OpenCV can write
+here), encoded once and kept in MEDIA_ROOT/clips/<source>-<start
+ms>-<end ms>.webm. VP8 encoding is slow (about 50 ms per 640x360 frame),
+so clips are scaled to CLIP_MAX_DIM and thinned to about CLIP_FPS; the
+first request for a clip still takes around a second.
+"""
+import os
+import tempfile
+
+import cv2
+from django.conf import settings
+
+from .pose_estimation import seek_frame
+from .proxy import find_proxy, proxy_size
+from .timing import NULL_TIMER
+
+CLIP_DIR = "clips"
+CLIP_EXT = ".webm"
+CLIP_FOURCC = "VP80"
+CLIP_CONTENT_TYPE = "video/webm"
+# Longer side of a clip, in pixels, and its approximate frame rate
+CLIP_MAX_DIM = 360
+CLIP_FPS = 15
+
+# Seconds of lead-in and lead-out around a rep's clip: a rep starts and
+# ends where the knee crosses the thresholds, part way through the motion
+CLIP_PADDING_SECONDS = 0.5
+
+STILL_JPEG_QUALITY = 85
+
+
+def rep_source(rep):
+    """
+    Returns the video to cut rep's clips and stills from: the analysis
+    proxy of the rep's video if it exists (see proxy.find_proxy), else
+    the video itself. Raises FileNotFoundError if the rep has no video or
+    its file is gone.
+    """
+    job = rep.job
+    if job is None or not job.video_path or not os.path.exists(job.video_path):
+        raise FileNotFoundError("The rep's video is not available")
+    return find_proxy(job.video_hash) or job.video_path
+
+
+def open_at(source, seconds):
+    """
+    Opens source positioned on the frame shown at `seconds`, the frame
+    the analysis counted there. Returns (capture, frame_rate,
+    frame_index); the capture is already at the end of the video if
+    `seconds` is past it.
+    """
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open {source}")
+    frame_rate = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_index = max(round(seconds * frame_rate), 0)
+    seek_frame(cap, frame_index)
+    return cap, frame_rate, frame_index
+
+
+def extract_still(source, seconds, timer=None):
+    """
+    Returns the frame of source shown at `seconds` as JPEG bytes, or None
+    if the video ends before it. timer receives "decode" and "encode".
+    """
+    timer = timer or NULL_TIMER
+    with timer.stage("decode"):
+        cap, _, _ = open_at(source, seconds)
+        try:
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+    if not ret:
+        return None
+    with timer.stage("encode"):
+        ok, jpeg = cv2.imencode(
+            ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, STILL_JPEG_QUALITY])
+    return jpeg.tobytes() if ok else None
+
+
+def extract_clip(source, start_sec, end_sec, path, max_dim=CLIP_MAX_DIM,
+                 fps=CLIP_FPS, timer=None):
+    """
+    Writes the part of source between start_sec and end_sec to path as a
+    WebM clip, scaled so its longer side is at most max_dim and keeping
+    every n-th frame for a rate of about fps. Returns the number of
+    frames written. Raises ValueError if the clip can't be written.
+    timer receives "decode" and "encode".
+    """
+    timer = timer or NULL_TIMER
+    with timer.stage("decode"):
+        cap, frame_rate, frame_index = open_at(source, start_sec)
+    end_frame = round(end_sec * frame_rate)
+    step = max(round(frame_rate / fps), 1)
+    writer = None
+    frames = 0
+    try:
+        for offset in range(end_frame - frame_index + 1):
+            with timer.stage("decode"):
+                if offset % step:
+                    if not cap.grab():
+                        break
+                    continue
+                ret, frame = cap.read()
+            if not ret:
+                break
+            if writer is None:
+                height, width = frame.shape[:2]
+                size = proxy_size(width, height, max_dim)
+                writer = cv2.VideoWriter(
+                    path, cv2.VideoWriter_fourcc(*CLIP_FOURCC),
+                    frame_rate / step, size)
+                if not writer.isOpened():
+                    raise ValueError(f"Could not write {path}")
+            with timer.stage("encode"):
+                if size != (width, height):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                writer.write(frame)
+            frames += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+    return frames
+
+
+def rep_clip(rep, timer=None):
+    """
+    Returns the path of rep's clip (padded by CLIP_PADDING_SECONDS),
+    encoding it on first use. Returns None if the rep has no timestamps
+    or no frames in its video; raises FileNotFoundError if its video is
+    gone.
+    """
+    if rep.start_sec is None or rep.end_sec is None:
+        return None
+    timer = timer or NULL_TIMER
+    with timer.stage("source"):
+        source = rep_source(rep)
+    start_sec = max(rep.start_sec - CLIP_PADDING_SECONDS, 0.0)
+    end_sec = rep.end_sec + CLIP_PADDING_SECONDS
+    target_dir = os.path.join(settings.MEDIA_ROOT, CLIP_DIR)
+    name = os.path.splitext(os.path.basename(source))[0]
+    path = os.path.join(
+        target_dir,
+        f"{name}-{round(start_sec * 1000)}-{round(end_sec * 1000)}{CLIP_EXT}")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(target_dir, exist_ok=True)
+    # The container comes from the extension, so keep it on the temp file
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix=".part" + CLIP_EXT)
+    os.close(fd)
+    try:
+        frames = extract_clip(source, start_sec, end_sec, tmp_path, timer=timer)
+        if not frames:
+            return None
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
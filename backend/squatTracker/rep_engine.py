@@ -0,0 +1,122 @@
+"""
+Streaming rep counter shared by the live trainer scripts and the backend
+analysis. Django-free.
+
+RepEngine consumes one joint angle per frame and keeps O(1) state per
+rep (start frame, frames seen, running extreme angle and its frame), so the per-frame
+path does a few comparisons and no allocation. It returns a RepEvent when
+a rep is counted.
+
+Each exercise configures:
+
+- direction: "up_down" for movements that start at a large angle and
+  bend below enter_threshold (squat knee, curl elbow); "down_up" for the
+  reverse, where the rep starts when the angle rises above
+  enter_threshold.
+- enter_threshold / exit_threshold: the rep starts when the angle passes
+  enter_threshold and ends when it returns past exit_threshold. Passing
+  enter_threshold is checked first, so a frame past both continues the
+  rep rather than ending it.
+- require_arming: only start a rep after the angle has been past
+  exit_threshold (the starting position) at least once.
+- count_on: "enter" counts the rep as soon as it starts (the live
+  scripts' behavior); "exit" counts it when it ends, if it lasted at
+  least min_rep_frames source frames (the backend's behavior).
+"""
+from collections import namedtuple
+
+IDLE = "idle"        # Not yet seen in the starting position
+READY = "ready"      # In (or back in) the starting position
+IN_REP = "in_rep"    # Past enter_threshold
+
+# extreme is the smallest angle reached for "up_down" reps and the largest
+# for "down_up" reps, first reached on extreme_frame (the bottom of a
+# squat). For count_on="enter", end_frame and extreme_frame are the frame
+# the rep was counted on and frames is 1.
+RepEvent = namedtuple(
+    "RepEvent",
+    ["rep", "start_frame", "end_frame", "frames", "extreme", "extreme_frame"])
+
+
+class RepEngine:
+    def __init__(self, direction="up_down", enter_threshold=90,
+                 exit_threshold=160, require_arming=False, count_on="exit",
+                 min_rep_frames=0):
+        if direction not in ("up_down", "down_up"):
+            raise ValueError(f"Unknown direction: {direction!r}")
+        if count_on not in ("enter", "exit"):
+            raise ValueError(f"Unknown count_on: {count_on!r}")
+        self.direction = direction
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.require_arming = require_arming
+        self.count_on = count_on
+        self.min_rep_frames = min_rep_frames
+
+        # Compare sign * angle so both directions use the same "<" / ">"
+        self._sign = 1 if direction == "up_down" else -1
+        self._enter = self._sign * enter_threshold
+        self._exit = self._sign * exit_threshold
+        self.reset()
+
+    def reset(self):
+        self.state = IDLE
+        self.count = 0
+        self.start_frame = None
+        self.rep_frames = 0
+        self._extreme = None
+        self._extreme_frame = None
+
+    @property
+    def in_rep(self):
+        return self.state == IN_REP
+
+    @property
+    def extreme(self):
+        """
+        Most extreme angle of the current rep so far, or None.
+        """
+        return None if self._extreme is None else self._sign * self._extreme
+
+    def update(self, frame_index, angle):
+        """
+        Feeds one frame's angle. frame_index counts source frames, so
+        skipped frames still count towards min_rep_frames; callers that
+        count on "enter" and don't need frame numbers may pass None. Returns a
+        RepEvent if this frame counted a rep, else None. After the call,
+        in_rep tells whether this frame is part of a rep.
+        """
+        value = self._sign * angle
+
+        if value < self._enter:
+            if self.state == IN_REP:
+                self.rep_frames += 1
+                if value < self._extreme:
+                    self._extreme = value
+                    self._extreme_frame = frame_index
+                return None
+            if self.state == IDLE and self.require_arming:
+                return None
+            self.state = IN_REP
+            self.start_frame = frame_index
+            self.rep_frames = 1
+            self._extreme = value
+            self._extreme_frame = frame_index
+            if self.count_on == "enter":
+                self.count += 1
+                return RepEvent(self.count, frame_index, frame_index, 1, angle,
+                                frame_index)
+            return None
+
+        if value > self._exit:
+            if self.state != IN_REP:
+                self.state = READY
+                return None
+            self.state = READY
+            if (self.count_on == "exit" and
+                    frame_index - self.start_frame >= self.min_rep_frames):
+                self.count += 1
+                return RepEvent(self.count, self.start_frame, frame_index,
+                                self.rep_frames, self._sign * self._extreme,
+                                self._extreme_frame)
+        return None
@@ -1,6 +1,8 @@
+from django.urls import reverse
 from rest_framework import serializers
 from .models import SquatAnalysis
 from .models import WorkoutVideo
+from .models import AnalysisJob
 
 
 class SquatAnalysisSerializer(serializers.ModelSerializer):
@@ -12,6 +14,35 @@ class SquatAnalysisSerializer(serializers.ModelSerializer):
 
 
 class WorkoutVideoSerializer(serializers.ModelSerializer):
+    # Range-capable URL for players (see media_streaming)
+    stream_url = serializers.SerializerMethodField()
+
     class Meta:
         model = WorkoutVideo
-        fields = ['id', 'title', 'video']
+        fields = ['id', 'title', 'video', 'stream_url', 'poster', 'preview']
+        # Made after upload (see previews.py); null until then
+        read_only_fields = ['poster', 'preview']
+
+    def get_stream_url(self, obj):
+        if not obj.pk:
+            return None
+        url = reverse('video-stream', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AnalysisJob
+        fields = ['id', 'status', 'start_time', 'end_time', 'frames_done',
+                  'total_frames', 'progress', 'result', 'error', 'created_at',
+                  'started_at', 'finished_at']
+
+    def get_progress(self, obj):
+        if obj.status == AnalysisJob.DONE:
+            return 1.0
+        if not obj.total_frames:
+            return 0.0
+        return round(obj.frames_done / obj.total_frames, 3)
@@ -1,24 +1,266 @@
-import cv2
-import mediapipe as mp
 import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import transaction
+
+from . import landmark_cache
+from .kinematics import (
+    JOINTS,
+    RIGHT_FOOT_INDEX,
+    RIGHT_KNEE,
+    array_angle,
+    joint_angles,
+)
+from .landmark_recording import LandmarkRecorder
 from .models import SquatAnalysis
+from .motion import find_active_segment
+from .pose_estimation import (
+    MISSING_LANDMARKS,
+    NUM_LANDMARKS,
+    FixedStride,
+    estimate_frame_range,
+    iter_pose_landmarks,
+    plan_frame_ranges,
+    video_properties,
+)
+from .rep_engine import RepEngine
+from .timing import NULL_TIMER
+
+# How often (in frames) analyze_squat_video reports progress
+PROGRESS_INTERVAL_FRAMES = 30
+
+# Reps are written to the database in one transaction per this many reps,
+# plus one at the end (see analyze_squat_video's incremental option)
+REPS_PER_CHECKPOINT = 50
+
+# Chunked analysis: ranges shorter than this aren't worth a process
+MIN_CHUNK_FRAMES = 150
+
+# Adaptive sampling analyzes every frame while the knee angle is within
+# this many degrees of the depth or recovery threshold
+ADAPTIVE_MARGIN_DEG = 15
+
+
+# Knee angle (hip-knee-ankle) and back angle (shoulder-hip-knee), right side
+KNEE_JOINT = JOINTS["right_knee"]
+BACK_JOINT = JOINTS["right_hip"]
+# A frame counts as "back straight" above this back angle
+BACK_STRAIGHT_ANGLE = 160
+
+
+def squat_features(landmarks):
+    """
+    Computes the per-frame inputs of SquatRepTracker for a whole
+    (frames, 33, k) landmark array in one vectorized pass. Returns lists
+    (knee_angles, back_angles, knee_over_toe); angles are NaN for frames
+    without a pose.
+    """
+    angles = joint_angles(landmarks, (KNEE_JOINT, BACK_JOINT))
+    # Rough knee-over-toe check: compare x-coords
+    knee_over_toe = (landmarks[:, RIGHT_KNEE, 0] <
+                     landmarks[:, RIGHT_FOOT_INDEX, 0])
+    return angles[:, 0].tolist(), angles[:, 1].tolist(), knee_over_toe.tolist()
+
+
+class SquatRepTracker:
+    """
+    Per-frame squat rep tracking: a RepEngine on the knee angle plus
+    running form-check counters. Feed it one frame of landmarks at a time
+    with update(); it returns a rep dict each time a rep is completed.
+    """
+
+    def __init__(self, frame_rate, depth_threshold=125, recovery_threshold=120,
+                 valid_depth_threshold=105, min_frames_per_rep=5,
+                 adherence_ratio=0.6):
+        self.frame_rate = frame_rate
+        self.depth_threshold = depth_threshold
+        self.recovery_threshold = recovery_threshold
+        self.valid_depth_threshold = valid_depth_threshold
+        self.min_frames_per_rep = min_frames_per_rep
+        # Share of rep frames that must pass a form check to report "Yes"
+        self.adherence_ratio = adherence_ratio
+
+        # A rep starts when the knee bends below depth_threshold and is
+        # counted when it straightens past recovery_threshold
+        self.engine = RepEngine(
+            "up_down", enter_threshold=depth_threshold,
+            exit_threshold=recovery_threshold,
+            min_rep_frames=min_frames_per_rep)
+        self.knee_over_toe_frames = 0
+        self.back_straight_frames = 0
+
+    def update(self, frame_index, lm):
+        """
+        frame_index: index of this frame in the source video. Frames may be
+        skipped; durations and min_frames_per_rep are measured in source
+        frames, so they don't depend on the sampling rate.
+        lm: (33, 4) landmark array for this frame, or None / NaN if no
+        pose was detected.
+        """
+        if lm is None:
+            return None
+        return self.update_angles(
+            frame_index, array_angle(lm, KNEE_JOINT),
+            array_angle(lm, BACK_JOINT),
+            lm.item(RIGHT_KNEE, 0) < lm.item(RIGHT_FOOT_INDEX, 0))
+
+    def update_angles(self, frame_index, angle, back_angle, knee_over_toe):
+        """
+        Same as update(), for a frame whose knee angle, back angle and
+        knee-over-toe flag were already computed (see squat_features()).
+        A NaN angle means no pose was detected.
+        """
+        if math.isnan(angle):
+            return None
+
+        engine = self.engine
+        event = engine.update(frame_index, angle)
+        if engine.in_rep:
+            # Between the thresholds the rep goes on, but the frame isn't
+            # one of its event.frames, which the form ratios divide by
+            if angle >= self.depth_threshold:
+                return None
+            if engine.rep_frames == 1:
+                self.knee_over_toe_frames = 0
+                self.back_straight_frames = 0
+            if knee_over_toe:
+                self.knee_over_toe_frames += 1
+            if back_angle > BACK_STRAIGHT_ANGLE:
+                self.back_straight_frames += 1
+            return None
+        if event is None:
+            return None
+
+        duration = (event.end_frame - event.start_frame) / self.frame_rate
+        # Where the rep is in the video, for clips and stills (see rep_clips)
+        start_sec = event.start_frame / self.frame_rate
+        # Share of the rep's frames that passed each form check
+        knee_over_toe_ratio = self.knee_over_toe_frames / event.frames
+        back_straight_ratio = self.back_straight_frames / event.frames
+        return {
+            "rep": event.rep,
+            "min_depth": round(event.extreme, 1),
+            "duration_sec": round(duration, 2),
+            "valid_depth": event.extreme < self.valid_depth_threshold,
+            "knees_over_toes": "Yes" if knee_over_toe_ratio > self.adherence_ratio else "No",
+            "back_straight":   "Yes" if back_straight_ratio > self.adherence_ratio else "No",
+            # Frames actually analyzed per second of this rep
+            "sample_fps": round(event.frames / duration, 1),
+            "start_sec": round(start_sec, 3),
+            "end_sec": round(start_sec + duration, 3),
+            "bottom_sec": round(event.extreme_frame / self.frame_rate, 3),
+        }
+
+
+class AdaptiveSquatSampler:
+    """
+    Frame sampler that analyzes every frame while the knee angle is near
+    the depth or recovery threshold, where reps start and end, and every
+    `sparse_stride` frames elsewhere (standing, or deep in the squat).
+    The bottom of a squat is sampled sparsely too, so min_depth can be a
+    few degrees shallower than with every frame analyzed.
+    """
+
+    def __init__(self, sparse_stride, depth_threshold=125,
+                 recovery_threshold=120, margin=ADAPTIVE_MARGIN_DEG):
+        self.sparse_stride = max(int(sparse_stride), 1)
+        self.low = min(depth_threshold, recovery_threshold) - margin
+        self.high = max(depth_threshold, recovery_threshold) + margin
+
+    def advance(self, lm):
+        if lm is None:
+            return self.sparse_stride
+        angle = array_angle(lm, KNEE_JOINT)
+        if self.low <= angle <= self.high:
+            return 1
+        return self.sparse_stride
+
+
+def _iter_chunked_landmarks(video_path, start_frame, end_frame, frame_count,
+                            workers, stride, max_dim, progress_callback,
+                            timer=NULL_TIMER):
+    """
+    Estimates landmarks for contiguous frame ranges of
+    [start_frame, end_frame) in separate processes and yields one
+    (frame_indices, landmarks) block per range, in frame order. frame_count
+    is the (approximate) number of frames in between. The caller feeds
+    them to a single rep tracker, so reps that span a range boundary are
+    stitched exactly as in the sequential path.
+    Decoding and inference happen in the worker processes, so timer only
+    sees the time spent waiting for them ("parallel_inference").
+    """
+    ranges = [
+        (start_frame + start, end_frame if end is None else start_frame + end)
+        for start, end in plan_frame_ranges(frame_count, workers,
+                                            MIN_CHUNK_FRAMES, align=stride)
+    ]
+    # spawn rather than fork: the web process may have analysis threads
+    # running, and MediaPipe isn't fork-safe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as pool:
+        futures = [
+            pool.submit(estimate_frame_range, video_path, start, end, True,
+                        stride, max_dim)
+            for start, end in ranges
+        ]
+        for future in futures:
+            with timer.stage("parallel_inference"):
+                indices, chunk = future.result()
+            if progress_callback and len(indices):
+                done = int(indices[-1]) + 1 - start_frame
+                progress_callback(done, max(frame_count, done))
+            yield indices.tolist(), chunk
 
 
-def calculate_angle(a, b, c):
+def _iter_frame_blocks(frames):
     """
-    Given three points a, b, and c, calculates the angle at b formed by a->b->c
+    Wraps (frame_index, landmarks_or_None) pairs from iter_pose_landmarks()
+    as single-frame (frame_indices, landmarks) blocks.
     """
-    ab = [a[0] - b[0], a[1] - b[1]]
-    cb = [c[0] - b[0], c[1] - b[1]]
-    dot = ab[0]*cb[0] + ab[1]*cb[1]
-    mag_ab = math.sqrt(ab[0]**2 + ab[1]**2)
-    mag_cb = math.sqrt(cb[0]**2 + cb[1]**2)
-    if mag_ab * mag_cb == 0:
-        return 0
-    return math.degrees(math.acos(dot / (mag_ab * mag_cb)))
+    for frame_index, lm in frames:
+        if lm is None:
+            lm = MISSING_LANDMARKS
+        yield [frame_index], lm.reshape(1, NUM_LANDMARKS, -1)
 
 
-def analyze_squat_video(video_path):
+def _save_reps(reps, job, replace):
+    """
+    Writes rep dicts as SquatAnalysis rows linked to job in a single
+    transaction. replace=True first deletes the job's existing rows, so a
+    rerun (e.g. a requeued job) doesn't duplicate them.
+    """
+    replace = replace and job is not None
+    if not reps and not replace:
+        return
+    with transaction.atomic():
+        if replace:
+            SquatAnalysis.objects.filter(job=job).delete()
+        SquatAnalysis.objects.bulk_create([
+            SquatAnalysis(
+                rep=rep["rep"],
+                min_depth=rep["min_depth"],
+                duration_sec=rep["duration_sec"],
+                valid_depth=rep["valid_depth"],
+                knees_over_toes=rep["knees_over_toes"],
+                back_straight=rep["back_straight"],
+                start_sec=rep["start_sec"],
+                end_sec=rep["end_sec"],
+                bottom_sec=rep["bottom_sec"],
+                job=job,
+            )
+            for rep in reps
+        ])
+
+
+def analyze_squat_video(video_path, progress_callback=None, workers=1,
+                        static_image_mode=False, stride=1, target_fps=None,
+                        adaptive=False, max_dim=None, roi=False,
+                        thresholds=None, use_cache=True, video_hash=None,
+                        job=None, record_path=None, timer=None,
+                        incremental=False, start_time=None, end_time=None,
+                        auto_trim=False):
     """
     Analyzes a squat video, returning a list of dictionaries with rep information:
       - Rep number
@@ -27,132 +269,249 @@ def analyze_squat_video(video_path):
       - Validity of the rep (based on angle threshold)
       - Whether knees were over the toes
       - Whether the back was kept straight
-    """
+      - Effective analysis frame rate during the rep (sample_fps)
+      - Where the rep starts, ends and bottoms out, in seconds into the
+        video (start_sec, end_sec, bottom_sec)
+
+    start_time and end_time (seconds, optional) limit the analysis to
+    that part of the video: frames before start_time are only grabbed,
+    never converted or run through MediaPipe (see
+    pose_estimation.seek_frame), and decoding stops at end_time. With
+    auto_trim=True a cheap motion pre-pass (see motion.py) further narrows
+    the range to where the video moves, so idle lead-in and lead-out are
+    never run through MediaPipe (unless landmarks of the whole video are
+    cached, and none are run). Frame indices, and so
+    rep timing, still count from the start of the video.
+
+    progress_callback, if given, is called as
+    progress_callback(frames_done, total_frames), counted within the
+    analyzed range, every
+    PROGRESS_INTERVAL_FRAMES analyzed frames and once more when the video
+    ends.
+
+    Sampling: only every `stride`-th frame is analyzed, or, if target_fps
+    is given, the stride that comes closest to that rate. With
+    adaptive=True that stride is only used away from the depth/recovery
+    thresholds and every frame is analyzed near them.
 
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose()
+    Inference input: frames are downscaled so their longer side is at most
+    max_dim pixels, and with roi=True cropped to the person found in the
+    previous frame (see PoseFrameProcessor). Landmarks are mapped back to
+    the full frame, so the angle logic is unchanged.
+
+    With workers > 1, pose estimation is split into frame ranges that run
+    in parallel processes, each with its own mp_pose.Pose. MediaPipe's
+    tracking mode makes each frame depend on every frame before it, so a
+    split run can't reproduce it; workers > 1 therefore always uses
+    static_image_mode, and gives the same reps as a sequential run with
+    static_image_mode=True (each range decodes forward to its first frame,
+    see pose_estimation.seek_frame, rather than seeking by frame number,
+    which is inexact on variable frame rate videos). Adaptive sampling and
+    ROI cropping depend on the previous frame's result and can't be
+    combined with workers > 1.
+
+    thresholds: optional SquatRepTracker keyword arguments
+    (depth_threshold, valid_depth_threshold, adherence_ratio, ...).
+
+    Landmarks are cached on disk by video content hash and estimator
+    options (see landmark_cache), so re-analyzing a video with different
+    thresholds skips decoding and inference. Pass video_hash if the
+    caller already knows the SHA-256 of the file. Adaptive sampling picks
+    frames based on the thresholds, so it is never cached. A partial
+    analysis is cut from the whole video's cached landmarks if they
+    exist, and cached as its own entry otherwise.
+
+    Reps are saved as SquatAnalysis rows linked to job (an AnalysisJob,
+    or None), in one bulk insert per REPS_PER_CHECKPOINT reps rather than
+    one write per rep, so inference never waits on the database. Rows a
+    previous run saved for the same job are replaced. incremental (a bool,
+    or a callable returning one) also saves the reps found so far at the
+    end of each block of landmarks (a single frame when decoding), so they
+    can be streamed while the video is still being analyzed (see
+    job_events); a callable is asked only when there are unsaved reps, so
+    run_job can write per rep just while a client is following the job.
+
+    record_path, if given, receives the analyzed frames' landmarks as a
+    landmark recording (see landmark_recording), with the analysis
+    options as metadata.
+
+    timer, a timing.StageTimer, receives the time spent per stage:
+    decode, preprocess, pose, reps (angles and rep logic), db, cache,
+    record and motion (the auto_trim pre-pass, apart from its decoding).
+    """
+    timer = timer or NULL_TIMER
+    frame_rate, total_frames = video_properties(video_path)
+    start_frame = round(start_time * frame_rate) if start_time else 0
+    end_frame = round(end_time * frame_rate) if end_time is not None else None
+    tracker = SquatRepTracker(frame_rate, **(thresholds or {}))
     results_data = []
 
-    cap = cv2.VideoCapture(video_path)
-    frame_rate = cap.get(cv2.CAP_PROP_FPS)
-
-    frame_index = 0
-    rep_index = 0
-
-    # Thresholds and counters
-    depth_threshold = 125
-    recovery_threshold = 120
-    valid_depth_threshold = 105
-    min_frames_per_rep = 5
-
-    # Track state for the current squat rep
-    current_rep = {
-        "depths": [],
-        "start_frame": None,
-        "knee_over_toe_frames": 0,
-        "back_straight_frames": 0,
-        "rep_frames": 0
-    }
-    in_squat = False
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(frame_rgb)
-
-        if results.pose_landmarks:
-            lm = results.pose_landmarks.landmark
-            # Landmark indices from MediaPipe Pose
-            # 24: Right hip; 26: Right knee; 28: Right ankle
-            # 12: Right shoulder; 8: Right ear; 32: Right foot index (toe)
-            # (Or left side if you prefer, just remain consistent.)
-            hip = [lm[24].x, lm[24].y]
-            knee = [lm[26].x, lm[26].y]
-            ankle = [lm[28].x, lm[28].y]
-            shoulder = [lm[12].x, lm[12].y]
-            ear = [lm[8].x,  lm[8].y]
-            toe = [lm[32].x, lm[32].y]
-
-            # Calculate knee angle
-            angle = calculate_angle(hip, knee, ankle)
-
-            # Check if knee is over toe (rough: compare x-coords)
-            knee_over_toe = (knee[0] < toe[0])
-
-            # Calculate back angle
-            back_angle = calculate_angle(shoulder, hip, knee)
-            back_straight = back_angle > 160
-
-            # If angle < threshold, we are "in a squat"
-            if angle < depth_threshold:
-                if not in_squat:
-                    # Start a new squat
-                    in_squat = True
-                    current_rep["start_frame"] = frame_index
-                    current_rep["depths"] = [angle]
-                    current_rep["knee_over_toe_frames"] = 1 if knee_over_toe else 0
-                    current_rep["back_straight_frames"] = 1 if back_straight else 0
-                    current_rep["rep_frames"] = 1
-                else:
-                    current_rep["depths"].append(angle)
-                    current_rep["knee_over_toe_frames"] += (
-                        1 if knee_over_toe else 0)
-                    current_rep["back_straight_frames"] += (
-                        1 if back_straight else 0)
-                    current_rep["rep_frames"] += 1
-
-            # If we were squatting and have recovered
-            elif in_squat and angle > recovery_threshold:
-                end_frame = frame_index
-                num_frames = end_frame - current_rep["start_frame"]
-
-                # Check if the rep lasted enough frames to be valid
-                if num_frames >= min_frames_per_rep:
-                    min_depth = min(
-                        current_rep["depths"]) if current_rep["depths"] else 999
-                    duration = num_frames / frame_rate
-                    is_valid = (min_depth < valid_depth_threshold)
-
-                    # Calculate average adherence
-                    knee_over_toe_ratio = current_rep["knee_over_toe_frames"] / max(
-                        current_rep["rep_frames"], 1)
-                    back_straight_ratio = current_rep["back_straight_frames"] / max(
-                        current_rep["rep_frames"], 1)
-
-                    results_data.append({
-                        "rep": rep_index + 1,
-                        "min_depth": round(min_depth, 1),
-                        "duration_sec": round(duration, 2),
-                        "valid_depth": is_valid,
-                        "knees_over_toes": "Yes" if knee_over_toe_ratio > 0.6 else "No",
-                        "back_straight":   "Yes" if back_straight_ratio > 0.6 else "No"
-                    })
-                    SquatAnalysis.objects.create(
-                        rep=rep_index + 1,
-                        min_depth=round(min_depth, 1),
-                        duration_sec=round(duration, 2),
-                        valid_depth=is_valid,
-                        knees_over_toes="Yes" if knee_over_toe_ratio > 0.6 else "No",
-                        back_straight="Yes" if back_straight_ratio > 0.6 else "No"
-                    )
-                    rep_index += 1
-
-                # Reset rep tracking
-                current_rep = {
-                    "depths": [],
-                    "start_frame": None,
-                    "knee_over_toe_frames": 0,
-                    "back_straight_frames": 0,
-                    "rep_frames": 0
-                }
-                in_squat = False
-
-        frame_index += 1
-
-    cap.release()
-    pose.close()
+    if target_fps:
+        stride = max(round(frame_rate / target_fps), 1)
+    if roi and workers > 1:
+        raise ValueError("ROI cropping can't be split across workers")
+    if adaptive:
+        if workers > 1:
+            raise ValueError("Adaptive sampling can't be split across workers")
+        sampler = AdaptiveSquatSampler(
+            stride, tracker.depth_threshold, tracker.recovery_threshold)
+    else:
+        sampler = FixedStride(stride)
+
+    if workers > 1:
+        # Short videos run in-process, but with the same estimator mode
+        static_image_mode = True
 
+    cache_key = cached = None
+    use_cache = use_cache and not adaptive and landmark_cache.cache_dir()
+    if use_cache:
+        with timer.stage("cache"):
+            options = dict(static_image_mode=static_image_mode,
+                           stride=sampler.stride, max_dim=max_dim, roi=roi)
+            video_hash = video_hash or landmark_cache.file_sha256(video_path)
+            cache_key = landmark_cache.cache_key(video_hash, **options)
+            cached = landmark_cache.load(cache_key)
+            if cached is not None and (start_frame or end_frame is not None):
+                frame_indices, landmarks = cached
+                lo = np.searchsorted(frame_indices, start_frame)
+                hi = (len(frame_indices) if end_frame is None else
+                      np.searchsorted(frame_indices, end_frame))
+                cached = frame_indices[lo:hi], landmarks[lo:hi]
+
+    # Trimming only saves inference, so it is skipped for cached landmarks
+    if auto_trim and cached is None:
+        with timer.stage("motion"):
+            start_frame, end_frame = find_active_segment(
+                video_path, start_frame, end_frame, timer=timer)
+    if use_cache and cached is None and (start_frame or end_frame is not None):
+        with timer.stage("cache"):
+            cache_key = landmark_cache.cache_key(
+                video_hash, start_frame=start_frame, end_frame=end_frame,
+                **options)
+            cached = landmark_cache.load(cache_key)
+    # Frames to analyze, as far as the container's frame count can tell
+    range_frames = max(
+        (total_frames if end_frame is None else min(end_frame, total_frames))
+        - start_frame, 0)
+    recorded = [] if cache_key and cached is None else None
+
+    # Landmarks arrive in (frame_indices, landmarks) blocks: one per frame
+    # when decoding, one per range or for the whole video otherwise. Each
+    # block's angles are computed in one vectorized pass.
+    if cached is not None:
+        frame_indices, landmarks = cached
+        blocks = [(frame_indices.tolist(), landmarks)]
+        report_every = None
+    elif workers > 1 and range_frames >= 2 * MIN_CHUNK_FRAMES:
+        blocks = _iter_chunked_landmarks(
+            video_path, start_frame, end_frame, range_frames, workers,
+            sampler.stride, max_dim, progress_callback, timer)
+        report_every = None  # chunks report their own progress
+    else:
+        blocks = _iter_frame_blocks(iter_pose_landmarks(
+            video_path, start_frame, end_frame,
+            static_image_mode=static_image_mode, sampler=sampler,
+            max_dim=max_dim, roi=roi, timer=timer))
+        report_every = PROGRESS_INTERVAL_FRAMES
+
+    recorder = None
+    if record_path:
+        recorder = LandmarkRecorder(record_path, fps=frame_rate, metadata={
+            "source": "analyze_squat_video",
+            "video_path": str(video_path),
+            "video_hash": video_hash,
+            "static_image_mode": static_image_mode,
+            # Adaptive runs have no fixed stride, only the sparse one
+            "stride": None if adaptive else sampler.stride,
+            "adaptive": adaptive,
+            "sparse_stride": sampler.sparse_stride if adaptive else None,
+            "max_dim": max_dim,
+            "roi": roi,
+            "start_frame": start_frame,
+            "end_frame": end_frame,
+        })
+
+    follow = incremental if callable(incremental) else lambda: incremental
+    frames_seen = start_frame
+    analyzed = 0
+    saved = 0  # Reps already written to the database
+    try:
+        for frame_indices, landmarks in blocks:
+            if recorded is not None:
+                recorded.append((frame_indices, landmarks))
+            if recorder is not None:
+                with timer.stage("record"):
+                    recorder.extend(frame_indices, landmarks)
+            with timer.stage("reps"):
+                knee_angles, back_angles, knee_over_toe = squat_features(landmarks)
+                for frame_index, angle, back_angle, over_toe in zip(
+                        frame_indices, knee_angles, back_angles, knee_over_toe):
+                    rep = tracker.update_angles(
+                        frame_index, angle, back_angle, over_toe)
+                    if rep:
+                        results_data.append(rep)
+                        if len(results_data) - saved >= REPS_PER_CHECKPOINT:
+                            with timer.stage("db"):
+                                _save_reps(results_data[saved:], job,
+                                           replace=not saved)
+                            saved = len(results_data)
+
+                    frames_seen = frame_index + 1
+                    analyzed += 1
+                    if (progress_callback and report_every and
+                            analyzed % report_every == 0):
+                        done = frames_seen - start_frame
+                        progress_callback(done, max(range_frames, done))
+
+            if len(results_data) > saved and follow():
+                with timer.stage("db"):
+                    _save_reps(results_data[saved:], job, replace=not saved)
+                saved = len(results_data)
+    finally:
+        if recorder is not None:
+            with timer.stage("record"):
+                recorder.close()
+
+    with timer.stage("db"):
+        _save_reps(results_data[saved:], job, replace=not saved)
+
+    if recorded:
+        with timer.stage("cache"):
+            landmark_cache.store(
+                cache_key,
+                [frame_index for indices, _ in recorded for frame_index in indices],
+                np.concatenate([landmarks for _, landmarks in recorded]))
+
+    if progress_callback:
+        done = max(range_frames, frames_seen - start_frame)
+        progress_callback(done, done)
+
+    return results_data
+
+
+def analyze_squat_landmarks(landmarks, frame_rate, frame_indices=None,
+                            thresholds=None, job=None, timer=None):
+    """
+    Runs analyze_squat_video's rep logic on landmarks that were estimated
+    elsewhere (e.g. on the client), skipping decoding and inference.
+    Returns the same list of rep dictionaries and saves them the same way.
+
+    landmarks: (frames, 33, k) array with k >= 2 (x, y, ...), NaN for
+    frames without a pose. frame_indices: source frame index of each
+    row, for sampled series; defaults to consecutive frames. timer
+    receives the "reps" and "db" stages.
+    """
+    timer = timer or NULL_TIMER
+    tracker = SquatRepTracker(frame_rate, **(thresholds or {}))
+    if frame_indices is None:
+        frame_indices = range(len(landmarks))
+    with timer.stage("reps"):
+        knee_angles, back_angles, knee_over_toe = squat_features(landmarks)
+        results_data = [
+            rep for rep in map(tracker.update_angles, frame_indices,
+                               knee_angles, back_angles, knee_over_toe)
+            if rep
+        ]
+    with timer.stage("db"):
+        _save_reps(results_data, job, replace=True)
     return results_data
@@ -0,0 +1,151 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .. import archive
+from ..landmark_cache import file_sha256
+from ..models import AnalysisJob, WorkoutVideo
+
+
+class InlinePool:
+    """
+    Stands in for the ProcessPoolExecutor: runs each job as it's
+    submitted, in this process and on the test database.
+    """
+
+    def __init__(self, max_workers, mp_context=None, initializer=None):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+# A TransactionTestCase: the run closes connections, which would roll
+# back a TestCase's transaction
+@override_settings(METRICS_DB=None)
+class ArchiveTests(TransactionTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.enterContext(override_settings(MEDIA_ROOT=self.dir))
+        os.makedirs(os.path.join(self.dir, "videos"))
+        self.enterContext(mock.patch.object(archive, "ProcessPoolExecutor", InlinePool))
+        self.interrupt = set()
+        self.analyzed = []
+        self.enterContext(mock.patch.object(archive, "run_job", self._run_job))
+
+    def _run_job(self, job, incremental=None):
+        self.assertFalse(incremental)
+        self.analyzed.append(job.video_path)
+        if os.path.basename(job.video_path) in self.interrupt:
+            raise KeyboardInterrupt
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            status=AnalysisJob.DONE, total_frames=30, finished_at=timezone.now())
+
+    def _video(self, name, content=None):
+        with open(os.path.join(self.dir, "videos", name), "wb") as f:
+            f.write(content or name.encode())
+        return WorkoutVideo.objects.create(title=name, video=f"videos/{name}")
+
+    def _job(self, video, status, **fields):
+        return AnalysisJob.objects.create(
+            video_path=video.video.path, video_hash=file_sha256(video.video.path),
+            status=status, **fields)
+
+    def test_hash_videos(self):
+        video = self._video("a.mp4")
+        missing = WorkoutVideo.objects.create(title="gone", video="videos/gone.mp4")
+        log = []
+        found = archive.hash_videos([video, missing], log=log.append)
+        self.assertEqual(found, [video])
+        self.assertEqual(len(log), 1)
+        video.refresh_from_db()
+        self.assertEqual(video.video_hash, file_sha256(video.video.path))
+
+    def test_plan(self):
+        new, queued, running, failed, stale, done, copy = (
+            self._video(name) for name in
+            ["new.mp4", "queued.mp4", "running.mp4", "failed.mp4", "stale.mp4",
+             "done.mp4", "copy.mp4"])
+        queued_job = self._job(queued, AnalysisJob.QUEUED)
+        self._job(running, AnalysisJob.RUNNING)
+        self._job(failed, AnalysisJob.FAILED)
+        long_ago = timezone.now() - timedelta(days=30)
+        self._job(stale, AnalysisJob.DONE, finished_at=long_ago)
+        # Only the newest job counts
+        self._job(done, AnalysisJob.FAILED)
+        self._job(done, AnalysisJob.DONE, finished_at=timezone.now())
+        # A clip's job doesn't count for the whole video
+        self._job(new, AnalysisJob.DONE, start_time=1.0)
+        with open(copy.video.path, "wb") as f:
+            f.write(b"done.mp4")
+        videos = archive.hash_videos(WorkoutVideo.objects.order_by("pk"))
+
+        work, still_running = archive.plan(
+            videos, stale_before=timezone.now() - timedelta(days=1))
+        self.assertEqual([(video.pk, reason, job) for video, reason, job in work], [
+            (new.pk, archive.NEW, None),
+            (queued.pk, archive.QUEUED, queued_job),
+            (failed.pk, archive.FAILED, None),
+            (stale.pk, archive.STALE, None),
+        ])
+        self.assertEqual(still_running, [running])
+        work, _ = archive.plan(videos, retry_failed=False)
+        self.assertEqual([video.pk for video, _, _ in work], [new.pk, queued.pk])
+
+        job_ids = archive.enqueue(work)
+        self.assertEqual(job_ids[1], queued_job.pk)
+        self.assertEqual(AnalysisJob.objects.get(pk=job_ids[0]).video_path,
+                         new.video.path)
+
+    def test_run(self):
+        videos = archive.hash_videos([self._video("a.mp4"), self._video("b.mp4")])
+        work, _ = archive.plan(videos)
+        job_ids = archive.enqueue(work)
+        # Claimed elsewhere in the meantime
+        AnalysisJob.objects.filter(pk=job_ids[1]).update(status=AnalysisJob.RUNNING)
+        totals = archive.run(job_ids, processes=2)
+        self.assertEqual({k: v for k, v in totals.items() if k != "seconds"},
+                         {"done": 1, "failed": 0, "skipped": 1, "frames": 30})
+        self.assertEqual(self.analyzed, [videos[0].video.path])
+
+    def test_interrupted_run_resumes(self):
+        for name in ["a.mp4", "b.mp4", "c.mp4"]:
+            self._video(name)
+        self.interrupt = {"b.mp4"}
+        with self.assertRaisesMessage(CommandError, "rerun the command to resume"):
+            call_command("analyze_archive", processes=2, stdout=io.StringIO())
+        statuses = dict(AnalysisJob.objects.values_list("video_path", "status"))
+        self.assertEqual(sorted(statuses.values()), [
+            AnalysisJob.DONE, AnalysisJob.DONE, AnalysisJob.QUEUED])
+
+        self.interrupt = set()
+        self.analyzed = []
+        out = io.StringIO()
+        call_command("analyze_archive", stdout=out)
+        self.assertIn("3 video(s) in the archive, 1 to analyze (1 queued).",
+                      out.getvalue())
+        self.assertIn("Done: 1 analyzed, 0 failed, 0 skipped", out.getvalue())
+        self.assertEqual([os.path.basename(path) for path in self.analyzed], ["b.mp4"])
+        # The interrupted video reused its job
+        self.assertEqual(AnalysisJob.objects.count(), 3)
+
+        out = io.StringIO()
+        call_command("analyze_archive", "--dry-run", stdout=out)
+        self.assertEqual(out.getvalue(), "3 video(s) in the archive, 0 to analyze.\n")
@@ -0,0 +1,129 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from .. import squat_analysis
+from ..pose_estimation import plan_frame_ranges, seek_frame
+from .utils import squat_landmarks, track_reps
+
+# A phone recording with a variable frame rate, on which seeking with
+# CAP_PROP_POS_FRAMES lands a frame early from about frame 100 on
+VFR_VIDEO = os.path.join(settings.BASE_DIR, "media",
+                         "WhatsApp Video 2025-04-03 at 11.18.17.mp4")
+
+
+class PlanFrameRangesTests(SimpleTestCase):
+    def test_ranges_cover_the_video_contiguously(self):
+        for frame_count, chunks, min_frames, align in [
+                (1000, 4, 150, 1), (1000, 4, 150, 3), (997, 3, 1, 7),
+                (310, 8, 150, 1), (10, 4, 1, 1)]:
+            ranges = plan_frame_ranges(frame_count, chunks, min_frames, align)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertIsNone(ranges[-1][1])
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+            self.assertTrue(all(start % align == 0 for start, _ in ranges))
+            self.assertLessEqual(len(ranges), chunks)
+            self.assertLessEqual(len(ranges), max(frame_count // min_frames, 1))
+
+    def test_short_or_unknown_length_is_one_range(self):
+        self.assertEqual(plan_frame_ranges(0, 4), [(0, None)])
+        self.assertEqual(plan_frame_ranges(-1, 4), [(0, None)])
+        self.assertEqual(plan_frame_ranges(200, 4, 150), [(0, None)])
+
+    def test_even_split(self):
+        self.assertEqual(plan_frame_ranges(1000, 4, 150),
+                         [(0, 250), (250, 500), (500, 750), (750, None)])
+
+
+class ChunkedLandmarksTests(SimpleTestCase):
+    """
+    _iter_chunked_landmarks, with the process pool swapped for threads
+    and pose estimation for slices of a synthetic landmark series.
+    """
+    frame_count = 1000
+
+    def setUp(self):
+        frames = np.arange(self.frame_count)
+        angles = 125 + 50 * np.cos(2 * np.pi * frames / 97)
+        angles[::37] = np.nan  # Frames without a pose
+        self.landmarks = squat_landmarks(angles)
+
+    def _estimate(self, video_path, start, end, static_image_mode, stride, max_dim):
+        indices = np.arange(start, self.frame_count if end is None else end, stride)
+        return indices, self.landmarks[indices]
+
+    def _chunked(self, start_frame, workers, stride):
+        with mock.patch.object(squat_analysis, "estimate_frame_range", self._estimate), \
+                mock.patch.object(squat_analysis, "ProcessPoolExecutor",
+                                  lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)):
+            return list(squat_analysis._iter_chunked_landmarks(
+                "video.mp4", start_frame, None, self.frame_count - start_frame,
+                workers, stride, None, None))
+
+    def test_same_reps_as_a_sequential_run(self):
+        for start_frame, workers, stride in [(0, 4, 1), (0, 4, 3), (40, 3, 2), (0, 1, 1)]:
+            with self.subTest(start_frame=start_frame, workers=workers, stride=stride):
+                blocks = self._chunked(start_frame, workers, stride)
+                indices = np.arange(start_frame, self.frame_count, stride)
+                sequential = track_reps(
+                    ([i], self.landmarks[i:i + 1]) for i in indices)
+                self.assertGreater(len(sequential), 5)
+                self.assertEqual(track_reps(blocks), sequential)
+                # Every sampled frame, once and in order
+                self.assertEqual([i for block, _ in blocks for i in block],
+                                 indices.tolist())
+
+    def test_a_rep_spans_a_range_boundary(self):
+        blocks = self._chunked(0, 4, 1)
+        boundaries = [block[0] for block, _ in blocks[1:]]
+        reps = track_reps(blocks)
+        self.assertTrue(any(
+            rep["start_sec"] * 30 < boundary < rep["end_sec"] * 30
+            for rep in reps for boundary in boundaries))
+
+
+@skipUnless(os.path.exists(VFR_VIDEO), "sample video not checked out")
+class SeekFrameTests(SimpleTestCase):
+    def test_lands_on_the_frame_a_sequential_read_gives(self):
+        cap = cv2.VideoCapture(VFR_VIDEO)
+        frames = []
+        while len(frames) <= 250:
+            ret, frame = cap.read()
+            self.assertTrue(ret)
+            frames.append(frame)
+        cap.release()
+        for frame_index in (0, 1, 99, 150, 250):
+            with self.subTest(frame_index=frame_index):
+                cap = cv2.VideoCapture(VFR_VIDEO)
+                self.assertTrue(seek_frame(cap, frame_index))
+                ret, frame = cap.read()
+                cap.release()
+                self.assertTrue(ret)
+                np.testing.assert_array_equal(frame, frames[frame_index])
+
+    def test_past_the_end(self):
+        cap = cv2.VideoCapture(VFR_VIDEO)
+        self.assertFalse(seek_frame(cap, 100000))
+        cap.release()
+
+
+@skipUnless(os.path.exists(VFR_VIDEO), "sample video not checked out")
+class ChunkedVideoTests(TestCase):
+    """
+    A real chunked run, in worker processes, on a video where seeking
+    by frame number is off by one.
+    """
+
+    def test_same_reps_as_a_sequential_static_run(self):
+        sequential = squat_analysis.analyze_squat_video(
+            VFR_VIDEO, static_image_mode=True, stride=3, use_cache=False)
+        chunked = squat_analysis.analyze_squat_video(
+            VFR_VIDEO, workers=3, stride=3, use_cache=False)
+        self.assertGreater(len(sequential), 2)
+        self.assertEqual(chunked, sequential)
@@ -0,0 +1,66 @@
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+SCRIPT = os.path.join(settings.BASE_DIR.parent, "SquatCounter.py")
+SAMPLE_VIDEO = os.path.join(settings.BASE_DIR, "media",
+                            "WhatsApp Video 2025-04-03 at 17.22.19.mp4")
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("SquatCounter", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@skipUnless(os.path.exists(SCRIPT) and os.path.exists(SAMPLE_VIDEO),
+            "SquatCounter.py or the sample video is not checked out")
+class HeadlessTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.script = load_script()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        os.makedirs(os.path.join(self.dir, "b"))
+        self.video = os.path.join(self.dir, "b", "squat.MP4")
+        shutil.copy(SAMPLE_VIDEO, self.video)
+        self.broken = os.path.join(self.dir, "a.mp4")
+        with open(self.broken, "wb") as f:
+            f.write(b"not a video")
+        with open(os.path.join(self.dir, "notes.txt"), "w") as f:
+            f.write("not a video either")
+
+    def test_find_videos(self):
+        self.assertEqual(self.script.find_videos([self.dir]), [self.broken, self.video])
+        self.assertEqual(self.script.find_videos([self.video, self.broken]),
+                         [self.broken, self.video])
+
+    def test_json_lines(self):
+        output = io.StringIO()
+        self.script.run_headless([self.dir], output)
+        events = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        self.assertEqual(events[0]["event"], "error")
+        self.assertEqual(events[0]["video"], self.broken)
+        summary = events[-1]
+        self.assertEqual(summary["event"], "summary")
+        self.assertEqual(summary["video"], self.video)
+        self.assertEqual(summary["frames"], 104)
+        self.assertEqual(summary["reps"], {"Bicep Curl": 0, "Squat": 1, "Push-Up": 0})
+        self.assertEqual(summary["total_reps"], 1)
+        # The clip holds one squat, bottoming out near its end
+        reps = [event for event in events if event["event"] == "rep"]
+        self.assertEqual([(e["exercise"], e["rep"]) for e in reps], [("Squat", 1)])
+        self.assertEqual(reps[0]["video"], self.video)
+        self.assertAlmostEqual(reps[0]["time_sec"], reps[0]["frame"] / 30, delta=0.05)
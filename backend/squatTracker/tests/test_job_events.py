@@ -0,0 +1,150 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import jobs, squat_analysis
+from ..job_events import JobEvents
+from ..models import AnalysisJob
+from .utils import make_rep, squat_landmarks
+
+
+def parse_events(text):
+    """
+    [(event, data, id)] for the events in an event-stream text.
+    """
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines()
+                      if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"]),
+                           fields.get("id")))
+    return events
+
+
+@override_settings(METRICS_DB=None, ANALYSIS_EVENTS_POLL_INTERVAL=0)
+class JobEventsTests(TestCase):
+    def setUp(self):
+        self.job = AnalysisJob.objects.create(
+            video_path="a.mp4", status=AnalysisJob.RUNNING,
+            frames_done=30, total_frames=90)
+
+    def _url(self):
+        return f"/api/analyze/{self.job.pk}/events/"
+
+    def _finish(self):
+        AnalysisJob.objects.filter(pk=self.job.pk).update(
+            status=AnalysisJob.DONE, frames_done=90, result=[{"rep": 1}])
+
+    def test_poll(self):
+        state = JobEvents(self.job)
+        events = parse_events(state.poll())
+        self.assertEqual(events, [("progress", {
+            "status": "running", "frames_done": 30, "total_frames": 90,
+            "progress": 0.333}, None)])
+        # Watching makes the analysis save reps as it finds them
+        self.job.refresh_from_db()
+        self.assertGreater(self.job.watched_until, timezone.now())
+        self.assertEqual(state.poll(), "")
+
+        rep = make_rep(self.job, rep=1)
+        events = parse_events(state.poll())
+        self.assertEqual([(e, data["id"], event_id) for e, data, event_id in events],
+                         [("rep", rep.pk, "1")])
+        self._finish()
+        self.assertEqual(parse_events(state.poll()),
+                         [("done", {"result": [{"rep": 1}]}, None)])
+        self.assertTrue(state.finished)
+
+    def test_stream(self):
+        for i in (1, 2, 3):
+            make_rep(self.job, rep=i)
+        self._finish()
+        response = self.client.get(self._url(), HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        text = b"".join(response.streaming_content).decode()
+        self.assertTrue(text.startswith("retry: "))
+        self.assertEqual([(e, i) for e, _, i in parse_events(text)],
+                         [("job", None), ("rep", "1"), ("rep", "2"),
+                          ("rep", "3"), ("done", None)])
+
+        # A reconnecting EventSource resumes after the last rep it got
+        response = self.client.get(self._url(), HTTP_ACCEPT="text/event-stream",
+                                   HTTP_LAST_EVENT_ID="2")
+        events = parse_events(b"".join(response.streaming_content).decode())
+        self.assertEqual([(e, i) for e, _, i in events],
+                         [("job", None), ("rep", "3"), ("done", None)])
+
+    def test_follows_a_running_job(self):
+        response = self.client.get(self._url(), HTTP_ACCEPT="text/event-stream")
+        chunks = iter(response.streaming_content)
+        self.assertEqual(parse_events(next(chunks).decode())[0][0], "job")
+        self.assertEqual(parse_events(next(chunks).decode())[0][0], "progress")
+        make_rep(self.job, rep=1)
+        self.assertEqual(parse_events(next(chunks).decode())[0][0], "rep")
+        self._finish()
+        self.assertEqual(parse_events(next(chunks).decode())[0][0], "done")
+        self.assertIsNone(next(chunks, None))
+
+    def test_failed_and_missing_jobs(self):
+        AnalysisJob.objects.filter(pk=self.job.pk).update(
+            status=AnalysisJob.FAILED, error="Could not open a.mp4")
+        response = self.client.get(self._url(), HTTP_ACCEPT="text/event-stream")
+        events = parse_events(b"".join(response.streaming_content).decode())
+        self.assertEqual(events[-1], ("failed", {"error": "Could not open a.mp4"}, None))
+
+        response = self.client.get("/api/analyze/999/events/",
+                                   HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(parse_events(response.content.decode())[0][0], "error")
+
+
+class WatchedAnalysisTests(TestCase):
+    """
+    Reps are saved one by one only while a stream watches the job.
+    """
+
+    def setUp(self):
+        self.job = AnalysisJob.objects.create(video_path="a.mp4")
+        frames = np.arange(600)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+
+    def _inserts(self, incremental):
+        def iter_pose_landmarks(video_path, start_frame, end_frame, **kwargs):
+            yield from enumerate(self.landmarks)
+
+        with mock.patch.object(squat_analysis, "iter_pose_landmarks", iter_pose_landmarks), \
+                mock.patch.object(squat_analysis, "video_properties",
+                                  return_value=(30.0, len(self.landmarks))), \
+                CaptureQueriesContext(connection) as queries:
+            reps = squat_analysis.analyze_squat_video(
+                "a.mp4", use_cache=False, job=self.job, incremental=incremental)
+        self.assertEqual(len(reps), 6)
+        return len([q for q in queries if q["sql"].startswith("INSERT")])
+
+    def test_unwatched_job_saves_in_bulk(self):
+        watched = jobs._watched(self.job)
+        self.assertFalse(watched())
+        self.assertEqual(self._inserts(watched), 1)
+
+    def test_watched_job_saves_each_rep(self):
+        AnalysisJob.objects.filter(pk=self.job.pk).update(
+            watched_until=timezone.now() + timedelta(seconds=10))
+        self.assertEqual(self._inserts(jobs._watched(self.job)), 6)
+
+    def test_watch_checks_are_throttled(self):
+        watched = jobs._watched(self.job)
+        with self.assertNumQueries(1):
+            watched()
+            watched()
+        with mock.patch.object(jobs, "WATCH_CHECK_SECONDS", 0), \
+                self.assertNumQueries(2):
+            watched()
+            watched()
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from .. import jobs
+from ..models import AnalysisJob
+
+
+@override_settings(METRICS_DB=None)
+class JobQueueTests(TestCase):
+    def test_claims_the_oldest_queued_job(self):
+        first = AnalysisJob.objects.create(video_path="a.mp4")
+        second = AnalysisJob.objects.create(video_path="b.mp4")
+        AnalysisJob.objects.create(video_path="c.mp4", status=AnalysisJob.DONE)
+
+        claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual(claimed.status, AnalysisJob.RUNNING)
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(jobs.claim_next_job().pk, second.pk)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_a_job_is_claimed_once(self):
+        job = AnalysisJob.objects.create(video_path="a.mp4")
+        self.assertIsNotNone(jobs.claim_job(job.pk))
+        self.assertIsNone(jobs.claim_job(job.pk))
+
+    def test_requeue_running_jobs(self):
+        running = AnalysisJob.objects.create(
+            video_path="a.mp4", status=AnalysisJob.RUNNING, frames_done=10)
+        AnalysisJob.objects.create(video_path="b.mp4", status=AnalysisJob.DONE)
+        self.assertEqual(jobs.requeue_running_jobs(), 1)
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.frames_done, running.started_at),
+                         (AnalysisJob.QUEUED, 0, None))
+
+
+@override_settings(METRICS_DB=None, ANALYSIS_PROXY=False)
+class RunJobTests(TestCase):
+    def setUp(self):
+        self.job = AnalysisJob.objects.create(video_path="squat.mp4")
+
+    def _run(self, analyze):
+        with mock.patch.object(jobs, "analyze_squat_video", analyze):
+            jobs.run_job(jobs.claim_job(self.job.pk), incremental=False)
+        self.job.refresh_from_db()
+
+    def test_done(self):
+        def analyze(video_path, progress_callback, **kwargs):
+            progress_callback(30, 60)
+            return [{"rep": 1}]
+
+        self._run(analyze)
+        self.assertEqual(self.job.status, AnalysisJob.DONE)
+        self.assertEqual(self.job.result, [{"rep": 1}])
+        self.assertEqual((self.job.frames_done, self.job.total_frames), (30, 60))
+        self.assertIsNotNone(self.job.finished_at)
+        self.assertIn("total", self.job.timings)
+
+    def test_failed(self):
+        def analyze(video_path, **kwargs):
+            raise ValueError("Could not open squat.mp4")
+
+        self._run(analyze)
+        self.assertEqual(self.job.status, AnalysisJob.FAILED)
+        self.assertEqual(self.job.error, "Could not open squat.mp4")
+        self.assertIsNone(self.job.result)
+
+
+@override_settings(METRICS_DB=None, ANALYSIS_RUN_IN_PROCESS=False)
+class AnalyzeViewTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_queues_a_job(self):
+        response = self.client.post("/api/analyze/", {
+            "video": SimpleUploadedFile("squat.mp4", b"\0" * 100),
+            "start_time": "2"})
+        self.assertEqual(response.status_code, 202)
+        job = AnalysisJob.objects.get(pk=response.json()["job_id"])
+        self.assertEqual((job.status, job.start_time), (AnalysisJob.QUEUED, 2.0))
+
+        response = self.client.get(response.json()["status_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], AnalysisJob.QUEUED)
+
+    def test_errors(self):
+        self.assertEqual(self.client.post("/api/analyze/").status_code, 400)
+        response = self.client.post("/api/analyze/", {
+            "video": SimpleUploadedFile("squat.mp4", b"\0"), "end_time": "-1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/analyze/999/").status_code, 404)
@@ -0,0 +1,71 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..kinematics import (
+    JOINTS, array_angle, calculate_angle, joint_angles, landmark_angle,
+)
+from ..pose_estimation import NUM_LANDMARKS
+from ..squat_analysis import SquatRepTracker, squat_features
+from .utils import squat_landmarks
+
+
+def acos_angle(a, b, c):
+    """
+    The dot-product form the scripts used before kinematics.py.
+    """
+    ba, bc = np.subtract(a, b), np.subtract(c, b)
+    cosine = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
+    return math.degrees(math.acos(np.clip(cosine, -1.0, 1.0)))
+
+
+class JointAngleTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.landmarks = rng.random((200, NUM_LANDMARKS, 4), dtype=np.float32)
+        self.landmarks[::7] = np.nan  # Frames without a pose
+        self.joints = list(JOINTS.values())
+
+    def test_vectorized_matches_the_scalar_paths(self):
+        angles = joint_angles(self.landmarks, self.joints)
+        self.assertEqual(angles.shape, (200, len(self.joints)))
+        for frame, lm in enumerate(self.landmarks):
+            points = [SimpleNamespace(x=float(x), y=float(y))
+                      for x, y in lm[:, :2]]
+            for j, joint in enumerate(self.joints):
+                if np.isnan(lm).any():
+                    self.assertTrue(math.isnan(angles[frame, j]))
+                    self.assertTrue(math.isnan(array_angle(lm, joint)))
+                    continue
+                self.assertAlmostEqual(angles[frame, j], array_angle(lm, joint), places=9)
+                self.assertAlmostEqual(angles[frame, j], landmark_angle(points, joint), places=9)
+                a, b, c = (lm[i, :2].astype(np.float64) for i in joint)
+                self.assertAlmostEqual(angles[frame, j], acos_angle(a, b, c), places=4)
+
+    def test_known_angles(self):
+        for a, c, expected in [
+            ((1, 0), (0, 1), 90),
+            ((1, 0), (-1, 0), 180),
+            ((1, 0), (2, 0), 0),
+            ((1, 1), (1, -1), 90),
+            ((1, 0), (1, 1e-9), 0),
+            ((0, 0), (1, 0), 0),  # Degenerate: a on top of b
+        ]:
+            with self.subTest(a=a, c=c):
+                self.assertAlmostEqual(calculate_angle(a, (0, 0), c), expected, places=6)
+
+    def test_squat_features_match_the_per_frame_tracker(self):
+        frames = np.arange(600)
+        landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+        landmarks[::11] = np.nan
+
+        by_frame = SquatRepTracker(30.0)
+        expected = [by_frame.update(i, None if np.isnan(lm).any() else lm)
+                    for i, lm in enumerate(landmarks)]
+        vectorized = SquatRepTracker(30.0)
+        reps = [vectorized.update_angles(i, *features)
+                for i, *features in zip(frames, *squat_features(landmarks))]
+        self.assertEqual(reps, expected)
+        self.assertGreater(len([rep for rep in reps if rep]), 4)
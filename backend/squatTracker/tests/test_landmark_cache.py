@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import landmark_cache, squat_analysis
+from .utils import squat_landmarks
+
+
+class LandmarkCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.enterContext(override_settings(LANDMARK_CACHE_DIR=self.dir,
+                                            LANDMARK_CACHE_MAX_BYTES=None))
+
+    def test_round_trip(self):
+        landmarks = squat_landmarks([170, np.nan, 90])
+        landmark_cache.store("key", [0, 2, 4], landmarks)
+        frame_indices, cached = landmark_cache.load("key")
+        self.assertEqual(frame_indices.tolist(), [0, 2, 4])
+        np.testing.assert_array_equal(cached, landmarks)
+        self.assertIsNone(landmark_cache.load("other"))
+
+    def test_disabled(self):
+        with override_settings(LANDMARK_CACHE_DIR=None):
+            landmark_cache.store("key", [0], squat_landmarks([90]))
+            self.assertIsNone(landmark_cache.load("key"))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_key(self):
+        key = landmark_cache.cache_key("a" * 64, stride=1, max_dim=None)
+        self.assertTrue(key.startswith("a" * 64))
+        self.assertEqual(key, landmark_cache.cache_key("a" * 64, max_dim=None, stride=1))
+        self.assertNotEqual(key, landmark_cache.cache_key("a" * 64, stride=2, max_dim=None))
+        self.assertNotEqual(key, landmark_cache.cache_key("b" * 64, stride=1, max_dim=None))
+
+    def test_evicts_the_least_recently_used(self):
+        landmarks = squat_landmarks([90] * 10)
+        for age, key in enumerate(["new", "old", "oldest"]):
+            landmark_cache.store(key, range(10), landmarks)
+            mtime = 1_000_000 - age * 100
+            os.utime(os.path.join(self.dir, key), (mtime, mtime))
+        entry_bytes = sum(
+            e.stat().st_size for e in os.scandir(os.path.join(self.dir, "new")))
+        # Reading an entry makes it the most recently used
+        landmark_cache.load("oldest")
+
+        removed, freed = landmark_cache.prune(2 * entry_bytes)
+        self.assertEqual((removed, freed), (1, entry_bytes))
+        self.assertEqual(sorted(os.listdir(self.dir)), ["new", "oldest"])
+        self.assertEqual(landmark_cache.prune(0), (2, 2 * entry_bytes))
+
+
+class CachedAnalysisTests(TestCase):
+    """
+    analyze_squat_video stores the landmarks of a first run and replays
+    them, without pose estimation, for the same video and options.
+    """
+
+    def setUp(self):
+        cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache)
+        self.enterContext(override_settings(LANDMARK_CACHE_DIR=cache))
+        frames = np.arange(600)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+        self.calls = 0
+
+    def _iter_pose_landmarks(self, video_path, start_frame, end_frame, **kwargs):
+        self.calls += 1
+        for frame_index in range(start_frame, len(self.landmarks)):
+            yield frame_index, self.landmarks[frame_index]
+
+    def _analyze(self, **kwargs):
+        with mock.patch.object(squat_analysis, "iter_pose_landmarks",
+                               self._iter_pose_landmarks), \
+                mock.patch.object(squat_analysis, "video_properties",
+                                  return_value=(30.0, len(self.landmarks))):
+            return squat_analysis.analyze_squat_video(
+                "video.mp4", video_hash="a" * 64, **kwargs)
+
+    def test_replays_cached_landmarks(self):
+        first = self._analyze()
+        self.assertEqual(self._analyze(), first)
+        self.assertEqual(self.calls, 1)
+        # Other thresholds reuse the landmarks too
+        self._analyze(thresholds={"depth_threshold": 110})
+        self.assertEqual(self.calls, 1)
+        # Other estimator options don't
+        self._analyze(max_dim=320)
+        self.assertEqual(self.calls, 2)
+
+    def test_time_range_is_cut_from_the_whole_video(self):
+        whole = self._analyze()
+        # From and to frames where the knee is straight
+        part = self._analyze(start_time=194 / 30, end_time=485 / 30)
+        self.assertEqual(self.calls, 1)
+        inside = [rep for rep in whole
+                  if 194 / 30 <= rep["start_sec"] and rep["end_sec"] < 485 / 30]
+        self.assertEqual(len(inside), 3)
+        # Numbered from 1 again
+        self.assertEqual(part, [dict(rep, rep=i) for i, rep in enumerate(inside, 1)])
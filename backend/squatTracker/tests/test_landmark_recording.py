@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from .. import squat_analysis
+from ..landmark_recording import LandmarkRecorder, LandmarkRecording
+from ..pose_estimation import NUM_LANDMARKS
+from .utils import squat_landmarks
+
+
+class LandmarkRecordingTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "test.lmk")
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        landmarks = rng.random((6, NUM_LANDMARKS, 4), dtype=np.float32)
+        with LandmarkRecorder(self.path, fps=10, metadata={"source": "test"}) as recorder:
+            recorder.append(landmarks[0])
+            recorder.append(None)
+            recorder.extend([4, 5, 8], landmarks[2:5])
+            recorder.append(landmarks[5], frame_index=9)
+            self.assertEqual(len(recorder), 6)
+
+        recording = LandmarkRecording(self.path)
+        self.assertTrue(recording.complete)
+        self.assertEqual(recording.fps, 10)
+        self.assertEqual(recording.metadata, {"source": "test"})
+        self.assertEqual(recording.frame_indices.tolist(), [0, 1, 4, 5, 8, 9])
+        np.testing.assert_allclose(recording.timestamps,
+                                   [0, 0.1, 0.4, 0.5, 0.8, 0.9])
+        np.testing.assert_array_equal(recording[0], landmarks[0])
+        self.assertTrue(np.isnan(recording[1]).all())
+        np.testing.assert_array_equal(recording[2:5], landmarks[2:5])
+        np.testing.assert_array_equal(recording.frame(9), landmarks[5])
+        with self.assertRaises(KeyError):
+            recording.frame(2)
+        np.testing.assert_array_equal(recording.at_time(0.45), landmarks[2])
+        self.assertAlmostEqual(recording.duration, 0.9)
+        frame_indices, block = recording.between(0.4, 0.8)
+        self.assertEqual(frame_indices.tolist(), [4, 5])
+        np.testing.assert_array_equal(block, landmarks[2:4])
+
+    def test_float16(self):
+        landmarks = np.full((NUM_LANDMARKS, 4), 0.25, dtype=np.float32)
+        with LandmarkRecorder(self.path, fps=30, dtype="float16") as recorder:
+            recorder.append(landmarks)
+        recording = LandmarkRecording(self.path)
+        self.assertEqual(recording.dtype.itemsize, 2)
+        np.testing.assert_array_equal(recording[0], landmarks)
+
+    def test_never_closed(self):
+        landmarks = np.ones((NUM_LANDMARKS, 4), dtype=np.float32)
+        recorder = LandmarkRecorder(self.path, fps=20, metadata={"lost": True})
+        self.addCleanup(recorder.close)
+        for frame_index in (0, 3, 7):
+            recorder.append(landmarks * frame_index, frame_index=frame_index)
+        recorder._file.flush()
+
+        recording = LandmarkRecording(self.path)
+        self.assertFalse(recording.complete)
+        self.assertEqual(len(recording), 3)
+        # Numbered from 0 and timed from fps: the index was never written
+        self.assertEqual(recording.frame_indices.tolist(), [0, 1, 2])
+        np.testing.assert_allclose(recording.timestamps, [0, 0.05, 0.1])
+        self.assertEqual(recording.metadata, {})
+        np.testing.assert_array_equal(recording[2], landmarks * 7)
+
+    def test_errors(self):
+        with LandmarkRecorder(self.path, fps=30) as recorder:
+            recorder.append(None, frame_index=5)
+            with self.assertRaises(ValueError):
+                recorder.append(None, frame_index=5)
+            with self.assertRaises(ValueError):
+                recorder.extend([6, 6], np.zeros((2, NUM_LANDMARKS, 4)))
+            with self.assertRaises(ValueError):
+                recorder.append(np.zeros((NUM_LANDMARKS, 3)))
+        with self.assertRaises(ValueError):
+            LandmarkRecorder(os.path.join(self.dir, "other.lmk"), dtype="float64")
+        not_a_recording = os.path.join(self.dir, "video.mp4")
+        with open(not_a_recording, "wb") as f:
+            f.write(b"\0" * 100)
+        with self.assertRaises(ValueError):
+            LandmarkRecording(not_a_recording)
+
+
+class RecordedAnalysisTests(TestCase):
+    """
+    analyze_squat_video(record_path=...), with pose estimation swapped
+    for a synthetic landmark series that follows the sampler.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "job.lmk")
+        frames = np.arange(600)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+
+    def _iter_pose_landmarks(self, video_path, start_frame, end_frame,
+                             static_image_mode, sampler, **kwargs):
+        frame_index = start_frame
+        while frame_index < len(self.landmarks):
+            yield frame_index, self.landmarks[frame_index]
+            frame_index += sampler.advance(self.landmarks[frame_index])
+
+    def _analyze(self, **kwargs):
+        with mock.patch.object(squat_analysis, "iter_pose_landmarks",
+                               self._iter_pose_landmarks), \
+                mock.patch.object(squat_analysis, "video_properties",
+                                  return_value=(30.0, len(self.landmarks))):
+            return squat_analysis.analyze_squat_video(
+                "video.mp4", use_cache=False, record_path=self.path, **kwargs)
+
+    def test_fixed_stride(self):
+        self._analyze(stride=2)
+        recording = LandmarkRecording(self.path)
+        self.assertTrue(recording.complete)
+        self.assertEqual(recording.fps, 30.0)
+        self.assertEqual(recording.frame_indices.tolist(), list(range(0, 600, 2)))
+        self.assertEqual((recording.metadata["stride"], recording.metadata["adaptive"]),
+                         (2, False))
+        np.testing.assert_array_equal(recording[:], self.landmarks[::2])
+
+    def test_adaptive(self):
+        reps = self._analyze(adaptive=True, stride=4)
+        recording = LandmarkRecording(self.path)
+        self.assertTrue(recording.complete)
+        metadata = recording.metadata
+        self.assertEqual((metadata["stride"], metadata["adaptive"],
+                          metadata["sparse_stride"]), (None, True, 4))
+        steps = set(np.diff(recording.frame_indices).tolist())
+        self.assertEqual(steps, {1, 4})
+        # Replaying the recording finds the same reps
+        replayed = squat_analysis.analyze_squat_landmarks(
+            recording[:], recording.fps, recording.frame_indices.tolist())
+        self.assertEqual(replayed, reps)
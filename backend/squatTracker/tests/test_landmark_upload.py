@@ -0,0 +1,130 @@
+import json
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..landmark_upload import parse_landmark_array, parse_landmark_json
+from ..models import AnalysisJob, SquatAnalysis
+from ..pose_estimation import NUM_LANDMARKS
+from .utils import squat_landmarks
+
+
+def frame_rows(values=4, value=0.5):
+    return [[value] * values for _ in range(NUM_LANDMARKS)]
+
+
+class LandmarkUploadTests(SimpleTestCase):
+    def test_json(self):
+        frame_rate, frame_indices, landmarks = parse_landmark_json(
+            {"fps": "30", "landmarks": [frame_rows(), None, frame_rows()],
+             "frames": [0, 2, 4]})
+        self.assertEqual(frame_rate, 30.0)
+        self.assertEqual(frame_indices, [0, 2, 4])
+        self.assertEqual(landmarks.shape, (3, NUM_LANDMARKS, 4))
+        self.assertTrue(np.isnan(landmarks[1]).all())
+        self.assertEqual(landmarks[0, 0, 0], 0.5)
+
+    def test_json_without_any_pose(self):
+        _, frame_indices, landmarks = parse_landmark_json(
+            {"fps": 30, "landmarks": [None, None]})
+        self.assertIsNone(frame_indices)
+        self.assertEqual(landmarks.shape, (2, NUM_LANDMARKS, 4))
+        self.assertTrue(np.isnan(landmarks).all())
+
+    def test_json_errors(self):
+        valid = {"fps": 30, "landmarks": [frame_rows(), frame_rows()]}
+        for data in [
+            [],
+            {"landmarks": valid["landmarks"]},
+            dict(valid, fps=0),
+            dict(valid, fps=-30),
+            dict(valid, fps="fast"),
+            dict(valid, fps="inf"),
+            dict(valid, landmarks=[]),
+            dict(valid, landmarks="frames"),
+            dict(valid, landmarks=[frame_rows()[:-1]]),
+            dict(valid, landmarks=[frame_rows(values=1)]),
+            dict(valid, landmarks=[frame_rows(values=5)]),
+            dict(valid, landmarks=[frame_rows(value="x")]),
+            dict(valid, landmarks=[frame_rows(), frame_rows()[:-1]]),
+            dict(valid, frames=[0]),
+            dict(valid, frames="0,1"),
+            dict(valid, frames=[0, 1.5]),
+            dict(valid, frames=[False, True]),
+            dict(valid, frames=[1, 1]),
+            dict(valid, frames=[2, 1]),
+            dict(valid, frames=[-1, 0]),
+        ]:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                parse_landmark_json(data)
+
+    def test_array(self):
+        values = np.arange(2 * NUM_LANDMARKS * 2, dtype="<f4")
+        frame_rate, frame_indices, landmarks = parse_landmark_array(
+            values.tobytes(), {"fps": "25", "values": "2"})
+        self.assertEqual((frame_rate, frame_indices), (25.0, None))
+        self.assertEqual(landmarks.shape, (2, NUM_LANDMARKS, 2))
+        np.testing.assert_array_equal(landmarks.ravel(), values)
+
+    def test_array_errors(self):
+        frame = np.zeros((NUM_LANDMARKS, 4), dtype="<f4").tobytes()
+        for body, params in [
+            (frame, {}),
+            (frame, {"fps": "nan"}),
+            (frame, {"fps": 30, "values": "x"}),
+            (frame, {"fps": 30, "values": "1"}),
+            (frame, {"fps": 30, "values": "5"}),
+            (b"", {"fps": 30}),
+            (frame[:-4], {"fps": 30}),
+            (frame + frame[:8], {"fps": 30}),
+        ]:
+            with self.subTest(length=len(body), params=params), \
+                    self.assertRaises(ValueError):
+                parse_landmark_array(body, params)
+
+
+@override_settings(METRICS_DB=None)
+class LandmarkAnalysisViewTests(TestCase):
+    url = "/api/analyze/landmarks/"
+
+    def setUp(self):
+        frames = np.arange(300)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+        self.landmarks[::10] = np.nan
+
+    def _check(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data["result"]), 3)
+        job = AnalysisJob.objects.get(pk=data["job_id"])
+        self.assertEqual((job.status, job.total_frames), (AnalysisJob.DONE, 300))
+        self.assertEqual(job.result, data["result"])
+        self.assertEqual(SquatAnalysis.objects.filter(job=job).count(), 3)
+        self.assertIn("Server-Timing", response)
+        return data["result"]
+
+    def _post_json(self):
+        rows = [None if np.isnan(lm).any() else lm.tolist() for lm in self.landmarks]
+        return self.client.post(
+            self.url, json.dumps({"fps": 30, "landmarks": rows}),
+            content_type="application/json")
+
+    def test_json(self):
+        result = self._check(self._post_json())
+        self.assertEqual([rep["rep"] for rep in result], [1, 2, 3])
+
+    def test_binary_gives_the_same_reps(self):
+        json_result = self._check(self._post_json())
+        result = self._check(self.client.post(
+            self.url + "?fps=30", self.landmarks.astype("<f4").tobytes(),
+            content_type="application/octet-stream"))
+        self.assertEqual(result, json_result)
+
+    def test_errors(self):
+        response = self.client.post(self.url, json.dumps({"landmarks": []}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url + "?fps=30", b"\0" * 10,
+                                    content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AnalysisJob.objects.exists())
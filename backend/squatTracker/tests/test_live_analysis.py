@@ -0,0 +1,121 @@
+import json
+
+import cv2
+import numpy as np
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from ..live_analysis import (
+    CLOSE_BAD_REQUEST, CLOSE_NOT_FOUND, FrameSlot, live_analysis,
+)
+from .utils import squat_landmarks
+
+
+@override_settings(METRICS_DB=None)
+class LiveAnalysisTests(SimpleTestCase):
+    async def _connect(self, path="/ws/live/", query_string=b""):
+        communicator = ApplicationCommunicator(live_analysis, {
+            "type": "websocket", "path": path, "query_string": query_string})
+        await communicator.send_input({"type": "websocket.connect"})
+        return communicator
+
+    async def _send(self, communicator, **message):
+        """
+        Sends one frame and returns the events it gets back.
+        """
+        await communicator.send_input({"type": "websocket.receive", **message})
+        events = [json.loads((await communicator.receive_output(5))["text"])]
+        if events[0]["type"] == "frame" and events[0].get("pose"):
+            # A completed rep follows its frame
+            while not await communicator.receive_nothing(0.05):
+                events.append(json.loads((await communicator.receive_output(5))["text"]))
+        return events
+
+    async def _disconnect(self, communicator):
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait(5)
+
+    async def test_rejected_connections(self):
+        for path, query_string, code in [
+            ("/ws/other/", b"", CLOSE_NOT_FOUND),
+            ("/ws/live/", b"fps=fast", CLOSE_BAD_REQUEST),
+            ("/ws/live/", b"fps=0", CLOSE_BAD_REQUEST),
+        ]:
+            with self.subTest(path=path, query_string=query_string):
+                communicator = await self._connect(path, query_string)
+                self.assertEqual(await communicator.receive_output(5),
+                                 {"type": "websocket.close", "code": code})
+                await communicator.wait(5)
+
+    async def test_landmark_frames(self):
+        communicator = await self._connect(query_string=b"fps=10")
+        self.assertEqual(await communicator.receive_output(5),
+                         {"type": "websocket.accept"})
+        ready = json.loads((await communicator.receive_output(5))["text"])
+        self.assertEqual(ready, {"type": "ready", "fps": 10.0})
+
+        angles = [170] * 3 + list(range(160, 70, -10)) + list(range(80, 180, 10))
+        events = []
+        for frame_index, lm in enumerate(squat_landmarks(angles)):
+            events += await self._send(communicator, text=json.dumps(
+                {"landmarks": lm.tolist(), "frame": 100 + frame_index}))
+        events += await self._send(communicator, text=json.dumps({"landmarks": None}))
+        await self._disconnect(communicator)
+
+        frames = [e for e in events if e["type"] == "frame"]
+        self.assertEqual(len(frames), len(angles) + 1)
+        self.assertEqual(frames[3]["frame"], 103)
+        self.assertEqual(frames[3]["angle"], 160.0)
+        self.assertFalse(frames[3]["in_rep"])
+        self.assertTrue(frames[8]["in_rep"])
+        self.assertEqual(frames[8]["form"], {"back_straight": True,
+                                             "knee_over_toe": True})
+        self.assertTrue(all(frame["dropped"] == 0 for frame in frames))
+        # Numbered by arrival when the client doesn't say
+        self.assertEqual(frames[-1], {"type": "frame", "frame": len(angles),
+                                      "pose": False, "dropped": 0})
+        reps = [e for e in events if e["type"] == "rep"]
+        self.assertEqual(len(reps), 1)
+        self.assertEqual((reps[0]["rep"], reps[0]["min_depth"]), (1, 80.0))
+        self.assertEqual(reps[0]["start_sec"], 10.7)
+
+    async def test_malformed_frames_keep_the_connection(self):
+        communicator = await self._connect()
+        await communicator.receive_output(5)
+        await communicator.receive_output(5)
+        for message in [
+            {"text": "[]"},
+            {"text": "{not json"},
+            {"text": json.dumps({"landmarks": [[0.5, 0.5]] * 5})},
+            {"text": json.dumps({"landmarks": None, "frame": "2"})},
+            {"bytes": b"not an image"},
+        ]:
+            with self.subTest(message=message):
+                events = await self._send(communicator, **message)
+                self.assertEqual(events[0]["type"], "error")
+        events = await self._send(communicator, text=json.dumps({"landmarks": None}))
+        self.assertEqual(events[0]["type"], "frame")
+        await self._disconnect(communicator)
+
+    async def test_image_frames(self):
+        communicator = await self._connect()
+        await communicator.receive_output(5)
+        await communicator.receive_output(5)
+        _, jpeg = cv2.imencode(".jpg", np.zeros((240, 320, 3), np.uint8))
+        events = await self._send(communicator, bytes=jpeg.tobytes())
+        self.assertEqual(events, [{"type": "frame", "frame": 0, "pose": False,
+                                   "dropped": 0}])
+        await self._disconnect(communicator)
+
+
+class FrameSlotTests(SimpleTestCase):
+    async def test_latest_wins(self):
+        slot = FrameSlot()
+        slot.put(1)
+        slot.put(2)
+        self.assertEqual(await slot.get(), 2)
+        self.assertEqual(slot.dropped, 1)
+        slot.put(3)
+        slot.close()
+        self.assertEqual(await slot.get(), 3)
+        self.assertIsNone(await slot.get())
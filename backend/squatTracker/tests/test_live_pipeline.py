@@ -0,0 +1,107 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import live_pipeline
+from ..live_pipeline import LatestSlot, LivePipeline, RateMeter
+
+
+class FakeCapture:
+    """
+    A camera that returns frames 0..count-1 (as ints), one every `delay`
+    seconds, then fails every read.
+    """
+
+    def __init__(self, count, delay=0.0):
+        self.count = count
+        self.delay = delay
+        self.next = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.next >= self.count:
+            return False, None
+        time.sleep(self.delay)
+        self.next += 1
+        return True, self.next - 1
+
+
+class LatestSlotTests(SimpleTestCase):
+    def test_latest_wins(self):
+        slot = LatestSlot()
+        slot.put(1)
+        slot.put(2)
+        self.assertEqual(slot.get(), 2)
+        self.assertEqual(slot.dropped, 1)
+        self.assertIsNone(slot.get(timeout=0.01))
+
+    def test_close_wakes_the_consumer(self):
+        slot = LatestSlot()
+        threading.Timer(0.01, slot.close).start()
+        self.assertIsNone(slot.get(timeout=5))
+        slot.put(3)
+        self.assertEqual(slot.get(), 3)
+
+
+class RateMeterTests(SimpleTestCase):
+    def test_rate_over_the_window(self):
+        meter = RateMeter(window=1.0)
+        self.assertEqual(meter.rate(), 0.0)
+        for i in range(11):
+            meter.tick(100 + i / 10)
+        self.assertAlmostEqual(meter.rate(), 10.0)
+        meter.tick(105)
+        self.assertEqual(meter.rate(), 0.0)
+
+
+@mock.patch.object(live_pipeline, "READ_RETRY_DELAY", 0)
+@mock.patch.object(live_pipeline, "MAX_READ_FAILURES", 3)
+class LivePipelineTests(SimpleTestCase):
+    def test_unthreaded_shows_every_frame(self):
+        pipeline = LivePipeline(FakeCapture(20), lambda frame: frame * 10,
+                                threaded=False)
+        with pipeline:
+            shown = list(pipeline.frames())
+        self.assertEqual(shown, [(i, i * 10) for i in range(20)])
+        self.assertEqual(pipeline.stats()["frames_dropped"], 0)
+
+    def test_slow_inference_drops_frames_instead_of_lagging(self):
+        inferred = []
+
+        def infer(frame):
+            time.sleep(0.01)
+            return -frame
+
+        pipeline = LivePipeline(
+            FakeCapture(200, delay=0.001), infer,
+            on_result=lambda captured_at, result: inferred.append(-result))
+        with pipeline:
+            shown = [(frame, result) for frame, result in pipeline.frames()]
+        frames = [frame for frame, _ in shown]
+        self.assertTrue(all(result == -frame for frame, result in shown))
+        # In order, newest first: fewer frames shown than captured, none
+        # twice, and the last one captured is shown
+        self.assertEqual(frames, sorted(set(frames)))
+        self.assertLess(len(frames), 200)
+        self.assertEqual(frames[-1], 199)
+        self.assertGreater(pipeline.frames_dropped, 0)
+        self.assertEqual(inferred[-1], 199)
+        stats = pipeline.stats()
+        self.assertEqual(stats["frames_shown"], len(frames))
+        self.assertGreater(stats["latency_ms"], 0)
+
+    def test_inference_errors_reach_the_caller(self):
+        def infer(frame):
+            if frame >= 5:
+                raise ValueError("bad frame")
+            time.sleep(0.005)
+            return frame
+
+        pipeline = LivePipeline(FakeCapture(50, delay=0.002), infer)
+        with pipeline, self.assertRaises(ValueError):
+            for _ in pipeline.frames():
+                pass
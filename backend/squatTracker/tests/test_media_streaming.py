@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from ..media_streaming import parse_range, serve_media
+from ..models import WorkoutVideo
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_parse_range(self):
+        for header, expected in [
+            (None, None),
+            ("", None),
+            ("items=0-1", None),
+            ("bytes=0-99", (0, 99)),
+            ("bytes=10-", (10, 999)),
+            ("bytes=990-2000", (990, 999)),
+            ("bytes=-100", (900, 999)),
+            ("bytes=-5000", (0, 999)),
+            ("bytes= 5 - 9 ", (5, 9)),
+            ("bytes=0-1,5-6", None),
+            ("bytes=9-5", None),
+            ("bytes=-", None),
+            ("bytes=a-b", None),
+            ("bytes=1000-", "unsatisfiable"),
+            ("bytes=-0", "unsatisfiable"),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 1000), expected)
+        self.assertEqual(parse_range("bytes=-5", 0), "unsatisfiable")
+
+
+class ServeMediaTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "video.mp4")
+        self.data = bytes(range(256)) * 40
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        self.factory = RequestFactory()
+
+    def _get(self, **headers):
+        response = serve_media(self.factory.get("/", **headers), self.path)
+        self.addCleanup(response.close)
+        return response
+
+    def _body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Content-Length"], str(len(self.data)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(self._body(response), self.data)
+
+    def test_range(self):
+        response = self._get(HTTP_RANGE="bytes=100-1099")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"],
+                         f"bytes 100-1099/{len(self.data)}")
+        self.assertEqual(response["Content-Length"], "1000")
+        self.assertEqual(self._body(response), self.data[100:1100])
+
+        response = self._get(HTTP_RANGE="bytes=-10")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), self.data[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self._get(HTTP_RANGE=f"bytes={len(self.data)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.data)}")
+
+    def test_multiple_ranges_get_the_whole_file(self):
+        response = self._get(HTTP_RANGE="bytes=0-1,5-6")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.data)
+
+    def test_not_modified(self):
+        etag = self._get()["ETag"]
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        last_modified = self._get()["Last-Modified"]
+        self.assertEqual(
+            self._get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_if_range(self):
+        first = self._get()
+        response = self._get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=first["ETag"])
+        self.assertEqual(response.status_code, 206)
+        response = self._get(HTTP_RANGE="bytes=0-9",
+                             HTTP_IF_RANGE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 206)
+        # The file changed: send all of the new version
+        response = self._get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.data)
+
+    def test_sendfile_headers(self):
+        with override_settings(MEDIA_ROOT=self.dir, MEDIA_SENDFILE="x-accel-redirect",
+                               MEDIA_ACCEL_REDIRECT_PREFIX="/protected/"):
+            response = self._get(HTTP_RANGE="bytes=0-9")
+            self.assertEqual(response["X-Accel-Redirect"], "/protected/video.mp4")
+            self.assertEqual(response.content, b"")
+        with override_settings(MEDIA_SENDFILE="x-sendfile"):
+            self.assertEqual(self._get()["X-Sendfile"], self.path)
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            serve_media(self.factory.get("/"), os.path.join(self.dir, "gone.mp4"))
+
+
+@override_settings(METRICS_DB=None)
+class VideoStreamViewTests(TestCase):
+    """
+    The stream view answers with the file whatever the Accept header
+    names, and with JSON errors.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        os.makedirs(os.path.join(self.media_root, "videos"))
+        with open(os.path.join(self.media_root, "videos", "squat.mp4"), "wb") as f:
+            f.write(b"\0" * 1000)
+        self.video = WorkoutVideo.objects.create(title="Squat", video="videos/squat.mp4")
+
+    def test_stream(self):
+        url = f"/api/videos/{self.video.pk}/stream/"
+        for accept in ("video/mp4", "video/*", "*/*", "application/json"):
+            with self.subTest(accept=accept):
+                response = self.client.get(url, HTTP_ACCEPT=accept,
+                                           HTTP_RANGE="bytes=0-99")
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(len(b"".join(response.streaming_content)), 100)
+                response.close()
+
+    def test_conditional(self):
+        url = f"/api/videos/{self.video.pk}/stream/"
+        response = self.client.get(url)
+        response.close()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors(self):
+        os.remove(os.path.join(self.media_root, "videos", "squat.mp4"))
+        for url in ["/api/videos/999/stream/", f"/api/videos/{self.video.pk}/stream/"]:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT="video/mp4")
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response["Content-Type"], "application/json")
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import metrics
+from ..models import AnalysisJob
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        # No background flushes: reads flush, and nothing may reach the
+        # real METRICS_DB once the override is gone
+        self.enterContext(override_settings(
+            METRICS_DB=os.path.join(self.dir, "metrics.sqlite3"),
+            METRICS_FLUSH_INTERVAL=3600))
+        self.store = self._new_store()
+        self.enterContext(mock.patch.object(metrics, "_store", self.store))
+
+    def _new_store(self):
+        store = metrics._Store()
+        self.addCleanup(lambda: store._conn and store._conn.close())
+        return store
+
+    def _values(self, name):
+        return {tuple(sorted(v["labels"].items())): v
+                for v in metrics.snapshot()[name]["values"]}
+
+    def test_processes_are_summed(self):
+        metrics.UPLOAD_BYTES.inc(100, view="analyze")
+        # Another process: its own pending updates, the same file
+        other = self._new_store()
+        with mock.patch.object(metrics, "_store", other):
+            metrics.UPLOAD_BYTES.inc(50, view="analyze")
+            metrics.UPLOAD_BYTES.inc(7, view="upload")
+            other.flush()
+        values = self._values("squat_upload_bytes_total")
+        self.assertEqual(values[(("view", "analyze"),)]["value"], 150)
+        self.assertEqual(values[(("view", "upload"),)]["value"], 7)
+
+    def test_histogram(self):
+        for seconds in [0.003] * 5 + [0.04] * 4 + [60]:
+            metrics.REQUEST_SECONDS.observe(seconds, view="squats", method="GET",
+                                            status=200)
+        entry = self._values("squat_http_request_duration_seconds")[
+            (("method", "GET"), ("status", "200"), ("view", "squats"))]
+        self.assertEqual(entry["count"], 10)
+        self.assertAlmostEqual(entry["sum"], 60.175)
+        self.assertEqual(entry["p50"], 0.005)
+        self.assertAlmostEqual(entry["p90"], 0.05)
+        # Past the last finite bucket: that bound is all that is known
+        self.assertEqual(entry["p99"], 30)
+
+        text = metrics.render_text()
+        labels = 'view="squats",method="GET",status="200"'
+        for line in [
+            f'squat_http_request_duration_seconds_bucket{{{labels},le="0.005"}} 5',
+            f'squat_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 5',
+            f'squat_http_request_duration_seconds_bucket{{{labels},le="0.05"}} 9',
+            f'squat_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 10',
+            f'squat_http_request_duration_seconds_count{{{labels}}} 10',
+            "# TYPE squat_http_request_duration_seconds histogram",
+        ]:
+            self.assertIn(line, text.splitlines())
+
+    def test_job_gauges(self):
+        AnalysisJob.objects.create(video_path="a.mp4", status=AnalysisJob.DONE)
+        queued = AnalysisJob.objects.create(video_path="b.mp4")
+        AnalysisJob.objects.filter(pk=queued.pk).update(
+            created_at=timezone.now() - timedelta(minutes=2))
+        jobs = self._values("squat_analysis_jobs")
+        self.assertEqual(jobs[(("status", "queued"),)]["value"], 1)
+        self.assertEqual(jobs[(("status", "done"),)]["value"], 1)
+        self.assertEqual(jobs[(("status", "failed"),)]["value"], 0)
+        oldest = self._values("squat_analysis_oldest_queued_seconds")[()]["value"]
+        self.assertAlmostEqual(oldest, 120, delta=5)
+
+    def test_record_job_and_db_writes(self):
+        AnalysisJob.objects.create(video_path="a.mp4")
+        metrics.record_job(AnalysisJob.DONE, 2.0, 60)
+        metrics.record_job(AnalysisJob.FAILED, 1.0, 10)
+        self.assertEqual(metrics.snapshot()["squat_analysis_frames_total"]["values"][0]
+                         ["value"], 60)
+        fps = self._values("squat_analysis_fps")[(("cached", "false"),)]
+        self.assertEqual((fps["count"], fps["sum"]), (1, 30.0))
+        writes = self._values("squat_db_writes_total")
+        self.assertGreaterEqual(
+            writes[(("operation", "insert"), ("table", "squatTracker_analysisjob"))]["value"], 1)
+
+    def test_view_and_middleware(self):
+        self.client.get("/api/squats/")
+        self.client.get("/api/squats/", {"job": "x"})
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response["Content-Type"],
+                         "text/plain; version=0.0.4; charset=utf-8")
+        self.assertIn('squat_http_request_duration_seconds_count'
+                      '{view="squats",method="GET",status="400"} 1',
+                      response.content.decode())
+        data = self.client.get("/api/metrics/", {"format": "json"}).json()
+        statuses = {v["labels"]["status"]: v["count"] for v in
+                    data["squat_http_request_duration_seconds"]["values"]
+                    if v["labels"]["view"] == "squats"}
+        self.assertEqual(statuses, {"200": 1, "400": 1})
+
+        with override_settings(METRICS_DB=None):
+            self.assertEqual(self.client.get("/api/metrics/").status_code, 404)
@@ -0,0 +1,97 @@
+import os
+from unittest import mock, skipUnless
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from .. import pose_estimation
+from ..pose_estimation import PosePool, landmarks_to_array
+
+SAMPLE_VIDEO = os.path.join(settings.BASE_DIR, "media",
+                            "WhatsApp Video 2025-04-03 at 17.22.19.mp4")
+
+
+class FakePose:
+    def __init__(self, **options):
+        self.options = options
+        self.calls = []
+
+    def reset(self):
+        self.calls.append("reset")
+
+    def process(self, image):
+        self.calls.append("process")
+
+    def close(self):
+        self.calls.append("close")
+
+
+class PosePoolTests(SimpleTestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.object(
+            pose_estimation.mp.solutions.pose, "Pose", FakePose))
+        self.pool = PosePool(max_idle=2)
+
+    def test_reuses_reset_estimators(self):
+        with self.pool.pose(static_image_mode=True) as pose:
+            self.assertTrue(pose.options["static_image_mode"])
+            self.assertEqual(pose.options["model_complexity"], 1)
+        # Reset and warmed up on the way back
+        self.assertEqual(pose.calls, ["reset", "process"])
+        with self.pool.pose(static_image_mode=True) as again:
+            self.assertIs(again, pose)
+            # Other options get their own estimator
+            with self.pool.pose() as other:
+                self.assertIsNot(other, pose)
+
+    def test_keeps_at_most_max_idle(self):
+        poses = [self.pool.acquire() for _ in range(3)]
+        for pose in poses:
+            self.pool.release(pose)
+        self.assertEqual([pose.calls[-1] for pose in poses],
+                         ["process", "process", "close"])
+        self.assertIn(self.pool.acquire(), poses[:2])
+
+    def test_an_estimator_that_raised_is_closed(self):
+        with self.assertRaises(RuntimeError), self.pool.pose() as pose:
+            raise RuntimeError("graph failed")
+        self.assertEqual(pose.calls, ["close"])
+        self.assertIsNot(self.pool.acquire(), pose)
+
+    def test_prewarm_and_clear(self):
+        self.pool.prewarm(5, static_image_mode=True)
+        self.pool.prewarm(1, static_image_mode=True)
+        idle = [self.pool.acquire(static_image_mode=True) for _ in range(3)]
+        # Only max_idle were built and warmed up; the third is new
+        self.assertEqual([pose.calls for pose in idle],
+                         [["process"], ["process"], []])
+        idle.pop()
+        for pose in idle:
+            self.pool.release(pose, static_image_mode=True)
+        self.pool.clear()
+        self.assertEqual([pose.calls[-1] for pose in idle], ["close"] * 2)
+
+    def test_unknown_options(self):
+        with self.assertRaises(TypeError):
+            self.pool.acquire(model="heavy")
+
+
+@skipUnless(os.path.exists(SAMPLE_VIDEO), "sample video not checked out")
+class PooledEstimatorTests(SimpleTestCase):
+    def test_reset_estimator_matches_a_new_one(self):
+        cap = cv2.VideoCapture(SAMPLE_VIDEO)
+        frames = [cv2.cvtColor(cap.read()[1], cv2.COLOR_BGR2RGB) for _ in range(10)]
+        cap.release()
+        pool = PosePool(max_idle=1)
+        self.addCleanup(pool.clear)
+
+        runs = []
+        for _ in range(2):
+            with pool.pose() as pose:
+                runs.append([landmarks_to_array(pose.process(frame).pose_landmarks)
+                             for frame in frames])
+        self.assertIsNotNone(runs[0][-1])
+        for first, second in zip(*runs):
+            np.testing.assert_array_equal(first, second)
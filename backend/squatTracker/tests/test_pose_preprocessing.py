@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..pose_estimation import NUM_LANDMARKS, PoseFrameProcessor, landmarks_to_array
+
+
+class FakePose:
+    """
+    Stands in for mp_pose.Pose: finds the bright box in the RGB image it
+    is given and puts the landmarks on its outline, normalized to that
+    image, as MediaPipe would. Records the shape of every image.
+    """
+
+    def __init__(self):
+        self.shapes = []
+
+    def process(self, image):
+        self.shapes.append(image.shape)
+        rows, cols = np.nonzero(image[:, :, 0] > 128)
+        if not len(rows):
+            return SimpleNamespace(pose_landmarks=None)
+        height, width = image.shape[:2]
+        corners = [(cols.min(), rows.min()), (cols.max() + 1, rows.max() + 1)]
+        points = [corners[i % 2] for i in range(NUM_LANDMARKS)]
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=[
+            SimpleNamespace(x=x / width, y=y / height, z=0.1, visibility=1.0)
+            for x, y in points]))
+
+
+def frame_with_person(width=1920, height=1080, box=(800, 200, 1100, 1000)):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    x0, y0, x1, y1 = box
+    # BGR: red only, so the RGB image the estimator gets has it in channel 0
+    frame[y0:y1, x0:x1, 2] = 255
+    return frame
+
+
+class PoseFrameProcessorTests(SimpleTestCase):
+    def test_max_dim(self):
+        pose = FakePose()
+        processor = PoseFrameProcessor(pose, max_dim=640)
+        landmarks = landmarks_to_array(processor.process(frame_with_person()))
+        self.assertEqual(pose.shapes[-1], (360, 640, 3))
+        np.testing.assert_allclose(landmarks[0, :2], (800 / 1920, 200 / 1080), atol=0.01)
+
+        processor.process(frame_with_person(480, 270, (100, 50, 200, 250)))
+        self.assertEqual(pose.shapes[-1], (270, 480, 3))
+
+    def test_no_max_dim(self):
+        pose = FakePose()
+        PoseFrameProcessor(pose).process(frame_with_person())
+        self.assertEqual(pose.shapes[-1], (1080, 1920, 3))
+
+    def test_roi(self):
+        pose = FakePose()
+        processor = PoseFrameProcessor(pose, roi=True)
+        frame = frame_with_person()
+        full = landmarks_to_array(processor.process(frame))
+        cropped = landmarks_to_array(processor.process(frame))
+        # The second frame only sends the padded box around the person,
+        # clipped to the frame
+        self.assertEqual(pose.shapes, [(1080, 1920, 3), (1080, 451, 3)])
+        # Landmarks are mapped back to the full frame
+        np.testing.assert_allclose(cropped[:, :2], full[:, :2], atol=1e-6)
+        np.testing.assert_allclose(full[1, :2], (1100 / 1920, 1000 / 1080))
+        self.assertAlmostEqual(float(cropped[0, 2]), 0.1 * 451 / 1920, places=6)
+
+    def test_roi_redetects_a_lost_person(self):
+        pose = FakePose()
+        processor = PoseFrameProcessor(pose, roi=True)
+        processor.process(frame_with_person())
+        # The person moved out of the box: the crop finds nobody and the
+        # same frame is run again uncropped
+        moved = landmarks_to_array(processor.process(
+            frame_with_person(box=(100, 100, 300, 500))))
+        self.assertEqual(len(pose.shapes), 3)
+        self.assertEqual(pose.shapes[-1], (1080, 1920, 3))
+        np.testing.assert_allclose(moved[0, :2], (100 / 1920, 100 / 1080))
+
+        self.assertIsNone(processor.process(np.zeros((1080, 1920, 3), np.uint8)))
@@ -0,0 +1,137 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import jobs, previews
+from ..models import AnalysisJob, WorkoutVideo
+from ..previews import make_previews, poster_time
+
+SAMPLE_VIDEO = os.path.join(settings.BASE_DIR, "media",
+                            "WhatsApp Video 2025-04-03 at 17.22.19.mp4")
+
+
+class PosterTimeTests(SimpleTestCase):
+    def test_poster_time(self):
+        self.assertEqual(poster_time(10.0), previews.POSTER_SECONDS)
+        self.assertEqual(poster_time(1.0), 0.5)
+        self.assertEqual(poster_time(0.0), 0.0)
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.enterContext(override_settings(MEDIA_ROOT=self.dir, METRICS_DB=None,
+                                            ANALYSIS_PROXY=False))
+        os.makedirs(os.path.join(self.dir, "videos"))
+
+    def _video(self, name="squat.mp4", source=SAMPLE_VIDEO, **fields):
+        shutil.copy(source, os.path.join(self.dir, "videos", name))
+        return WorkoutVideo.objects.create(title=name, video=f"videos/{name}", **fields)
+
+
+@skipUnless(os.path.exists(SAMPLE_VIDEO), "the sample video is not checked out")
+class MakePreviewsTests(MediaTestCase):
+    def test_previews(self):
+        video = self._video()
+        self.assertEqual(make_previews(video), ["poster", "preview"])
+        video.refresh_from_db()
+        self.assertEqual(video.poster.name, "posters/squat.jpg")
+        poster = cv2.imread(video.poster.path)
+        self.assertEqual(max(poster.shape[:2]), previews.POSTER_MAX_DIM)
+
+        cap = cv2.VideoCapture(video.preview.path)
+        frames = 0
+        while cap.read()[0]:
+            frames += 1
+        self.assertEqual(max(cap.get(cv2.CAP_PROP_FRAME_WIDTH),
+                             cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                         previews.PREVIEW_MAX_DIM)
+        cap.release()
+        # 1 s to 3.43 s (the end of the clip), every third frame
+        self.assertEqual(frames, 25)
+
+        self.assertEqual(make_previews(video), [])
+        with mock.patch.object(previews, "extract_clip", return_value=0):
+            self.assertEqual(make_previews(video, force=True), ["poster"])
+
+    def test_unusable_videos(self):
+        video = self._video()
+        os.remove(video.video.path)
+        with self.assertRaises(FileNotFoundError):
+            make_previews(video)
+
+        broken = os.path.join(self.dir, "broken.mp4")
+        with open(broken, "wb") as f:
+            f.write(b"not a video")
+        video = self._video("broken.mp4", broken)
+        with self.assertLogs(previews.logger, "ERROR"):
+            self.assertEqual(make_previews(video), [])
+
+    def test_command(self):
+        done = self._video("done.mp4", poster="posters/done.jpg",
+                           preview="previews/done.webm")
+        todo = self._video()
+        out = io.StringIO()
+        with mock.patch("squatTracker.management.commands.make_previews.make_previews",
+                        return_value=["poster", "preview"]) as made:
+            call_command("make_previews", stdout=out)
+        self.assertEqual([call.args[0].pk for call in made.call_args_list], [todo.pk])
+        self.assertEqual(out.getvalue(), f"  {todo.pk}: poster, preview\n"
+                                         f"Made previews for 1 video(s).\n")
+        with mock.patch("squatTracker.management.commands.make_previews.make_previews",
+                        return_value=[]) as made:
+            call_command("make_previews", "--force", stdout=io.StringIO())
+        self.assertEqual([call.args[0].pk for call in made.call_args_list],
+                         [done.pk, todo.pk])
+
+
+@skipUnless(os.path.exists(SAMPLE_VIDEO), "the sample video is not checked out")
+class JobPreviewsTests(MediaTestCase):
+    """
+    Videos analyzed outside the web process get their previews when the
+    analysis finishes.
+    """
+
+    def _run(self, job):
+        with mock.patch.object(jobs, "analyze_squat_video", return_value=[]):
+            jobs.run_job(jobs.claim_job(job.pk), incremental=False)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.DONE)
+
+    def test_previews_after_analysis(self):
+        video = self._video()
+        copy = self._video("copy.mp4", video_hash="abc")
+        self._run(AnalysisJob.objects.create(video_path=video.video.path))
+        video.refresh_from_db()
+        self.assertTrue(video.poster and video.preview)
+        copy.refresh_from_db()
+        self.assertFalse(copy.poster)
+
+        # Matched by content too
+        self._run(AnalysisJob.objects.create(
+            video_path=os.path.join(self.dir, "uploads", "x.mp4"), video_hash="abc"))
+        copy.refresh_from_db()
+        self.assertTrue(copy.poster and copy.preview)
+
+    def test_only_missing_previews(self):
+        video = self._video(poster="posters/squat.jpg", preview="previews/squat.webm")
+        with mock.patch.object(jobs, "make_previews") as made:
+            self._run(AnalysisJob.objects.create(video_path=video.video.path))
+            self._run(AnalysisJob.objects.create(video_path="elsewhere.mp4"))
+        made.assert_not_called()
+
+    def test_errors_keep_the_job_done(self):
+        video = self._video()
+        with mock.patch.object(jobs, "make_previews",
+                               side_effect=FileNotFoundError("gone")), \
+                self.assertLogs(jobs.logger, "ERROR"):
+            self._run(AnalysisJob.objects.create(video_path=video.video.path))
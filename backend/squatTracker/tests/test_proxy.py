@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from .. import proxy
+from ..proxy import ensure_proxy, make_proxy, proxy_key, proxy_size
+
+SAMPLE_VIDEO = os.path.join(settings.BASE_DIR, "media",
+                            "WhatsApp Video 2025-04-03 at 17.22.19.mp4")
+
+
+class FakeCapture:
+    """
+    A VFR source: frames of uniform grey levels shown at the given times.
+    """
+
+    def __init__(self, frames, fps):
+        self.frames = list(frames)
+        self.fps = fps
+        self.msec = 0.0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        seconds, level = self.frames.pop(0)
+        self.msec = seconds * 1000
+        return True, np.full((48, 64, 3), level, np.uint8)
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_POS_MSEC: self.msec}[prop]
+
+    def release(self):
+        pass
+
+
+def read_frames(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps, frames
+
+
+class ProxyTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "proxy.mp4")
+
+    def test_proxy_size(self):
+        self.assertEqual(proxy_size(3840, 2160, 640), (640, 360))
+        self.assertEqual(proxy_size(1080, 1920, 640), (360, 640))
+        # Never scaled up, always even
+        self.assertEqual(proxy_size(479, 851, 1280), (480, 852))
+        self.assertEqual(proxy_size(479, 851, None), (480, 852))
+
+    def test_resampled_by_timestamp(self):
+        # A stutter: 0.15 s and 0.4 s instead of 0.2 s and 0.3 s
+        source = FakeCapture([(0.0, 0), (0.1, 60), (0.15, 120), (0.4, 180)], fps=10)
+        with mock.patch.object(proxy.cv2, "VideoCapture", return_value=source):
+            info = make_proxy("vfr.mp4", self.path, fps=10)
+        self.assertEqual(info["frames"], 5)
+        self.assertTrue(info["source_vfr"])
+        self.assertAlmostEqual(info["duration"], 0.4)
+        self.assertAlmostEqual(info["source_measured_fps"], 7.5)
+
+        fps, frames = read_frames(self.path)
+        self.assertEqual(fps, 10)
+        # Proxy frame k shows what was on screen at k / fps
+        levels = [int(round(frame.mean() / 60)) * 60 for frame in frames]
+        self.assertEqual(levels, [0, 60, 120, 120, 180])
+
+    @skipUnless(os.path.exists(SAMPLE_VIDEO), "the sample video is not checked out")
+    def test_sample_video(self):
+        info = make_proxy(SAMPLE_VIDEO, self.path, fps=15, max_dim=320)
+        self.assertEqual((info["width"], info["height"]), (180, 320))
+        self.assertEqual((info["source_width"], info["source_height"]), (478, 850))
+        self.assertEqual(info["source_frames"], 104)
+        self.assertFalse(info["source_vfr"])
+        fps, frames = read_frames(self.path)
+        self.assertEqual(fps, 15)
+        self.assertEqual(len(frames), info["frames"])
+        self.assertEqual(len(frames), round(info["duration"] * 15) + 1)
+        self.assertEqual(frames[0].shape, (320, 180, 3))
+
+    def test_unreadable_video(self):
+        broken = os.path.join(self.dir, "broken.mp4")
+        with open(broken, "wb") as f:
+            f.write(b"not a video")
+        with self.assertRaises(ValueError):
+            make_proxy(broken, self.path)
+
+
+@override_settings(ANALYSIS_PROXY=True, ANALYSIS_PROXY_MAX_DIM=320,
+                   ANALYSIS_PROXY_FPS=15)
+class EnsureProxyTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.enterContext(override_settings(MEDIA_ROOT=self.dir))
+        self.proxy_dir = os.path.join(self.dir, proxy.PROXY_DIR)
+
+    def test_disabled(self):
+        with override_settings(ANALYSIS_PROXY=False):
+            self.assertEqual(ensure_proxy("a.mp4", "abc"), ("a.mp4", "abc"))
+
+    def test_made_once(self):
+        self.assertEqual(proxy_key("abc"), "abc-proxy320x15")
+
+        def fake_make_proxy(video_path, proxy_path, **kwargs):
+            with open(proxy_path, "wb") as f:
+                f.write(b"proxy")
+            return {"fps": kwargs["fps"]}
+
+        with mock.patch.object(proxy, "make_proxy", side_effect=fake_make_proxy) as made:
+            path, key = ensure_proxy("a.mp4", "abc")
+            self.assertEqual(ensure_proxy("a.mp4", "abc"), (path, key))
+        self.assertEqual(made.call_count, 1)
+        self.assertEqual(path, os.path.join(self.proxy_dir, "abc-proxy320x15.mp4"))
+        self.assertEqual(key, "abc-proxy320x15")
+        with open(os.path.join(self.proxy_dir, key + ".json")) as f:
+            self.assertEqual(json.load(f), {"fps": 15, "source": "a.mp4"})
+        self.assertEqual(sorted(os.listdir(self.proxy_dir)),
+                         [key + ".json", key + ".mp4"])
+
+    def test_falls_back_to_the_original(self):
+        broken = os.path.join(self.dir, "broken.mp4")
+        with open(broken, "wb") as f:
+            f.write(b"not a video")
+        with self.assertLogs(proxy.logger, "ERROR"):
+            self.assertEqual(ensure_proxy(broken, "abc"), (broken, "abc"))
+        # No half-written proxy is left behind
+        self.assertEqual(os.listdir(self.proxy_dir), [])
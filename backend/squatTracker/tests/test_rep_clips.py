@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .. import proxy, rep_clips
+from ..models import AnalysisJob
+from .utils import make_rep
+
+# Variable frame rate: CAP_PROP_POS_FRAMES lands a frame early past
+# about frame 99
+VFR_VIDEO = os.path.join(settings.BASE_DIR, "media",
+                         "WhatsApp Video 2025-04-03 at 11.18.17.mp4")
+
+
+def decode_frame(path, frame_index):
+    """
+    Frame frame_index of path, decoded from the start.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        for _ in range(frame_index + 1):
+            ret, frame = cap.read()
+        return frame
+    finally:
+        cap.release()
+
+
+@skipUnless(os.path.exists(VFR_VIDEO), "the sample video is not checked out")
+@override_settings(METRICS_DB=None, ANALYSIS_PROXY=True)
+class RepClipTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.enterContext(override_settings(MEDIA_ROOT=self.dir))
+        self.job = AnalysisJob.objects.create(
+            video_path=VFR_VIDEO, video_hash="abc", status=AnalysisJob.DONE)
+        self.rep = make_rep(self.job)
+        self.rep.start_sec, self.rep.bottom_sec, self.rep.end_sec = 2.0, 2.5, 3.0
+        self.rep.save()
+        # Requests never transcode
+        self.enterContext(mock.patch.object(
+            proxy, "make_proxy", side_effect=AssertionError("made a proxy")))
+
+    def test_source(self):
+        self.assertEqual(rep_clips.rep_source(self.rep), VFR_VIDEO)
+        proxy_path = os.path.join(self.dir, proxy.PROXY_DIR,
+                                  proxy.proxy_key("abc") + proxy.PROXY_EXT)
+        os.makedirs(os.path.dirname(proxy_path))
+        with open(proxy_path, "wb"):
+            pass
+        self.assertEqual(rep_clips.rep_source(self.rep), proxy_path)
+        with override_settings(ANALYSIS_PROXY=False):
+            self.assertEqual(rep_clips.rep_source(self.rep), VFR_VIDEO)
+
+        AnalysisJob.objects.filter(pk=self.job.pk).update(video_path="gone.mp4")
+        self.rep.job.refresh_from_db()
+        with self.assertRaises(FileNotFoundError):
+            rep_clips.rep_source(self.rep)
+
+    def test_seek_is_exact(self):
+        cap, frame_rate, frame_index = rep_clips.open_at(VFR_VIDEO, 200 / 29.99)
+        try:
+            self.assertEqual(frame_index, 200)
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+        self.assertTrue(ret)
+        np.testing.assert_array_equal(frame, decode_frame(VFR_VIDEO, 200))
+
+    def test_still(self):
+        jpeg = rep_clips.extract_still(VFR_VIDEO, 2.5)
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(frame.shape, (848, 480, 3))
+        self.assertIsNone(rep_clips.extract_still(VFR_VIDEO, 60))
+
+    def test_clip(self):
+        path = rep_clips.rep_clip(self.rep)
+        self.assertEqual(os.path.dirname(path), os.path.join(self.dir, rep_clips.CLIP_DIR))
+        cap = cv2.VideoCapture(path)
+        frames = 0
+        while cap.read()[0]:
+            frames += 1
+        self.assertEqual(cap.get(cv2.CAP_PROP_FRAME_HEIGHT), rep_clips.CLIP_MAX_DIM)
+        cap.release()
+        # 1.5 s to 3.5 s, every other frame
+        self.assertEqual(frames, 31)
+        # Encoded once
+        with mock.patch.object(rep_clips, "extract_clip") as extract:
+            self.assertEqual(rep_clips.rep_clip(self.rep), path)
+        extract.assert_not_called()
+
+        self.rep.start_sec = None
+        self.assertIsNone(rep_clips.rep_clip(self.rep))
+
+    def test_views(self):
+        response = self.client.get(f"/api/squats/{self.rep.pk}/clip/",
+                                   HTTP_ACCEPT="video/webm")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], rep_clips.CLIP_CONTENT_TYPE)
+        self.assertIn("source;dur=", response["Server-Timing"])
+        response.close()
+        response = self.client.get(f"/api/squats/{self.rep.pk}/still/",
+                                   {"at": "start"}, HTTP_ACCEPT="image/jpeg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response.content[:2], b"\xff\xd8")
+
+    def test_errors(self):
+        other = make_rep(self.job, rep=2)
+        for url, accept in [
+            ("/api/squats/999/clip/", "video/webm"),
+            ("/api/squats/999/still/", "image/jpeg"),
+            # No timestamps
+            (f"/api/squats/{other.pk}/clip/", "video/webm"),
+            (f"/api/squats/{other.pk}/still/", "image/jpeg"),
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response["Content-Type"], "application/json")
+        response = self.client.get(f"/api/squats/{self.rep.pk}/still/?at=middle",
+                                   HTTP_ACCEPT="image/jpeg")
+        self.assertEqual(response.status_code, 400)
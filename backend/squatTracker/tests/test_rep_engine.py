@@ -0,0 +1,133 @@
+import random
+
+from django.test import SimpleTestCase
+
+from ..rep_engine import RepEngine
+from ..squat_analysis import SquatRepTracker
+
+
+def old_live_counts(angles, direction, down_threshold, up_threshold):
+    """
+    The live scripts' counter before RepEngine: the count after each
+    frame.
+    """
+    counter, stage, counts = 0, None, []
+    for angle in angles:
+        if direction == "up_down":
+            if angle > up_threshold:
+                stage = "down"
+            if angle < down_threshold and stage == "down":
+                stage = "up"
+                counter += 1
+        else:
+            if angle < up_threshold:
+                stage = "up"
+            if angle > down_threshold and stage == "up":
+                stage = "down"
+                counter += 1
+        counts.append(counter)
+    return counts
+
+
+def old_backend_reps(frames, frame_rate, depth_threshold, recovery_threshold,
+                     valid_depth_threshold=105, min_frames_per_rep=5,
+                     adherence_ratio=0.6):
+    """
+    The backend's rep state machine before RepEngine, for (frame_index,
+    knee angle, back angle, knee over toe) frames.
+    """
+    reps, in_squat, rep = [], False, None
+    for frame_index, angle, back_angle, knee_over_toe in frames:
+        if angle < depth_threshold:
+            if not in_squat:
+                in_squat = True
+                rep = {"start": frame_index, "depths": [], "frames": 0,
+                       "over_toe": 0, "back": 0}
+            rep["depths"].append(angle)
+            rep["frames"] += 1
+            rep["over_toe"] += knee_over_toe
+            rep["back"] += back_angle > 160
+        if in_squat and angle > recovery_threshold:
+            in_squat = False
+            num_frames = frame_index - rep["start"]
+            if num_frames >= min_frames_per_rep:
+                duration = num_frames / frame_rate
+                reps.append({
+                    "rep": len(reps) + 1,
+                    "min_depth": round(min(rep["depths"]), 1),
+                    "duration_sec": round(duration, 2),
+                    "valid_depth": min(rep["depths"]) < valid_depth_threshold,
+                    "knees_over_toes": "Yes" if rep["over_toe"] / rep["frames"] > adherence_ratio else "No",
+                    "back_straight": "Yes" if rep["back"] / rep["frames"] > adherence_ratio else "No",
+                    "sample_fps": round(rep["frames"] / duration, 1),
+                })
+    return reps
+
+
+class RepEngineTests(SimpleTestCase):
+    """
+    RepEngine against the state machines it replaced, on random and
+    random-walk angle sequences, for non-overlapping thresholds (with
+    overlapping ones the old machines counted a rep on every frame in
+    between).
+    """
+
+    def _sequences(self, seed):
+        rng = random.Random(seed)
+        for _ in range(50):
+            yield [rng.uniform(0, 180) for _ in range(300)]
+            angle, walk = 170.0, []
+            for _ in range(600):
+                angle = min(max(angle + rng.gauss(0, 12), 0), 180)
+                walk.append(angle)
+            yield walk
+
+    def test_live_counter(self):
+        configs = [("up_down", 90, 160), ("up_down", 70, 140),
+                   ("down_up", 160, 90), ("down_up", 120, 40)]
+        for direction, down, up in configs:
+            for angles in self._sequences(1):
+                engine = RepEngine(direction, enter_threshold=down,
+                                   exit_threshold=up, require_arming=True,
+                                   count_on="enter")
+                counts = []
+                for angle in angles:
+                    engine.update(None, angle)
+                    counts.append(engine.count)
+                self.assertEqual(
+                    counts, old_live_counts(angles, direction, down, up))
+
+    def test_backend_tracker(self):
+        rng = random.Random(2)
+        for depth, recovery in [(100, 140), (110, 160), (125, 126)]:
+            for stride in (1, 3):
+                for angles in self._sequences(3):
+                    frames = [(i * stride, angle, rng.uniform(140, 180),
+                               rng.random() < 0.7)
+                              for i, angle in enumerate(angles)]
+                    tracker = SquatRepTracker(
+                        30.0, depth_threshold=depth, recovery_threshold=recovery)
+                    reps = [rep for rep in (tracker.update_angles(*frame)
+                                            for frame in frames) if rep]
+                    for rep in reps:
+                        for key in ("start_sec", "end_sec", "bottom_sec"):
+                            del rep[key]
+                    self.assertEqual(
+                        reps, old_backend_reps(frames, 30.0, depth, recovery))
+
+    def test_rep_event_frames(self):
+        engine = RepEngine("up_down", enter_threshold=100, exit_threshold=150,
+                           min_rep_frames=2)
+        events = [engine.update(i, angle) for i, angle in
+                  enumerate([170, 90, 60, 80, 160, 170])]
+        event = events[4]
+        self.assertEqual((event.rep, event.start_frame, event.end_frame,
+                          event.frames, event.extreme, event.extreme_frame),
+                         (1, 1, 4, 3, 60, 2))
+        self.assertEqual([e for e in events if e], [event])
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            RepEngine("sideways")
+        with self.assertRaises(ValueError):
+            RepEngine(count_on="never")
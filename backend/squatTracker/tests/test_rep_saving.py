@@ -0,0 +1,62 @@
+from unittest import mock
+
+import numpy as np
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import squat_analysis
+from ..models import AnalysisJob, SquatAnalysis
+from .utils import squat_landmarks
+
+
+def inserts(queries):
+    return [q for q in queries if q["sql"].startswith("INSERT")]
+
+
+class RepSavingTests(TestCase):
+    def setUp(self):
+        self.job = AnalysisJob.objects.create(video_path="squat.mp4")
+        frames = np.arange(1000)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+
+    def _saved(self):
+        return list(SquatAnalysis.objects.filter(job=self.job)
+                    .order_by("rep").values_list("rep", "start_sec"))
+
+    def test_one_insert_linked_to_the_job(self):
+        with CaptureQueriesContext(connection) as queries:
+            reps = squat_analysis.analyze_squat_landmarks(
+                self.landmarks, 30.0, job=self.job)
+        self.assertGreater(len(reps), 5)
+        self.assertEqual(len(inserts(queries)), 1)
+        self.assertEqual(self._saved(), [(r["rep"], r["start_sec"]) for r in reps])
+
+    def test_rerun_replaces_the_jobs_reps(self):
+        other = AnalysisJob.objects.create(video_path="other.mp4")
+        squat_analysis.analyze_squat_landmarks(self.landmarks, 30.0, job=other)
+        squat_analysis.analyze_squat_landmarks(self.landmarks, 30.0, job=self.job)
+        reps = squat_analysis.analyze_squat_landmarks(
+            self.landmarks[:500], 30.0, job=self.job)
+        self.assertEqual(self._saved(), [(r["rep"], r["start_sec"]) for r in reps])
+        self.assertEqual(SquatAnalysis.objects.filter(job=other).count(), 10)
+
+    def test_checkpoints(self):
+        def iter_pose_landmarks(video_path, start_frame, end_frame, **kwargs):
+            yield from enumerate(self.landmarks)
+
+        # A leftover rep from an earlier run of the job
+        SquatAnalysis.objects.create(
+            rep=1, duration_sec=1.0, back_straight="No", knees_over_toes="No",
+            min_depth=90.0, valid_depth=True, job=self.job)
+        with mock.patch.object(squat_analysis, "iter_pose_landmarks", iter_pose_landmarks), \
+                mock.patch.object(squat_analysis, "video_properties",
+                                  return_value=(30.0, len(self.landmarks))), \
+                mock.patch.object(squat_analysis, "REPS_PER_CHECKPOINT", 4), \
+                CaptureQueriesContext(connection) as queries:
+            reps = squat_analysis.analyze_squat_video(
+                "squat.mp4", use_cache=False, job=self.job)
+        self.assertEqual(len(reps), 10)
+        # Two checkpoints of four, then the last two
+        self.assertEqual(len(inserts(queries)), 3)
+        self.assertEqual(self._saved(), [(r["rep"], r["start_sec"]) for r in reps])
@@ -0,0 +1,78 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from .. import squat_analysis
+from ..pose_estimation import FixedStride
+from ..squat_analysis import AdaptiveSquatSampler
+from .utils import squat_landmarks
+
+
+class SamplerTests(SimpleTestCase):
+    def test_fixed_stride(self):
+        self.assertEqual(FixedStride(3).advance(None), 3)
+        self.assertEqual(FixedStride(0).advance(None), 1)
+
+    def test_adaptive(self):
+        sampler = AdaptiveSquatSampler(5, depth_threshold=125,
+                                       recovery_threshold=120, margin=15)
+        for angle, step in [(170, 5), (141, 5), (139, 1), (122, 1),
+                            (106, 1), (104, 5), (60, 5)]:
+            with self.subTest(angle=angle):
+                self.assertEqual(
+                    sampler.advance(squat_landmarks([angle])[0]), step)
+        self.assertEqual(sampler.advance(None), 5)
+
+
+class SampledAnalysisTests(TestCase):
+    """
+    analyze_squat_video's sampling options, with pose estimation swapped
+    for a synthetic 30 fps landmark series that follows the sampler.
+    """
+    frame_count = 1000
+
+    def setUp(self):
+        frames = np.arange(self.frame_count)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+        self.analyzed = []
+
+    def _iter_pose_landmarks(self, video_path, start_frame, end_frame,
+                             static_image_mode, sampler, **kwargs):
+        frame_index = start_frame
+        while frame_index < self.frame_count:
+            self.analyzed.append(frame_index)
+            landmarks = self.landmarks[frame_index]
+            yield frame_index, landmarks
+            frame_index += sampler.advance(landmarks)
+
+    def _analyze(self, **kwargs):
+        self.analyzed = []
+        with mock.patch.object(squat_analysis, "iter_pose_landmarks",
+                               self._iter_pose_landmarks), \
+                mock.patch.object(squat_analysis, "video_properties",
+                                  return_value=(30.0, self.frame_count)):
+            return squat_analysis.analyze_squat_video(
+                "video.mp4", use_cache=False, **kwargs)
+
+    def test_target_fps(self):
+        reps = self._analyze(target_fps=10)
+        self.assertEqual(self.analyzed, list(range(0, self.frame_count, 3)))
+        self.assertGreater(len(reps), 5)
+        self.assertTrue(all(rep["sample_fps"] <= 10 for rep in reps))
+
+    def test_adaptive_finds_the_same_reps(self):
+        every_frame = self._analyze()
+        reps = self._analyze(adaptive=True, stride=5)
+        self.assertLess(len(self.analyzed), self.frame_count / 2)
+        self.assertGreater(len(every_frame), 5)
+        keys = ("rep", "duration_sec", "start_sec", "end_sec")
+        self.assertEqual([{k: rep[k] for k in keys} for rep in reps],
+                         [{k: rep[k] for k in keys} for rep in every_frame])
+        # The bottom is sampled sparsely, so it can read a little shallower
+        for rep, exact in zip(reps, every_frame):
+            self.assertLessEqual(rep["min_depth"] - exact["min_depth"], 5)
+
+    def test_adaptive_rejects_workers(self):
+        with self.assertRaises(ValueError):
+            self._analyze(adaptive=True, workers=2)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import AnalysisJob, SquatAnalysis
+from .utils import make_rep
+
+
+@override_settings(METRICS_DB=None)
+class AllSquatsViewTests(TestCase):
+    url = "/api/squats/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.job = AnalysisJob.objects.create(video_path="a.mp4", video_hash="a" * 64)
+        other = AnalysisJob.objects.create(video_path="b.mp4", video_hash="b" * 64)
+        cls.reps = [make_rep(cls.job, rep=i, valid_depth=i % 2 == 0)
+                    for i in range(1, 6)]
+        cls.reps += [make_rep(other, rep=1), make_rep(None)]
+        SquatAnalysis.objects.filter(pk=cls.reps[0].pk).update(
+            created_at=timezone.now() - timedelta(days=10))
+
+    def _ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [rep["id"] for rep in response.json()["results"]]
+
+    def test_newest_first(self):
+        self.assertEqual(self._ids(), [rep.pk for rep in reversed(self.reps)])
+
+    def test_filters(self):
+        job_reps = [rep.pk for rep in reversed(self.reps[:5])]
+        self.assertEqual(self._ids(job=self.job.pk), job_reps)
+        self.assertEqual(self._ids(video_hash="a" * 64), job_reps)
+        self.assertEqual(self._ids(job=self.job.pk, valid_depth="true"),
+                         [self.reps[3].pk, self.reps[1].pk])
+        self.assertEqual(self._ids(job=self.job.pk, valid_depth="0"),
+                         [self.reps[4].pk, self.reps[2].pk, self.reps[0].pk])
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertNotIn(self.reps[0].pk, self._ids(since=since))
+        self.assertEqual(self._ids(until=since), [self.reps[0].pk])
+
+    def test_invalid_filters(self):
+        for params in [{"job": "x"}, {"valid_depth": "maybe"},
+                       {"since": "yesterday"}, {"until": "2024-13-01"}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_cursor_pagination(self):
+        seen = []
+        url = self.url + "?page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 3)
+            seen += [rep["id"] for rep in page["results"]]
+            url = page["next"]
+        self.assertEqual(seen, [rep.pk for rep in reversed(self.reps)])
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Filters have their own ETag
+        filtered = self.client.get(self.url, {"job": self.job.pk})
+        self.assertNotEqual(filtered["ETag"], etag)
+
+        # New and deleted reps change it
+        rep = make_rep(self.job, rep=6)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        rep.delete()
+        self.reps[2].delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(response["ETag"], (etag, filtered["ETag"]))
@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import squat_analysis
+from ..models import AnalysisJob
+from ..motion import find_active_segment
+from ..views import _parse_time_range
+from .utils import squat_landmarks
+
+
+class ParseTimeRangeTests(SimpleTestCase):
+    def test_valid(self):
+        for data, expected in [
+            ({}, (None, None)),
+            ({"start_time": "", "end_time": ""}, (None, None)),
+            ({"start_time": "0"}, (None, None)),
+            ({"start_time": "1.5", "end_time": "3"}, (1.5, 3.0)),
+            ({"end_time": 5}, (None, 5.0)),
+            ({"start_time": 2}, (2.0, None)),
+        ]:
+            with self.subTest(data=data):
+                self.assertEqual(_parse_time_range(data), expected)
+
+    def test_invalid(self):
+        for data in [
+            {"start_time": "soon"},
+            {"start_time": "-1"},
+            {"end_time": "nan"},
+            {"end_time": "inf"},
+            {"start_time": [1]},
+            {"start_time": "3", "end_time": "3"},
+            {"start_time": "4", "end_time": "2"},
+        ]:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                _parse_time_range(data)
+
+
+class FindActiveSegmentTests(SimpleTestCase):
+    """
+    A 10 s, 30 fps video that stands still apart from a square moving
+    across it from frame 120 to 179.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.dir, "motion.avi")
+        writer = cv2.VideoWriter(cls.path, cv2.VideoWriter_fourcc(*"MJPG"),
+                                 30, (160, 120))
+        for frame_index in range(300):
+            frame = np.full((120, 160, 3), 100, np.uint8)
+            if 120 <= frame_index < 180:
+                x = 2 * (frame_index - 120)
+                frame[40:80, x:x + 40] = 255
+            writer.write(frame)
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir)
+        super().tearDownClass()
+
+    def test_segment(self):
+        start, end = find_active_segment(self.path)
+        # Padded by a second (30 frames), give or take one 6-frame sample
+        self.assertTrue(120 - 30 - 6 <= start <= 120 - 30, start)
+        self.assertTrue(180 + 30 <= end <= 180 + 30 + 12, end)
+        self.assertEqual(find_active_segment(self.path, padding=0)[0], 114)
+
+    def test_within_a_range(self):
+        start, end = find_active_segment(self.path, 150, 250, padding=0)
+        self.assertEqual(start, 150)
+        self.assertTrue(180 <= end <= 192, end)
+        # Nothing moves after the square: the range is kept as it is
+        self.assertEqual(find_active_segment(self.path, 200, 290), (200, 290))
+        self.assertEqual(find_active_segment(self.path, 400), (400, None))
+
+    def test_unreadable_video(self):
+        self.assertEqual(find_active_segment(os.path.join(self.dir, "gone.mp4"), 5, 10),
+                         (5, 10))
+
+
+class PartialAnalysisTests(TestCase):
+    """
+    analyze_squat_video() on part of a synthetic 20 s video with a rep
+    every 97 frames.
+    """
+
+    def setUp(self):
+        frames = np.arange(600)
+        self.landmarks = squat_landmarks(125 + 50 * np.cos(2 * np.pi * frames / 97))
+        self.ranges = []
+
+        def iter_pose_landmarks(video_path, start_frame, end_frame, **kwargs):
+            self.ranges.append((start_frame, end_frame))
+            for frame_index in range(start_frame, end_frame or len(self.landmarks)):
+                yield frame_index, self.landmarks[frame_index]
+
+        self.enterContext(mock.patch.object(
+            squat_analysis, "iter_pose_landmarks", iter_pose_landmarks))
+        self.enterContext(mock.patch.object(
+            squat_analysis, "video_properties", return_value=(30.0, 600)))
+
+    def _analyze(self, **kwargs):
+        return squat_analysis.analyze_squat_video("a.mp4", use_cache=False, **kwargs)
+
+    def test_time_range(self):
+        whole = self._analyze()
+        # From and to standing (the angle peaks at multiples of 97 frames)
+        reps = self._analyze(start_time=6.5, end_time=16)
+        self.assertEqual(self.ranges[-1], (195, 480))
+        # Timed from the start of the video, like the same reps of the
+        # whole video
+        inside = [rep for rep in whole
+                  if rep["start_sec"] >= 6.5 and rep["end_sec"] < 16]
+        self.assertEqual(len(inside), 3)
+        self.assertEqual([rep["bottom_sec"] for rep in reps],
+                         [rep["bottom_sec"] for rep in inside])
+        self.assertEqual([rep["rep"] for rep in reps], list(range(1, len(reps) + 1)))
+
+    def test_auto_trim(self):
+        with mock.patch.object(squat_analysis, "find_active_segment",
+                               return_value=(200, 400)) as trim:
+            self._analyze(start_time=5, auto_trim=True)
+        self.assertEqual(trim.call_args.args, ("a.mp4", 150, None))
+        self.assertEqual(self.ranges, [(200, 400)])
+
+
+@override_settings(METRICS_DB=None, ANALYSIS_RUN_IN_PROCESS=False)
+class AnalyzeTimeRangeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def _post(self, **data):
+        return self.client.post("/api/analyze/", {
+            "video": SimpleUploadedFile("squat.mp4", b"\0" * 100), **data})
+
+    def test_range_is_queued(self):
+        response = self._post(start_time="1.5", end_time="3")
+        self.assertEqual(response.status_code, 202)
+        job = AnalysisJob.objects.get(pk=response.json()["job_id"])
+        self.assertEqual((job.start_time, job.end_time), (1.5, 3.0))
+        # The same range of the same video reuses the job; another range doesn't
+        self.assertEqual(self._post(start_time="1.5", end_time="3").json()["job_id"],
+                         job.pk)
+        self.assertNotEqual(self._post(start_time="2").json()["job_id"], job.pk)
+        self.assertNotEqual(self._post().json()["job_id"], job.pk)
+
+    def test_invalid_range(self):
+        response = self._post(start_time="4", end_time="2")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+        self.assertFalse(AnalysisJob.objects.exists())
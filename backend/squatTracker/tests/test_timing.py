@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import timing
+from ..models import AnalysisJob
+from ..timing import NULL_TIMER, StageTimer, format_server_timing
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StageTimerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.enterContext(mock.patch.object(timing, "time", self.clock))
+
+    def test_nested_stages_are_exclusive(self):
+        observed = []
+        timer = StageTimer(observer=lambda name, s: observed.append((name, s)))
+        with timer.stage("reps"):
+            self.clock.advance(0.010)
+            with timer.stage("db"):
+                self.clock.advance(0.005)
+            self.clock.advance(0.002)
+        with timer.stage("db"):
+            self.clock.advance(0.001)
+
+        self.assertEqual(timer.as_dict(), {"reps": {"ms": 12.0, "calls": 1},
+                                           "db": {"ms": 6.0, "calls": 2}})
+        self.assertEqual([name for name, _ in observed], ["db", "reps", "db"])
+        self.assertAlmostEqual(observed[1][1], 0.012)
+        self.assertEqual(timer.text(), "reps 12.0 | db 3.0 ms")
+
+    def test_total_and_other(self):
+        timer = StageTimer()
+        with timer.stage("decode"):
+            self.clock.advance(0.3)
+        timings = timer.as_dict(total=0.5)
+        self.assertEqual(list(timings), ["decode", "other", "total"])
+        self.assertEqual(timings["other"], {"ms": 200.0, "calls": 1})
+        self.assertEqual(format_server_timing(timings),
+                         "decode;dur=300.0, other;dur=200.0, total;dur=500.0")
+        timer.reset()
+        self.assertEqual(timer.as_dict(), {})
+        self.assertEqual(timer.text(), "")
+
+    def test_threads_keep_their_own_stages(self):
+        timer = StageTimer()
+        entered = threading.Event()
+        done = threading.Event()
+
+        def other_thread():
+            with timer.stage("pose"):
+                entered.set()
+                done.wait(5)
+
+        thread = threading.Thread(target=other_thread)
+        with timer.stage("decode"):
+            thread.start()
+            entered.wait(5)
+            self.clock.advance(0.004)
+        done.set()
+        thread.join()
+        # The other thread's open stage didn't pause this one
+        self.assertEqual(timer.as_dict()["decode"]["ms"], 4.0)
+        self.assertEqual(timer.as_dict()["pose"]["calls"], 1)
+
+    def test_null_timer(self):
+        with NULL_TIMER.stage("decode"):
+            NULL_TIMER.add("pose", 1.0)
+
+
+@override_settings(METRICS_DB=None, ANALYSIS_RUN_IN_PROCESS=False)
+class ServerTimingTests(TestCase):
+    def test_job_timings(self):
+        job = AnalysisJob.objects.create(
+            video_path="a.mp4", status=AnalysisJob.DONE,
+            timings={"decode": {"ms": 812.4, "calls": 90},
+                     "pose": {"ms": 6120.9, "calls": 90}})
+        url = f"/api/analyze/{job.pk}/"
+        response = self.client.get(url)
+        self.assertEqual(response["Server-Timing"],
+                         "decode;dur=812.4, pose;dur=6120.9")
+        self.assertNotIn("timings", response.json())
+        self.assertEqual(self.client.get(url, {"timings": "1"}).json()["timings"],
+                         job.timings)
+
+        queued = AnalysisJob.objects.create(video_path="b.mp4")
+        self.assertNotIn("Server-Timing", self.client.get(f"/api/analyze/{queued.pk}/"))
+
+    def test_upload_timings(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post("/api/analyze/?timings=1", {
+                "video": SimpleUploadedFile("squat.mp4", b"\0" * 100)})
+        self.assertEqual(response.status_code, 202)
+        stages = [part.split(";")[0] for part in response["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["upload", "store", "db", "other", "total"])
+        self.assertEqual(list(response.json()["timings"]), stages)
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..jobs import find_reusable_job
+from ..models import AnalysisJob
+from ..uploads import UPLOAD_DIR, store_upload
+
+
+class StoreUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.upload_dir = os.path.join(self.media_root, UPLOAD_DIR)
+
+    def test_stored_by_content_hash(self):
+        data = b"squat" * 1000
+        video_hash = hashlib.sha256(data).hexdigest()
+        path, stored_hash = store_upload(SimpleUploadedFile("Squat.MP4", data))
+        self.assertEqual(stored_hash, video_hash)
+        self.assertEqual(path, os.path.join(self.upload_dir, video_hash + ".mp4"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+        # The same video again maps to the same file
+        self.assertEqual(store_upload(SimpleUploadedFile("again.mp4", data)),
+                         (path, video_hash))
+        path, _ = store_upload(SimpleUploadedFile("odd.ext?x", data))
+        self.assertEqual(os.path.basename(path), video_hash)
+        self.assertEqual(sorted(os.listdir(self.upload_dir)),
+                         sorted([video_hash, video_hash + ".mp4"]))
+
+    def test_failed_upload_leaves_no_file(self):
+        upload = SimpleUploadedFile("squat.mp4", b"\0" * 100)
+        with mock.patch.object(upload, "chunks", side_effect=OSError("reset")), \
+                self.assertRaises(OSError):
+            store_upload(upload)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+
+@override_settings(METRICS_DB=None, ANALYSIS_RUN_IN_PROCESS=False)
+class ReuseTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def _post(self, data=b"\0" * 100, **fields):
+        return self.client.post("/api/analyze/", dict(
+            fields, video=SimpleUploadedFile("squat.mp4", data)))
+
+    def test_find_reusable_job(self):
+        AnalysisJob.objects.create(
+            video_path="a.mp4", video_hash="a" * 64, status=AnalysisJob.FAILED)
+        self.assertIsNone(find_reusable_job("a" * 64))
+        done = AnalysisJob.objects.create(
+            video_path="a.mp4", video_hash="a" * 64, status=AnalysisJob.DONE)
+        self.assertEqual(find_reusable_job("a" * 64), done)
+        self.assertIsNone(find_reusable_job("a" * 64, start_time=2.0))
+        self.assertIsNone(find_reusable_job("b" * 64))
+
+    def test_identical_upload_shares_the_job(self):
+        first = self._post().json()
+        second = self._post()
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(second.json()["job_id"], first["job_id"])
+        # Another part of the video, or another video, is a new job
+        self.assertNotEqual(self._post(end_time="3").json()["job_id"], first["job_id"])
+        self.assertNotEqual(self._post(b"\1" * 100).json()["job_id"], first["job_id"])
+        self.assertEqual(AnalysisJob.objects.count(), 3)
+
+    def test_done_job_answers_with_its_result(self):
+        job_id = self._post().json()["job_id"]
+        AnalysisJob.objects.filter(pk=job_id).update(
+            status=AnalysisJob.DONE, result=[{"rep": 1}])
+        response = self._post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["job_id"], job_id)
+        self.assertEqual(response.json()["result"], [{"rep": 1}])
+
+    def test_failed_job_is_retried(self):
+        job_id = self._post().json()["job_id"]
+        AnalysisJob.objects.filter(pk=job_id).update(status=AnalysisJob.FAILED)
+        self.assertNotEqual(self._post().json()["job_id"], job_id)
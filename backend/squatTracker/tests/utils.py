@@ -0,0 +1,47 @@
+import numpy as np
+
+from ..kinematics import (
+    RIGHT_ANKLE, RIGHT_FOOT_INDEX, RIGHT_HIP, RIGHT_KNEE, RIGHT_SHOULDER,
+)
+from ..models import SquatAnalysis
+from ..pose_estimation import NUM_LANDMARKS
+from ..squat_analysis import SquatRepTracker, squat_features
+
+
+def squat_landmarks(knee_angles):
+    """
+    (frames, 33, 4) landmarks whose right knee is bent to the given
+    angles (NaN for a frame without a pose), with the back in line with
+    the thigh and the knee behind the toes.
+    """
+    theta = np.radians(np.asarray(knee_angles, dtype=np.float64))
+    landmarks = np.zeros((len(theta), NUM_LANDMARKS, 4), dtype=np.float32)
+    thigh = np.stack([np.sin(theta), np.cos(theta)], axis=1) * 0.3
+    landmarks[:, RIGHT_KNEE, :2] = (0.5, 0.5)
+    landmarks[:, RIGHT_ANKLE, :2] = (0.5, 0.8)
+    landmarks[:, RIGHT_FOOT_INDEX, :2] = (0.55, 0.82)
+    landmarks[:, RIGHT_HIP, :2] = 0.5 + thigh
+    landmarks[:, RIGHT_SHOULDER, :2] = 0.5 + 2 * thigh
+    landmarks[np.isnan(theta)] = np.nan
+    return landmarks
+
+
+def track_reps(blocks, frame_rate=30.0, **thresholds):
+    """
+    Runs (frame_indices, landmarks) blocks through one SquatRepTracker,
+    the way analyze_squat_video does, and returns the reps.
+    """
+    tracker = SquatRepTracker(frame_rate, **thresholds)
+    reps = []
+    for frame_indices, landmarks in blocks:
+        for frame_index, *features in zip(frame_indices, *squat_features(landmarks)):
+            rep = tracker.update_angles(frame_index, *features)
+            if rep:
+                reps.append(rep)
+    return reps
+
+
+def make_rep(job=None, rep=1, valid_depth=True):
+    return SquatAnalysis.objects.create(
+        rep=rep, duration_sec=1.0, back_straight="Yes", knees_over_toes="No",
+        min_depth=90.0, valid_depth=valid_depth, job=job)
@@ -0,0 +1,159 @@
+"""
+Per-stage wall-clock timers for the analysis pipeline and the live
+scripts. Django-free.
+
+    timer = StageTimer()
+    with timer.stage("decode"):
+        ret, frame = cap.read()
+    timer.add("pose", seconds)   # for durations measured elsewhere
+
+Each stage keeps a running total and a call count; a timed block costs
+a few microseconds, against milliseconds for decoding or inference.
+Functions that take an optional timer use NULL_TIMER when given None,
+so untimed runs only pay for a no-op call.
+
+Stages are exclusive: while a stage opened inside another one runs, the
+outer stage's clock is paused (per thread). Stage totals therefore add
+up to the time spent inside any stage, and e.g. database writes made
+from inside the rep loop count as "db" rather than "reps".
+
+Stage names are plain tokens (decode, preprocess, pose, reps, db, ...)
+so they can be sent as-is in a Server-Timing header.
+
+A timer can also report every finished stage call to an observer, e.g.
+to feed a latency histogram (see metrics.stage_timer()).
+"""
+import contextlib
+import threading
+import time
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start", "elapsed")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.elapsed = 0.0  # Before the last pause
+
+    def __enter__(self):
+        now = time.perf_counter()
+        stack = self.timer._stack()
+        if stack:
+            # Pause the enclosing stage
+            outer = stack[-1]
+            outer.elapsed += now - outer.start
+            self.timer.add(outer.name, now - outer.start, calls=0)
+        stack.append(self)
+        self.start = now
+        return self
+
+    def __exit__(self, *exc_info):
+        now = time.perf_counter()
+        self.timer.add(self.name, now - self.start)
+        if self.timer.observer is not None:
+            self.timer.observer(self.name, self.elapsed + now - self.start)
+        stack = self.timer._stack()
+        stack.pop()
+        if stack:
+            stack[-1].start = now  # Resume the enclosing stage
+
+
+def format_server_timing(timings):
+    """
+    Formats an as_dict() breakdown as a Server-Timing header value,
+    e.g. 'decode;dur=812.4, pose;dur=6120.9'.
+    """
+    return ", ".join(f"{name};dur={stage['ms']}"
+                     for name, stage in timings.items())
+
+
+class StageTimer:
+    """
+    Accumulates time per named stage. Safe to share between threads
+    (e.g. the capture and inference threads of LivePipeline).
+
+    observer, if given, is called as observer(name, seconds) whenever a
+    stage block ends, with that call's own (exclusive) time.
+    """
+
+    def __init__(self, observer=None):
+        self.observer = observer
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._totals = {}
+        self._calls = {}
+
+    def _stack(self):
+        """
+        This thread's open stages, innermost last.
+        """
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def reset(self):
+        with self._lock:
+            self._totals = {}
+            self._calls = {}
+
+    def stage(self, name):
+        """
+        Context manager that adds the time spent in its block to `name`.
+        """
+        return _Stage(self, name)
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0.0) + seconds
+            self._calls[name] = self._calls.get(name, 0) + calls
+
+    def as_dict(self, total=None):
+        """
+        {stage: {"ms": total milliseconds, "calls": count}}, in the order
+        the stages first ran. Given the wall time (seconds) of the whole
+        operation as `total`, also adds an "other" stage for the time
+        outside every stage and the "total" itself.
+        """
+        with self._lock:
+            totals = dict(self._totals)
+            calls = dict(self._calls)
+        if total is not None:
+            totals["other"] = max(total - sum(totals.values()), 0.0)
+            totals["total"] = total
+            calls["other"] = calls["total"] = 1
+        return {name: {"ms": round(seconds * 1000, 1), "calls": calls[name]}
+                for name, seconds in totals.items()}
+
+    def server_timing(self, total=None):
+        return format_server_timing(self.as_dict(total))
+
+    def text(self):
+        """
+        One line of average milliseconds per call, for on-screen display,
+        e.g. 'decode 3.1 | pose 24.8 | reps 0.1 ms'.
+        """
+        with self._lock:
+            parts = [f"{name} {total * 1000 / self._calls[name]:.1f}"
+                     for name, total in self._totals.items()
+                     if self._calls[name]]
+        return " | ".join(parts) + " ms" if parts else ""
+
+
+class _NullTimer:
+    """
+    Stand-in for StageTimer that records nothing.
+    """
+
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def add(self, name, seconds, calls=1):
+        pass
+
+
+NULL_TIMER = _NullTimer()
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+
+UPLOAD_DIR = "uploads"
+
+
+def store_upload(uploaded_file):
+    """
+    Streams an uploaded file to MEDIA_ROOT/uploads/<sha256><ext>, hashing
+    the chunks as they are written. Identical videos map to the same file,
+    so retried uploads neither overwrite other clips nor pile up copies.
+
+    Returns (path, sha256_hex).
+    """
+    target_dir = os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    # Write next to the target so the final rename stays on one filesystem
+    with tempfile.NamedTemporaryFile(dir=target_dir, suffix=".part",
+                                     delete=False) as f:
+        tmp_path = f.name
+        try:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        except BaseException:
+            # A dropped upload or a full disk: don't leave the .part behind
+            f.close()
+            os.remove(tmp_path)
+            raise
+
+    video_hash = digest.hexdigest()
+    ext = os.path.splitext(uploaded_file.name)[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,8}", ext):
+        ext = ""
+    path = os.path.join(target_dir, video_hash + ext)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, path)
+    return path, video_hash
@@ -1,11 +1,18 @@
 from django.urls import path
-from .views import SquatAnalysisView, AllSquatsView, VideoUploadView, FirstWorkoutVideoView
+from .views import SquatAnalysisView, LandmarkAnalysisView, AnalysisJobView, AnalysisJobEventsView, AllSquatsView, RepClipView, RepStillView, VideoStreamView, VideoUploadView, FirstWorkoutVideoView, MetricsView
 
 urlpatterns = [
     path('analyze/', SquatAnalysisView.as_view(), name='analyze'),
+    path('analyze/landmarks/', LandmarkAnalysisView.as_view(), name='analyze-landmarks'),
+    path('analyze/<int:job_id>/', AnalysisJobView.as_view(), name='analysis-job'),
+    path('analyze/<int:job_id>/events/', AnalysisJobEventsView.as_view(), name='analysis-job-events'),
     path('squats/', AllSquatsView.as_view(), name='squats'),
+    path('squats/<int:rep_id>/clip/', RepClipView.as_view(), name='squat-clip'),
+    path('squats/<int:rep_id>/still/', RepStillView.as_view(), name='squat-still'),
     path('upload/', VideoUploadView.as_view(), name='upload'),
+    path('videos/<int:video_id>/stream/', VideoStreamView.as_view(), name='video-stream'),
     path("first-video/", FirstWorkoutVideoView.as_view(), name="first-video"),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
 
 ]
@@ -1,43 +1,410 @@
+import math
+from time import perf_counter
+
 from rest_framework.views import APIView
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
 from .serializers import WorkoutVideoSerializer
 
 from rest_framework.response import Response
 from rest_framework import status
-from django.conf import settings
-import os
-from .serializers import SquatAnalysisSerializer
-from .squat_analysis import analyze_squat_video
-from .models import SquatAnalysis, WorkoutVideo
+from django.db import transaction
+from django.http import HttpResponse
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .serializers import SquatAnalysisSerializer, AnalysisJobSerializer
+from . import metrics
+from .dates import parse_datetime_param
+from .jobs import enqueue_analysis, find_reusable_job, prepare_video
+from .job_events import EventStreamRenderer, job_event_response
+from . import rep_clips
+from .media_streaming import serve_media
+from .landmark_upload import (
+    LandmarkArrayParser, parse_landmark_array, parse_landmark_json,
+)
+from .squat_analysis import analyze_squat_landmarks
+from .timing import format_server_timing
+from .uploads import store_upload
+from .models import SquatAnalysis, WorkoutVideo, AnalysisJob
+
+
+def _add_timings(request, response, timings):
+    """
+    Attaches a per-stage breakdown (StageTimer.as_dict()) to a response:
+    always as a Server-Timing header, and as a `timings` field when the
+    request has ?timings=1.
+    """
+    if timings:
+        response['Server-Timing'] = format_server_timing(timings)
+    if request.query_params.get('timings', '').lower() in ('1', 'true'):
+        response.data['timings'] = timings
+    return response
+
+
+def _parse_time_range(data):
+    """
+    Reads the optional start_time / end_time fields (seconds into the
+    video) of an analysis request. Returns (start_time, end_time) with
+    None for a missing bound; a start of 0 counts as missing, so it
+    matches whole-video jobs. Raises ValueError for malformed values.
+    """
+    bounds = []
+    for name in ('start_time', 'end_time'):
+        value = data.get(name)
+        if value in (None, ''):
+            bounds.append(None)
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {name}: {value!r}")
+        if not math.isfinite(seconds) or seconds < 0:
+            raise ValueError(f"Invalid {name}: {value!r}")
+        bounds.append(seconds)
+    start_time, end_time = bounds
+    if start_time is not None and end_time is not None and end_time <= start_time:
+        raise ValueError("end_time must be after start_time")
+    return start_time or None, end_time
 
 
 class SquatAnalysisView(APIView):
+    """
+    Queues a squat analysis of an uploaded video, or with start_time
+    and/or end_time (seconds) of that part of it. The response's
+    Server-Timing header covers this request (upload, store, db); the
+    analysis itself is timed on the job (see AnalysisJobView).
+
+    With Accept: text/event-stream (or ?format=sse) the response follows
+    the job instead, streaming its progress and reps as Server-Sent
+    Events (see job_events) until the result is in.
+    """
     parser_classes = [MultiPartParser]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer]
 
     def post(self, request):
-        video = request.FILES.get('video')
+        timer = metrics.stage_timer('upload')
+        start = perf_counter()
+        with timer.stage('upload'):
+            video = request.FILES.get('video')
         if not video:
             return Response({'error': 'No video uploaded'}, status=400)
+        try:
+            start_time, end_time = _parse_time_range(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # Save video to media folder under its content hash
+        with timer.stage('store'):
+            save_path, video_hash = store_upload(video)
+
+        # Identical video already analyzed (or in progress): reuse that job
+        with timer.stage('db'):
+            job = find_reusable_job(video_hash, start_time, end_time)
+        stream = isinstance(request.accepted_renderer, EventStreamRenderer)
+        if job and job.status == AnalysisJob.DONE and not stream:
+            response = Response({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': reverse('analysis-job', args=[job.id]),
+                'result': job.result,
+            }, status=status.HTTP_200_OK)
+            return _add_timings(request, response, timer.as_dict(
+                total=perf_counter() - start))
+
+        # Otherwise queue squat analysis; poll the status URL for the result
+        if not job:
+            with timer.stage('db'):
+                job = enqueue_analysis(save_path, video_hash,
+                                       start_time, end_time)
+        if stream:
+            response = job_event_response(request, job)
+            response['Server-Timing'] = timer.server_timing(
+                total=perf_counter() - start)
+            return response
+        response = Response({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('analysis-job', args=[job.id]),
+            'events_url': reverse('analysis-job-events', args=[job.id]),
+        }, status=status.HTTP_202_ACCEPTED)
+        return _add_timings(request, response, timer.as_dict(
+            total=perf_counter() - start))
+
+
+class LandmarkAnalysisView(APIView):
+    """
+    Analyzes a landmark time series estimated on the client (see
+    landmark_upload for the JSON and binary formats) synchronously, with
+    the same rep logic and result schema as /api/analyze/. The analysis
+    is recorded as a finished AnalysisJob, so its reps can be listed and
+    filtered like those of uploaded videos. Timed like /api/analyze/
+    (parse, reps, db).
+    """
+    parser_classes = [JSONParser, LandmarkArrayParser]
+
+    def post(self, request):
+        timer = metrics.stage_timer('landmarks')
+        start = perf_counter()
+        try:
+            with timer.stage('parse'):
+                if request.content_type.startswith(LandmarkArrayParser.media_type):
+                    frame_rate, frame_indices, landmarks = parse_landmark_array(
+                        request.data, request.query_params)
+                else:
+                    frame_rate, frame_indices, landmarks = parse_landmark_json(
+                        request.data)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        frames = (frame_indices[-1] + 1 if frame_indices
+                  else len(landmarks))
+        started_at = timezone.now()
+        with timer.stage('db'), transaction.atomic():
+            job = AnalysisJob.objects.create(
+                status=AnalysisJob.RUNNING, started_at=started_at,
+                total_frames=frames)
+            result = analyze_squat_landmarks(
+                landmarks, frame_rate, frame_indices, job=job, timer=timer)
+            job.status = AnalysisJob.DONE
+            job.frames_done = frames
+            job.result = result
+            job.finished_at = timezone.now()
+            job.timings = timer.as_dict(total=perf_counter() - start)
+            job.save(update_fields=[
+                'status', 'frames_done', 'result', 'finished_at', 'timings'])
+
+        response = Response({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('analysis-job', args=[job.id]),
+            'result': result,
+        }, status=status.HTTP_200_OK)
+        return _add_timings(request, response, timer.as_dict(
+            total=perf_counter() - start))
+
+
+class AnalysisJobView(APIView):
+    """
+    Job status and result. Once the job has finished, the Server-Timing
+    header (and, with ?timings=1, a `timings` field) breaks the analysis
+    time down by stage: decode, preprocess, pose, reps, db, cache, ...
+    """
+    def get(self, request, job_id):
+        job = AnalysisJob.objects.filter(pk=job_id).first()
+        if not job:
+            return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = AnalysisJobSerializer(job)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return _add_timings(request, response, job.timings)
+
+
+class MetricsView(APIView):
+    """
+    Service metrics (see metrics.py), aggregated over every process:
+    Prometheus text format by default, or ?format=json for a summary with
+    p50/p90/p99 per histogram.
+    """
+    def get(self, request):
+        if not metrics.enabled():
+            return Response({"detail": "Metrics are disabled."},
+                            status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get('format') == 'json':
+            return Response(metrics.snapshot())
+        return HttpResponse(metrics.render_text(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class AnalysisJobEventsView(APIView):
+    """
+    Server-Sent Events for a job: progress, each rep as soon as it is
+    detected, then the result (see job_events).
+    """
+    renderer_classes = [EventStreamRenderer] + api_settings.DEFAULT_RENDERER_CLASSES
+
+    def get(self, request, job_id):
+        job = AnalysisJob.objects.filter(pk=job_id).first()
+        if not job:
+            return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return job_event_response(request, job)
 
-        # Save video to media folder
-        save_path = os.path.join(settings.MEDIA_ROOT, video.name)
-        with open(save_path, 'wb+') as f:
-            for chunk in video.chunks():
-                f.write(chunk)
 
-        # Run squat analysis
+class SquatCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    # id is unique and grows with created_at, so cursors stay stable
+    ordering = '-id'
+
+
+def _filter_squats(squats, params):
+    """
+    Applies the AllSquatsView query parameters to a SquatAnalysis
+    queryset. Raises ValueError for malformed values.
+    """
+    if params.get('job'):
         try:
-            result = analyze_squat_video(save_path)
-            return Response(result, status=200)
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+            squats = squats.filter(job_id=int(params['job']))
+        except ValueError:
+            raise ValueError(f"Invalid job: {params['job']!r}")
+    if params.get('video_hash'):
+        squats = squats.filter(job__video_hash=params['video_hash'])
+    if params.get('valid_depth'):
+        value = params['valid_depth'].lower()
+        if value not in ('true', 'false', '1', '0'):
+            raise ValueError(f"Invalid valid_depth: {params['valid_depth']!r}")
+        squats = squats.filter(valid_depth=value in ('true', '1'))
+    if params.get('since'):
+        squats = squats.filter(
+            created_at__gte=parse_datetime_param(params['since']))
+    if params.get('until'):
+        squats = squats.filter(
+            created_at__lt=parse_datetime_param(params['until']))
+    return squats
 
 
 class AllSquatsView(APIView):
+    """
+    Lists reps, newest first, with cursor pagination (`next`/`previous`
+    links, page_size up to 1000). Optional filters:
+
+      job          id of the AnalysisJob the reps came from
+      video_hash   SHA-256 of the source video
+      valid_depth  true / false
+      since, until ISO 8601 date or datetime bounds on created_at
+                   (since inclusive, until exclusive)
+
+    Responses carry an ETag and Last-Modified, and a matching
+    If-None-Match / If-Modified-Since gets a 304. The ETag covers the
+    number of matching reps and the newest rep id, so it also changes
+    when reps are deleted; Last-Modified only tracks new reps.
+    """
+    pagination_class = SquatCursorPagination
+
     def get(self, request):
-        squats = SquatAnalysis.objects.all()
-        serializer = SquatAnalysisSerializer(squats, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            squats = _filter_squats(
+                SquatAnalysis.objects.all(), request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One indexed aggregate query decides whether anything changed
+        stats = squats.aggregate(
+            count=Count('id'), last_id=Max('id'), last_created=Max('created_at'))
+        etag = quote_etag(f"{stats['count']}-{stats['last_id'] or 0}")
+        last_modified = (int(stats['last_created'].timestamp())
+                         if stats['last_created'] else None)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(squats, request, view=self)
+            serializer = SquatAnalysisSerializer(page, many=True)
+            response = paginator.get_paginated_response(serializer.data)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let clients keep the response but revalidate it every time
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class MediaContentNegotiation(BaseContentNegotiation):
+    """
+    For views that answer with a file rather than rendered data: the
+    client's Accept header names the file's type (video/mp4, image/jpeg),
+    which no renderer offers, so it is ignored instead of ending in a
+    406. Error responses are rendered with the first renderer (JSON).
+    """
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def _rep_or_404(rep_id):
+    rep = SquatAnalysis.objects.select_related('job').filter(pk=rep_id).first()
+    if rep is None:
+        return None, Response({"detail": "Rep not found."},
+                              status=status.HTTP_404_NOT_FOUND)
+    return rep, None
+
+
+class RepClipView(APIView):
+    """
+    A single rep as a short WebM clip, cut from its video around the
+    rep's recorded start and end (see rep_clips). The first request
+    encodes the clip; later ones serve the stored file, with Range
+    support (see media_streaming). Timed by stage (db, source, decode,
+    encode) in a Server-Timing header.
+    """
+    content_negotiation_class = MediaContentNegotiation
+
+    def get(self, request, rep_id):
+        timer = metrics.stage_timer('clips')
+        start = perf_counter()
+        with timer.stage('db'):
+            rep, error = _rep_or_404(rep_id)
+        if error:
+            return error
+        try:
+            path = rep_clips.rep_clip(rep, timer=timer)
+        except FileNotFoundError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        if path is None:
+            return Response({"detail": "No clip for this rep."},
+                            status=status.HTTP_404_NOT_FOUND)
+        # A rep's timestamps never change; a reanalysis makes new reps
+        response = serve_media(request, path, rep_clips.CLIP_CONTENT_TYPE,
+                               max_age=86400)
+        response['Server-Timing'] = timer.server_timing(
+            total=perf_counter() - start)
+        return response
+
+
+class RepStillView(APIView):
+    """
+    One frame of a rep as a JPEG: the bottom of the rep by default, or
+    ?at=start / ?at=end. Seeks straight to the frame (see rep_clips).
+    """
+    content_negotiation_class = MediaContentNegotiation
+
+    def get(self, request, rep_id):
+        timer = metrics.stage_timer('clips')
+        start = perf_counter()
+        at = request.query_params.get('at', 'bottom')
+        if at not in ('start', 'bottom', 'end'):
+            return Response({"detail": f"Invalid at: {at!r}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with timer.stage('db'):
+            rep, error = _rep_or_404(rep_id)
+        if error:
+            return error
+        seconds = getattr(rep, f'{at}_sec')
+        try:
+            if seconds is None:
+                raise FileNotFoundError("No timestamps for this rep")
+            with timer.stage('source'):
+                source = rep_clips.rep_source(rep)
+            jpeg = rep_clips.extract_still(source, seconds, timer=timer)
+        except FileNotFoundError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        if jpeg is None:
+            return Response({"detail": "Frame not found."},
+                            status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(jpeg, content_type='image/jpeg')
+        patch_cache_control(response, max_age=86400)
+        response['Server-Timing'] = timer.server_timing(
+            total=perf_counter() - start)
+        return response
 
 
 class VideoUploadView(APIView):
@@ -46,11 +413,31 @@ class VideoUploadView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = WorkoutVideoSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            video = serializer.save()
+            prepare_video(video)
             return Response({'message': 'Upload successful'}, status=201)
         return Response(serializer.errors, status=400)
 
 
+class VideoStreamView(APIView):
+    """
+    A WorkoutVideo's file, with byte-range (206) and conditional (304)
+    responses so players can seek without downloading it from the start
+    (see media_streaming).
+    """
+    content_negotiation_class = MediaContentNegotiation
+
+    def get(self, request, video_id):
+        video = WorkoutVideo.objects.filter(pk=video_id).first()
+        if not video or not video.video:
+            return Response({"detail": "Video not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return serve_media(request, video.video.path)
+        except FileNotFoundError:
+            return Response({"detail": "Video file not found."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+
 class FirstWorkoutVideoView(APIView):
     def get(self, request):
         video = WorkoutVideo.objects.first()
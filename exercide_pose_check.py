@@ -1,26 +1,41 @@
+import argparse
 import cv2
 import mediapipe as mp
 import numpy as np
+import os
+import sys
 import time
 from collections import defaultdict
 
+# Shared pose helpers live in the backend app (they don't need Django)
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "backend"))
+from squatTracker.kinematics import landmark_angle  # noqa: E402
+from squatTracker.landmark_recording import LandmarkRecorder  # noqa: E402
+from squatTracker.live_pipeline import LivePipeline  # noqa: E402
+from squatTracker.pose_estimation import (  # noqa: E402
+    PoseFrameProcessor, landmarks_to_array,
+)
+from squatTracker.rep_engine import IN_REP, READY, RepEngine  # noqa: E402
+from squatTracker.timing import StageTimer  # noqa: E402
+
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
+# Frames are downscaled to this longer side before pose inference
+# (None = full resolution); PERSON_ROI crops them to the person first
+MAX_INFERENCE_DIM = None
+PERSON_ROI = False
 
-def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - \
-        np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
+# Run capture and pose inference on their own threads, always showing the
+# newest frame (False = read, infer and draw one frame at a time)
+PIPELINED = True
 
-    if angle > 180.0:
-        angle = 360 - angle
+# Show per-stage timings (ms per frame) on screen; toggle with "t"
+SHOW_TIMINGS = False
 
-    return angle
+# Precision of --record landmark recordings (float16 halves their size)
+RECORD_DTYPE = "float16"
 
 
 class Exercise:
@@ -30,42 +45,37 @@ class Exercise:
         self.up_threshold = up_threshold
         self.down_threshold = down_threshold
         self.direction = direction
-        self.counter = 0
-        self.stage = None
+        # up_down: counted when the angle drops below down_threshold after
+        # being above up_threshold; down_up: the mirror image
+        self.engine = RepEngine(
+            direction, enter_threshold=down_threshold,
+            exit_threshold=up_threshold, require_arming=True,
+            count_on="enter")
+        self.stages = ("down", "up") if direction == 'up_down' else ("up", "down")
         self.just_completed_rep = False
-        self.rep_completed_time = None  # ← NEW
+        self.rep_completed_time = None
+
+    @property
+    def counter(self):
+        return self.engine.count
+
+    @property
+    def stage(self):
+        if self.engine.state == READY:
+            return self.stages[0]
+        if self.engine.state == IN_REP:
+            return self.stages[1]
+        return None
 
     def update(self, landmarks):
         try:
-            a = [landmarks[self.angle_points[0]].x,
-                 landmarks[self.angle_points[0]].y]
-            b = [landmarks[self.angle_points[1]].x,
-                 landmarks[self.angle_points[1]].y]
-            c = [landmarks[self.angle_points[2]].x,
-                 landmarks[self.angle_points[2]].y]
-
-            angle = calculate_angle(a, b, c)
+            angle = landmark_angle(landmarks, self.angle_points)
             self.just_completed_rep = False  # Reset at start
 
-            if self.direction == 'up_down':
-                if angle > self.up_threshold:
-                    self.stage = "down"
-                if angle < self.down_threshold and self.stage == "down":
-                    self.stage = "up"
-                    self.counter += 1
-                    self.just_completed_rep = True
-                    self.rep_completed_time = time.time()  # ← ✅ ADD THIS
-
-                    print(f"{self.name} Reps: {self.counter}")
-            elif self.direction == 'down_up':
-                if angle < self.up_threshold:
-                    self.stage = "up"
-                if angle > self.down_threshold and self.stage == "up":
-                    self.stage = "down"
-                    self.counter += 1
-                    self.just_completed_rep = True
-                    self.rep_completed_time = time.time()  # ← ✅ ADD THIS
-                    print(f"{self.name} Reps: {self.counter}")
+            if self.engine.update(None, angle):
+                self.just_completed_rep = True
+                self.rep_completed_time = time.time()
+                print(f"{self.name} Reps: {self.counter}")
 
             return angle
         except IndexError:
@@ -83,7 +93,7 @@ def detect_exercise(angles, prev_exercise, angle_changes, angle_change_threshold
     return detected_exercise
 
 
-def main():
+def main(record_path=None):
     exercise_config = {
         "Bicep Curl": {
             "angle_points": (
@@ -129,165 +139,210 @@ def main():
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5
     ) as pose:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                print("Ignoring empty camera frame.")
-                continue
-
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            results = pose.process(image)
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-
-                angles = {}
-                for name, exercise in exercises.items():
-                    try:
-                        a = [landmarks[exercise.angle_points[0]].x,
-                             landmarks[exercise.angle_points[0]].y]
-                        b = [landmarks[exercise.angle_points[1]].x,
-                             landmarks[exercise.angle_points[1]].y]
-                        c = [landmarks[exercise.angle_points[2]].x,
-                             landmarks[exercise.angle_points[2]].y]
+        timer = StageTimer()
+        show_timings = SHOW_TIMINGS
+        timings_text, timings_at = "", time.perf_counter()
+        processor = PoseFrameProcessor(
+            pose, max_dim=MAX_INFERENCE_DIM, roi=PERSON_ROI, timer=timer)
+
+        recorder = None
+        if record_path:
+            recorder = LandmarkRecorder(
+                record_path, dtype=RECORD_DTYPE,
+                metadata={"source": "exercide_pose_check",
+                          "started_at": time.time()})
+
+            def record(captured_at, pose_landmarks):
+                recorder.append(landmarks_to_array(pose_landmarks),
+                                timestamp=captured_at - recorder.clock_origin)
+
+        # Landmarks come back normalized to the full frame, so we can draw
+        # straight onto the frames
+        pipeline = LivePipeline(cap, processor.process, threaded=PIPELINED,
+                                on_result=record if recorder else None,
+                                timer=timer)
+        with pipeline:
+            for image, pose_landmarks in pipeline.frames():
+                if pose_landmarks:
+                    landmarks = pose_landmarks.landmark
+                    reps_started = time.perf_counter()
+
+                    angles = {}
+                    for name, exercise in exercises.items():
                         angles_key = name.lower().replace(" ", "_")
-                        angles[angles_key] = calculate_angle(a, b, c)
-                    except IndexError:
-                        angles[angles_key] = 0
-
-                angle_changes = {k: angles[k] - prev_angles[k] for k in angles}
-                prev_angles = angles.copy()
-
-                detected_exercise = detect_exercise(
-                    angles, current_exercise, angle_changes)
-
-                if detected_exercise:
-                    current_exercise = detected_exercise
-
-                if current_exercise:
-                    exercise = exercises[current_exercise]
-                    angle = exercise.update(landmarks)
-
-                    if angle is not None:
-                        a = [landmarks[exercise.angle_points[0]].x,
-                             landmarks[exercise.angle_points[0]].y]
-                        b = [landmarks[exercise.angle_points[1]].x,
-                             landmarks[exercise.angle_points[1]].y]
-                        c = [landmarks[exercise.angle_points[2]].x,
-                             landmarks[exercise.angle_points[2]].y]
-
-                        image_height, image_width, _ = image.shape
-                        a_pixel = tuple(np.multiply(
-                            a, [image_width, image_height]).astype(int))
-                        b_pixel = tuple(np.multiply(
-                            b, [image_width, image_height]).astype(int))
-                        c_pixel = tuple(np.multiply(
-                            c, [image_width, image_height]).astype(int))
-
-                        cv2.putText(
-                            image,
-                            str(int(angle)),
-                            b_pixel,
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.5,
-                            (255, 255, 255),
-                            2,
-                            cv2.LINE_AA,
-                        )
-
-                        cv2.rectangle(image, (0, 0), (300, 150),
-                                      (245, 117, 16), -1)
-
-                        cv2.putText(
-                            image,
-                            "REPS",
-                            (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.7,
-                            (0, 0, 0),
-                            2,
-                            cv2.LINE_AA,
-                        )
-                        cv2.putText(
-                            image,
-                            str(exercise.counter),
-                            (10, 70),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            2,
-                            (255, 255, 255),
-                            2,
-                            cv2.LINE_AA,
-                        )
-
-                        cv2.putText(
-                            image,
-                            "STAGE",
-                            (150, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.7,
-                            (0, 0, 0),
-                            2,
-                            cv2.LINE_AA,
-                        )
-                        stage_text = exercise.stage if exercise.stage else ""
-                        cv2.putText(
-                            image,
-                            stage_text,
-                            (150, 70),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            2,
-                            (255, 255, 255),
-                            2,
-                            cv2.LINE_AA,
-                        )
-
-                        cv2.putText(
-                            image,
-                            f"Exercise: {current_exercise}",
-                            (10, 120),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.7,
-                            (0, 255, 0),
-                            2,
-                            cv2.LINE_AA,
-                        )
+                        try:
+                            angles[angles_key] = landmark_angle(
+                                landmarks, exercise.angle_points)
+                        except IndexError:
+                            angles[angles_key] = 0
+
+                    angle_changes = {k: angles[k] - prev_angles[k] for k in angles}
+                    prev_angles = angles.copy()
+
+                    detected_exercise = detect_exercise(
+                        angles, current_exercise, angle_changes)
+
+                    if detected_exercise:
+                        current_exercise = detected_exercise
+
+                    exercise = exercises.get(current_exercise)
+                    angle = exercise.update(landmarks) if exercise else None
+                    timer.add("reps", time.perf_counter() - reps_started)
+
+                    if exercise:
+                        if angle is not None:
+                            a = [landmarks[exercise.angle_points[0]].x,
+                                 landmarks[exercise.angle_points[0]].y]
+                            b = [landmarks[exercise.angle_points[1]].x,
+                                 landmarks[exercise.angle_points[1]].y]
+                            c = [landmarks[exercise.angle_points[2]].x,
+                                 landmarks[exercise.angle_points[2]].y]
+
+                            image_height, image_width, _ = image.shape
+                            a_pixel = tuple(np.multiply(
+                                a, [image_width, image_height]).astype(int))
+                            b_pixel = tuple(np.multiply(
+                                b, [image_width, image_height]).astype(int))
+                            c_pixel = tuple(np.multiply(
+                                c, [image_width, image_height]).astype(int))
+
+                            cv2.putText(
+                                image,
+                                str(int(angle)),
+                                b_pixel,
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                0.5,
+                                (255, 255, 255),
+                                2,
+                                cv2.LINE_AA,
+                            )
+
+                            cv2.rectangle(image, (0, 0), (300, 150),
+                                          (245, 117, 16), -1)
+
+                            cv2.putText(
+                                image,
+                                "REPS",
+                                (10, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                0.7,
+                                (0, 0, 0),
+                                2,
+                                cv2.LINE_AA,
+                            )
+                            cv2.putText(
+                                image,
+                                str(exercise.counter),
+                                (10, 70),
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                2,
+                                (255, 255, 255),
+                                2,
+                                cv2.LINE_AA,
+                            )
+
+                            cv2.putText(
+                                image,
+                                "STAGE",
+                                (150, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                0.7,
+                                (0, 0, 0),
+                                2,
+                                cv2.LINE_AA,
+                            )
+                            stage_text = exercise.stage if exercise.stage else ""
+                            cv2.putText(
+                                image,
+                                stage_text,
+                                (150, 70),
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                2,
+                                (255, 255, 255),
+                                2,
+                                cv2.LINE_AA,
+                            )
+
+                            cv2.putText(
+                                image,
+                                f"Exercise: {current_exercise}",
+                                (10, 120),
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                0.7,
+                                (0, 255, 0),
+                                2,
+                                cv2.LINE_AA,
+                            )
 
                         # 🎉 Show GOOD JOB popup
-                if exercise.rep_completed_time and (time.time() - exercise.rep_completed_time < 3):
-                    cv2.putText(
-                        image,
-                        "Good job!",
-                        (image_width // 2 - 100, image_height // 2),
-                        cv2.FONT_HERSHEY_DUPLEX,
-                        1.5,
-                        (0, 255, 0),
-                        3,
-                        cv2.LINE_AA,
-                    )
-                    exercise.just_completed_rep = False
-
-            mp_drawing.draw_landmarks(
-                image,
-                results.pose_landmarks,
-                mp_pose.POSE_CONNECTIONS,
-                mp_drawing.DrawingSpec(color=(245, 117, 66),
-                                       thickness=2, circle_radius=2),
-                mp_drawing.DrawingSpec(color=(245, 66, 230),
-                                       thickness=2, circle_radius=2),
-            )
-
-            cv2.imshow("Personal Trainer", image)
-
-            key = cv2.waitKey(10) & 0xFF
-            if key == ord("q"):
-                break
+                        if exercise.rep_completed_time and (time.time() - exercise.rep_completed_time < 3):
+                            image_height, image_width, _ = image.shape
+                            cv2.putText(
+                                image,
+                                "Good job!",
+                                (image_width // 2 - 100, image_height // 2),
+                                cv2.FONT_HERSHEY_DUPLEX,
+                                1.5,
+                                (0, 255, 0),
+                                3,
+                                cv2.LINE_AA,
+                            )
+                            exercise.just_completed_rep = False
+
+                mp_drawing.draw_landmarks(
+                    image,
+                    pose_landmarks,
+                    mp_pose.POSE_CONNECTIONS,
+                    mp_drawing.DrawingSpec(color=(245, 117, 66),
+                                           thickness=2, circle_radius=2),
+                    mp_drawing.DrawingSpec(color=(245, 66, 230),
+                                           thickness=2, circle_radius=2),
+                )
+
+                cv2.putText(image, pipeline.stats_text(),
+                            (10, image.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+                if show_timings:
+                    # Averages over the last second
+                    now = time.perf_counter()
+                    if now - timings_at >= 1.0:
+                        timings_text, timings_at = timer.text(), now
+                        timer.reset()
+                    cv2.putText(image, timings_text,
+                                (10, image.shape[0] - 35), cv2.FONT_HERSHEY_SIMPLEX,
+                                0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+                with timer.stage("display"):
+                    cv2.imshow("Personal Trainer", image)
+
+                    # The pipeline paces the loop; don't add latency waiting here
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord("q"):
+                    break
+                if key == ord("t"):
+                    show_timings = not show_timings
 
     cap.release()
     cv2.destroyAllWindows()
+    if recorder:
+        recorder.close()
+        print(f"Recorded {len(recorder)} frames to {record_path}")
+
+    stats = pipeline.stats()
+    print(f"Frames shown: {stats['frames_shown']} "
+          f"(dropped {stats['frames_dropped']}), latency "
+          f"{stats['latency_ms']:.0f} ms (p95 {stats['latency_p95_ms']:.0f} ms)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Live exercise trainer for bicep curls, squats and push-ups.")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Save the session's landmarks to FILE "
+                             "(a .lmk landmark recording).")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    main(parse_args().record)